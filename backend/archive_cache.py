@@ -0,0 +1,344 @@
+"""
+archive_cache.py - アーカイブ一覧の永続キャッシュ（SQLite）
+
+ArchiveListExtractor の結果を (path, size, mtime_ns, 指紋, 一覧の上限件数, 抽出器のバージョン) で保存し、
+変更のないアーカイブは次回以降一覧を作り直さない（主キーでの 1 行検索）。
+一覧の作り方が変わった（ArchiveListExtractor.VERSION が上がった）行は使わずに作り直す。
+
+- 指紋は先頭 4 KiB と末尾 4 KiB のハッシュ（ZIP では末尾に EOCD = セントラルディレクトリの
+  位置・サイズ・件数が、tar / gzip では先頭に最初のヘッダ・FNAME が、gzip では末尾に ISIZE が入る）。
+  サイズ・mtime を保ったまま書き換えられたファイルも検出できる
+- エントリは 1 行 1 BLOB のコンパクトな形式で保存する：
+  パスは直前のパスとの共通接頭辞の長さ + 残り（front coding）、サイズ類は array の配列、
+  全体を zlib で圧縮（エントリごとの辞書・JSON を保存しない）
+- エラーになった一覧は保存しない
+
+【Phase 1 design constraints】
+- Only archive file lists (names, sizes, checksums) are cached; member contents are never stored.
+"""
+
+import os
+import json
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+# 指紋に使う先頭・末尾のバイト数
+FINGERPRINT_BLOCK = 4096
+
+# エントリ BLOB の形式（変えたら上げる。古い行は読まずに作り直す）
+ENTRY_FORMAT_VERSION = 1
+
+# エントリのフラグ
+FLAG_DIR = 0x01
+FLAG_COMPRESSED_SIZE = 0x02
+FLAG_COMPRESSED_SIZE_NONE = 0x04
+FLAG_ZIP_FIELDS = 0x08
+FLAG_TRAVERSAL = 0x10
+
+# パストラバーサル警告の文言（ArchiveListExtractor と同じ）
+TRAVERSAL_WARNING = "Possible path traversal"
+
+# キャッシュキー (size, mtime_ns, fingerprint)
+ArchiveKey = Tuple[int, int, str]
+
+
+def archive_fingerprint(f, size: int) -> str:
+    """
+    アーカイブの指紋（先頭・末尾ブロックのハッシュ）
+    
+    Args:
+        f: バイナリモードで開いたファイル
+        size: ファイルサイズ
+    
+    Returns:
+        16 進文字列
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    f.seek(0)
+    digest.update(f.read(FINGERPRINT_BLOCK))
+    if size > FINGERPRINT_BLOCK:
+        f.seek(max(FINGERPRINT_BLOCK, size - FINGERPRINT_BLOCK))
+        digest.update(f.read(FINGERPRINT_BLOCK))
+    return digest.hexdigest()
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    """符号なし LEB128"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """符号なし LEB128 を読む（値, 次の位置）"""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_entries(entries: List[Dict]) -> bytes:
+    """
+    エントリ辞書のリストをコンパクトな BLOB に
+    
+    Args:
+        entries: ArchiveListExtractor のエントリ辞書
+    
+    Returns:
+        zlib 圧縮したバイト列
+    """
+    names = bytearray()
+    flags = bytearray()
+    sizes = array('q')
+    compressed_sizes = array('q')
+    crcs = array('I')
+    methods = array('H')
+    
+    previous = b''
+    for entry in entries:
+        name = entry['name'].encode('utf-8', errors='surrogatepass')
+        shared = 0
+        limit = min(len(name), len(previous))
+        while shared < limit and name[shared] == previous[shared]:
+            shared += 1
+        _write_varint(names, shared)
+        _write_varint(names, len(name) - shared)
+        names += name[shared:]
+        previous = name
+        
+        flag = FLAG_DIR if entry['is_dir'] else 0
+        sizes.append(entry['size'])
+        if 'compressed_size' in entry:
+            flag |= FLAG_COMPRESSED_SIZE
+            if entry['compressed_size'] is None:
+                flag |= FLAG_COMPRESSED_SIZE_NONE
+                compressed_sizes.append(0)
+            else:
+                compressed_sizes.append(entry['compressed_size'])
+        if 'crc32' in entry:
+            flag |= FLAG_ZIP_FIELDS
+            crcs.append(entry['crc32'])
+            methods.append(entry['compress_type'])
+        if 'warning' in entry:
+            flag |= FLAG_TRAVERSAL
+        flags.append(flag)
+    
+    out = bytearray()
+    _write_varint(out, ENTRY_FORMAT_VERSION)
+    _write_varint(out, len(entries))
+    for part in (bytes(names), bytes(flags), sizes.tobytes(), compressed_sizes.tobytes(),
+                 crcs.tobytes(), methods.tobytes()):
+        _write_varint(out, len(part))
+        out += part
+    return zlib.compress(bytes(out), 6)
+
+
+def decode_entries(blob: bytes) -> Optional[List[Dict]]:
+    """
+    encode_entries の逆変換
+    
+    Args:
+        blob: encode_entries の出力
+    
+    Returns:
+        エントリ辞書のリスト（形式のバージョンが違えば None）
+    """
+    data = zlib.decompress(blob)
+    version, pos = _read_varint(data, 0)
+    if version != ENTRY_FORMAT_VERSION:
+        return None
+    count, pos = _read_varint(data, pos)
+    parts = []
+    for _ in range(6):
+        length, pos = _read_varint(data, pos)
+        parts.append(data[pos:pos + length])
+        pos += length
+    names, flags = parts[0], parts[1]
+    sizes, compressed_sizes, crcs, methods = array('q'), array('q'), array('I'), array('H')
+    sizes.frombytes(parts[2])
+    compressed_sizes.frombytes(parts[3])
+    crcs.frombytes(parts[4])
+    methods.frombytes(parts[5])
+    
+    entries = []
+    previous = b''
+    name_pos = compressed_index = zip_index = 0
+    for i in range(count):
+        shared, name_pos = _read_varint(names, name_pos)
+        length, name_pos = _read_varint(names, name_pos)
+        name = previous[:shared] + names[name_pos:name_pos + length]
+        name_pos += length
+        previous = name
+        
+        flag = flags[i]
+        entry = {
+            'name': name.decode('utf-8', errors='surrogatepass'),
+            'size': sizes[i],
+            'is_dir': bool(flag & FLAG_DIR)
+        }
+        if flag & FLAG_COMPRESSED_SIZE:
+            value = compressed_sizes[compressed_index]
+            compressed_index += 1
+            entry['compressed_size'] = None if flag & FLAG_COMPRESSED_SIZE_NONE else value
+        if flag & FLAG_ZIP_FIELDS:
+            entry['crc32'] = crcs[zip_index]
+            entry['compress_type'] = methods[zip_index]
+            zip_index += 1
+        if flag & FLAG_TRAVERSAL:
+            entry['warning'] = TRAVERSAL_WARNING
+        entries.append(entry)
+    return entries
+
+
+class ArchiveCache:
+    """アーカイブ一覧キャッシュ"""
+    
+    def __init__(self, db_path: str = "data/raw/archive_cache.sqlite"):
+        """
+        初期化（無ければ作成）
+        
+        Args:
+            db_path: SQLite ファイルのパス
+        """
+        self.db_path = db_path
+        dirname = os.path.dirname(db_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        
+        # パイプラインでは抽出スレッドから並行して使う
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(archives)")]
+            if columns and 'version' not in columns:
+                # バージョンを記録していない古い表（どの抽出器で作った一覧か分からない）は捨てる
+                logger.info("Archive cache: dropping rows without an extractor version")
+                self._conn.execute("DROP TABLE archives")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS archives ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, fingerprint TEXT NOT NULL,"
+                " max_entries INTEGER NOT NULL, version INTEGER NOT NULL,"
+                " meta TEXT NOT NULL, entries BLOB NOT NULL)"
+            )
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, path: str, key: ArchiveKey, max_entries: int, version: int) -> Optional[Dict]:
+        """
+        検索
+        
+        Args:
+            path: アーカイブのパス
+            key: (size, mtime_ns, fingerprint)
+            max_entries: 一覧の上限件数（保存時と違えば使わない）
+            version: 抽出器のバージョン（保存時と違えば使わない）
+        
+        Returns:
+            ArchiveListExtractor.extract と同じ形のメタデータ（無い・変わっていれば None）
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, fingerprint, max_entries, version, meta, entries"
+                " FROM archives WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None or tuple(row[:3]) != tuple(key) or tuple(row[3:5]) != (max_entries, version):
+            self.misses += 1
+            return None
+        
+        entries = decode_entries(row[6])
+        if entries is None:
+            self.misses += 1
+            return None
+        meta = json.loads(row[5])
+        meta['entries'] = entries
+        self.hits += 1
+        return meta
+    
+    def put(self, path: str, key: ArchiveKey, max_entries: int, version: int, meta: Dict) -> None:
+        """
+        保存（エラーの結果は保存しない）
+        
+        Args:
+            path: アーカイブのパス
+            key: (size, mtime_ns, fingerprint)
+            max_entries: 一覧の上限件数
+            version: 抽出器のバージョン
+            meta: ArchiveListExtractor.extract の結果
+        """
+        if meta.get('error') is not None:
+            return
+        summary = {name: value for name, value in meta.items() if name != 'entries'}
+        blob = encode_entries(meta['entries'])
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO archives"
+                " (path, size, mtime_ns, fingerprint, max_entries, version, meta, entries)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, key[0], key[1], key[2], max_entries, version,
+                 json.dumps(summary), blob)
+            )
+    
+    def evict_missing(self) -> int:
+        """
+        存在しなくなったアーカイブの行を削除
+        
+        Returns:
+            削除した行数
+        """
+        with self._lock:
+            paths = [row[0] for row in self._conn.execute("SELECT path FROM archives")]
+        missing = [path for path in paths if not os.path.exists(path)]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM archives WHERE path = ?", [(path,) for path in missing])
+        logger.info(f"Archive cache: evicted {len(missing)} missing archives")
+        return len(missing)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        件数と保存サイズ
+        
+        Returns:
+            {'archives', 'entries_bytes'}
+        """
+        with self._lock:
+            count, blob_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(entries)), 0) FROM archives"
+            ).fetchone()
+        return {'archives': count, 'entries_bytes': blob_bytes}
+    
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Archive listing cache maintenance")
+    parser.add_argument('--db', default="data/raw/archive_cache.sqlite")
+    parser.add_argument('--evict', action='store_true', help="drop entries for archives that no longer exist")
+    args = parser.parse_args()
+    
+    cache = ArchiveCache(args.db)
+    if args.evict:
+        cache.evict_missing()
+    for name, value in cache.stats().items():
+        print(f"{name}: {value}")
+    cache.close()
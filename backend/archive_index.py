@@ -0,0 +1,460 @@
+"""
+archive_index.py - アーカイブ内エントリパスの転置インデックス（SQLite）
+
+ベクトル DB のドキュメントにはアーカイブの先頭 10 エントリしか入らないため、
+「IMG_4411.CR2 を含む ZIP はどれか」に答えられない。ここでは ArchiveListExtractor の
+出力（archive_meta.entries）からエントリパスのトークン → エントリの転置インデックスを作り、
+ベクトル DB とは別に「X を含むアーカイブ」を引く。
+
+トークン化（インデックス・検索で共通）：
+- パス区切り・記号・空白・アンダースコアで単語に分ける（IMG_4411.CR2 → IMG / 4411 / CR2）
+- 単語を camelCase・英字と数字の境目で分ける（HolidayPhoto → holiday / photo、CR2 → cr / 2）。
+  インデックスには単語全体と部分の両方を入れ、検索では分けられる単語は部分だけを使う
+- CJK（漢字・かな・ハングル）の連続は 2-gram（1 文字だけなら 1-gram）
+- すべて小文字
+
+検索はクエリのトークンすべてを含むエントリ（AND）。最も少ないトークンの転置リストを起点に、
+残りのトークンは (term_id, entry_id) の主キーで存在確認するため、ありふれたトークン（jpg など）が
+含まれても速い。
+
+【Phase 1 design constraints】
+- Only entry paths from archive listings are indexed; archive members are never opened.
+- This index is separate from the vector collection and involves no embedding or LLM step.
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    from .catalog_io import iter_records
+    from .archive_list import ArchiveListExtractor
+except ImportError:
+    from catalog_io import iter_records
+    from archive_list import ArchiveListExtractor
+
+
+logger = logging.getLogger(__name__)
+
+
+# 単語の区切り（英数字・CJK 以外とアンダースコア）
+WORD_SPLIT = re.compile(r'[\W_]+')
+CJK_CHARS = '぀-ヿ㐀-䶿一-鿿豈-﫿가-힯'
+# 単語の中の部分：CJK の連続 / camelCase / 数字 / その他の文字
+WORD_PARTS = re.compile(
+    rf'[{CJK_CHARS}]+|[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+|[^\W\d_{CJK_CHARS}]+'
+)
+CJK_RUN = re.compile(rf'^[{CJK_CHARS}]+$')
+
+# 長すぎるトークンは切る（ハッシュ名などでインデックスが膨らまないように）
+MAX_TOKEN_LENGTH = 64
+
+# 1 トランザクションで登録するエントリ数の目安
+WRITE_BATCH = 20000
+
+
+def _cjk_grams(run: str) -> List[str]:
+    """CJK の連続を 2-gram に（1 文字なら 1-gram）"""
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def _word_parts(word: str) -> List[str]:
+    """単語を部分に分ける（CJK は n-gram。小文字化済み）"""
+    parts = []
+    for part in WORD_PARTS.findall(word):
+        if CJK_RUN.match(part):
+            parts.extend(_cjk_grams(part))
+        else:
+            parts.append(part.lower())
+    return parts
+
+
+def tokenize_path(path: str) -> Set[str]:
+    """
+    エントリパスをインデックス用のトークンに分ける
+    
+    Args:
+        path: アーカイブ内のパス
+    
+    Returns:
+        トークンの集合（単語全体と、その部分の両方）
+    """
+    tokens = set()
+    for word in WORD_SPLIT.split(path):
+        if not word:
+            continue
+        # CJK だけの単語は n-gram のみ（単語全体は入れない）
+        if not CJK_RUN.match(word):
+            tokens.add(word.lower()[:MAX_TOKEN_LENGTH])
+        tokens.update(part[:MAX_TOKEN_LENGTH] for part in _word_parts(word))
+    return tokens
+
+
+def tokenize_query(query: str) -> Set[str]:
+    """
+    検索語をトークンに分ける（分けられる単語は部分だけを使う）
+    
+    Args:
+        query: 検索語（ファイル名・パスの一部・単語）
+    
+    Returns:
+        トークンの集合（すべてを含むエントリが一致）
+    """
+    tokens = set()
+    for word in WORD_SPLIT.split(query):
+        if not word:
+            continue
+        parts = _word_parts(word)
+        if len(parts) > 1 or CJK_RUN.match(word):
+            tokens.update(part[:MAX_TOKEN_LENGTH] for part in parts)
+        else:
+            tokens.add(word.lower()[:MAX_TOKEN_LENGTH])
+    return tokens
+
+
+class ArchiveIndex:
+    """アーカイブ内エントリの転置インデックス"""
+    
+    def __init__(self, db_path: str = "data/raw/archive_index.sqlite"):
+        """
+        初期化（無ければ作成）
+        
+        Args:
+            db_path: SQLite ファイルのパス
+        """
+        self.db_path = db_path
+        dirname = os.path.dirname(db_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS archives ("
+                " id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, signature TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " id INTEGER PRIMARY KEY, archive_id INTEGER NOT NULL, name TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_archive ON entries (archive_id)")
+            # df: そのトークンを含むエントリ数（検索で最も少ないトークンを起点にするため）
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS terms ("
+                " id INTEGER PRIMARY KEY, term TEXT NOT NULL UNIQUE, df INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS postings ("
+                " term_id INTEGER NOT NULL, entry_id INTEGER NOT NULL,"
+                " PRIMARY KEY (term_id, entry_id)) WITHOUT ROWID"
+            )
+        self._term_ids = {}
+    
+    def add_archive(self, path: str, archive_meta: Dict) -> bool:
+        """
+        1 アーカイブのエントリを登録（前回と同じ内容なら何もしない）
+        
+        Args:
+            path: アーカイブのパス
+            archive_meta: ArchiveListExtractor.extract の結果
+        
+        Returns:
+            登録し直したら True
+        """
+        return self.add_archives([(path, archive_meta)]) > 0
+    
+    def add_archives(self, archives: Iterable) -> int:
+        """
+        複数アーカイブのエントリを 1 トランザクションで登録
+        
+        Args:
+            archives: (アーカイブのパス, archive_meta) の並び
+        
+        Returns:
+            登録し直したアーカイブ数
+        """
+        updated = 0
+        with self._lock:
+            try:
+                with self._conn:
+                    for path, archive_meta in archives:
+                        if archive_meta.get('error') is not None:
+                            continue
+                        entries = archive_meta.get('entries') or []
+                        signature = self._signature(archive_meta)
+                        row = self._conn.execute(
+                            "SELECT id, signature FROM archives WHERE path = ?", (path,)
+                        ).fetchone()
+                        if row is not None and row[1] == signature:
+                            continue
+                        if row is not None:
+                            self._delete_archive(row[0])
+                        archive_id = self._conn.execute(
+                            "INSERT INTO archives (path, signature) VALUES (?, ?)", (path, signature)
+                        ).lastrowid
+                        self._insert_entries(archive_id, [entry['name'] for entry in entries])
+                        updated += 1
+            except Exception:
+                # ロールバックされた terms の id を覚えたままにしない
+                self._term_ids.clear()
+                raise
+        return updated
+    
+    def remove_archives(self, paths: Iterable[str]) -> int:
+        """
+        アーカイブをインデックスから外す
+        
+        Args:
+            paths: アーカイブのパス
+        
+        Returns:
+            外したアーカイブ数
+        """
+        removed = 0
+        with self._lock, self._conn:
+            for path in paths:
+                row = self._conn.execute("SELECT id FROM archives WHERE path = ?", (path,)).fetchone()
+                if row is not None:
+                    self._delete_archive(row[0])
+                    removed += 1
+        return removed
+    
+    def prune_missing(self) -> int:
+        """
+        存在しなくなったアーカイブを外す
+        
+        Returns:
+            外したアーカイブ数
+        """
+        with self._lock:
+            paths = [row[0] for row in self._conn.execute("SELECT path FROM archives")]
+        return self.remove_archives(path for path in paths if not os.path.exists(path))
+    
+    def find_archives(self, query: str, limit: int = 50, entries_per_archive: int = 5) -> List[Dict]:
+        """
+        検索語を含むエントリを持つアーカイブを探す
+        
+        Args:
+            query: 検索語（IMG_4411.CR2、holiday photo、東京タワー など）
+            limit: 返すアーカイブ数の上限
+            entries_per_archive: アーカイブごとに返す一致エントリ数の上限
+        
+        Returns:
+            [{'archive': パス, 'entries': [一致したエントリ名, ...]}]（見つかった順）
+        """
+        tokens = tokenize_query(query)
+        if not tokens:
+            return []
+        
+        with self._lock:
+            placeholders = ','.join('?' * len(tokens))
+            terms = self._conn.execute(
+                f"SELECT id, df FROM terms WHERE term IN ({placeholders})", list(tokens)
+            ).fetchall()
+            if len(terms) < len(tokens):
+                # 一度も出てこないトークンがある
+                return []
+            terms.sort(key=lambda term: term[1])
+            
+            sql = ("SELECT a.path, e.name FROM postings p"
+                   " JOIN entries e ON e.id = p.entry_id"
+                   " JOIN archives a ON a.id = e.archive_id"
+                   " WHERE p.term_id = ?")
+            for _ in terms[1:]:
+                sql += (" AND EXISTS (SELECT 1 FROM postings q"
+                        " WHERE q.term_id = ? AND q.entry_id = p.entry_id)")
+            
+            results = {}
+            for archive_path, name in self._conn.execute(sql, [term[0] for term in terms]):
+                matches = results.get(archive_path)
+                if matches is None:
+                    if len(results) >= limit:
+                        break
+                    matches = results[archive_path] = []
+                if len(matches) < entries_per_archive:
+                    matches.append(name)
+        
+        return [{'archive': path, 'entries': names} for path, names in results.items()]
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        件数
+        
+        Returns:
+            {'archives', 'entries', 'terms', 'postings'}
+        """
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('archives', 'entries', 'terms', 'postings')
+            }
+    
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+    
+    def _signature(self, archive_meta: Dict) -> str:
+        """
+        一覧が変わったかの判定用（件数と、全エントリの名前・サイズのハッシュ）
+        
+        先頭・末尾だけでは途中のエントリの改名・差し替えを見落とすため、全エントリを使う。
+        カタログのレコードにも残る一覧だけから作る（パイプラインと build_from_catalog で同じ値）。
+        
+        Args:
+            archive_meta: ArchiveListExtractor.extract の結果
+        
+        Returns:
+            "件数:16 進ハッシュ"
+        """
+        entries = archive_meta.get('entries') or []
+        digest = hashlib.blake2b(digest_size=16)
+        for entry in entries:
+            digest.update(entry['name'].encode('utf-8', errors='surrogatepass'))
+            digest.update(b'\0%d\0' % (entry.get('size') or 0))
+        return f"{len(entries)}:{digest.hexdigest()}"
+    
+    def _insert_entries(self, archive_id: int, names: List[str]) -> None:
+        """エントリとその転置リストを登録（ロック・トランザクション内で呼ぶ）"""
+        # id を自前で振り、lastrowid を 1 件ずつ取らずに executemany で入れる
+        next_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0] + 1
+        counts = {}
+        for start in range(0, len(names), WRITE_BATCH):
+            chunk = names[start:start + WRITE_BATCH]
+            rows = []
+            postings = []
+            for name in chunk:
+                rows.append((next_id, archive_id, name))
+                for token in tokenize_path(name):
+                    term_id = self._term_id(token)
+                    postings.append((term_id, next_id))
+                    counts[term_id] = counts.get(term_id, 0) + 1
+                next_id += 1
+            self._conn.executemany("INSERT INTO entries (id, archive_id, name) VALUES (?, ?, ?)", rows)
+            postings.sort()
+            self._conn.executemany("INSERT INTO postings (term_id, entry_id) VALUES (?, ?)", postings)
+        self._conn.executemany(
+            "UPDATE terms SET df = df + ? WHERE id = ?",
+            [(count, term_id) for term_id, count in counts.items()]
+        )
+    
+    def _delete_archive(self, archive_id: int) -> None:
+        """アーカイブとそのエントリ・転置リストを削除（ロック・トランザクション内で呼ぶ）"""
+        counts = {}
+        rows = self._conn.execute(
+            "SELECT id, name FROM entries WHERE archive_id = ?", (archive_id,)
+        ).fetchall()
+        postings = []
+        for entry_id, name in rows:
+            for token in tokenize_path(name):
+                term_id = self._term_id(token, create=False)
+                if term_id is not None:
+                    postings.append((term_id, entry_id))
+                    counts[term_id] = counts.get(term_id, 0) + 1
+        self._conn.executemany("DELETE FROM postings WHERE term_id = ? AND entry_id = ?", postings)
+        self._conn.executemany(
+            "UPDATE terms SET df = df - ? WHERE id = ?",
+            [(count, term_id) for term_id, count in counts.items()]
+        )
+        self._conn.execute("DELETE FROM entries WHERE archive_id = ?", (archive_id,))
+        self._conn.execute("DELETE FROM archives WHERE id = ?", (archive_id,))
+    
+    def _term_id(self, term: str, create: bool = True) -> Optional[int]:
+        """トークンの id（無ければ作る）"""
+        term_id = self._term_ids.get(term)
+        if term_id is not None:
+            return term_id
+        row = self._conn.execute("SELECT id FROM terms WHERE term = ?", (term,)).fetchone()
+        if row is not None:
+            term_id = row[0]
+        elif create:
+            term_id = self._conn.execute(
+                "INSERT INTO terms (term, df) VALUES (?, 0)", (term,)
+            ).lastrowid
+        else:
+            return None
+        self._term_ids[term] = term_id
+        return term_id
+
+
+def build_from_catalog(index: ArchiveIndex, catalog_path: str,
+                       extractor: Optional[ArchiveListExtractor] = None) -> int:
+    """
+    カタログ（metadata.json / .ndjson）のアーカイブレコードからインデックスを作る
+    
+    カタログの一覧が切り詰められている（catalog_truncated）アーカイブは、extractor で全件を
+    取り直す（変更がなければアーカイブ一覧キャッシュから返る）。extractor が無ければ登録済みのまま残す。
+    
+    Args:
+        index: 登録先
+        catalog_path: カタログのパス
+        extractor: 全件の一覧を取り直す抽出器（省略可）
+    
+    Returns:
+        登録し直したアーカイブ数
+    """
+    batch = []
+    updated = 0
+    skipped = 0
+    for meta in iter_records(catalog_path):
+        archive_meta = meta.get('archive_meta')
+        if meta.get('kind') != 'archive' or not archive_meta:
+            continue
+        if archive_meta.get('catalog_truncated'):
+            if extractor is None:
+                skipped += 1
+                continue
+            archive_meta = extractor.extract(meta['path'])
+        batch.append((meta['path'], archive_meta))
+        if sum(len(m.get('entries') or []) for _, m in batch) >= WRITE_BATCH:
+            updated += index.add_archives(batch)
+            batch = []
+    updated += index.add_archives(batch)
+    if skipped:
+        logger.warning(f"Skipped {skipped} archives whose catalog listing is truncated (no extractor given)")
+    return updated
+
+
+if __name__ == '__main__':
+    import sys
+    import json
+    import time
+    import argparse
+    
+    import yaml
+    
+    parser = argparse.ArgumentParser(description="Find archives that contain a file")
+    parser.add_argument('query', nargs='?', help="file name or path fragment (e.g. IMG_4411.CR2)")
+    parser.add_argument('--db', default="data/raw/archive_index.sqlite")
+    parser.add_argument('--build', metavar='CATALOG', help="index archive records from a catalog file")
+    parser.add_argument('--config', default="config/config.yaml",
+                        help="config used to re-read archives whose catalog listing is truncated")
+    parser.add_argument('--prune', action='store_true', help="drop archives that no longer exist")
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+    
+    index = ArchiveIndex(args.db)
+    if args.build:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            metadata_config = (yaml.safe_load(f) or {}).get('metadata') or {}
+        started = time.perf_counter()
+        updated = build_from_catalog(index, args.build, ArchiveListExtractor(metadata_config))
+        print(f"Indexed {updated} archives in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    if args.prune:
+        print(f"Pruned {index.prune_missing()} archives", file=sys.stderr)
+    if args.query:
+        started = time.perf_counter()
+        results = index.find_archives(args.query, limit=args.limit)
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        print(f"{len(results)} archives in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    elif not args.build and not args.prune:
+        print(json.dumps(index.stats(), indent=2))
+    index.close()
@@ -2,12 +2,22 @@
 archive_list.py - アーカイブファイル中身一覧抽出モジュール
 
 対応形式：
-- zip   （Python 標準 zipfile）
-- tar/gz（Python 標準 tarfile）
+- zip   （zip_directory でセントラルディレクトリを mmap し、上限件数まで 1 件ずつ読む）
+- tar/gz（Python 標準 tarfile。tarfile.next() で 1 件ずつ読み、上限件数で止める）
+- gz    （tar でない単体の gzip は展開せず、ヘッダの FNAME と末尾の ISIZE だけを読む）
+  ISIZE が実サイズと限らない（4 GiB 超の可能性・複数メンバー）ときは size_is_lower_bound を立てる
 - 7z/rar（外部コマンドがあれば対応。無ければ未対応）
+  `7z l -slt` / `unrar lt` の出力をパイプから 1 行ずつ解析し、
+  archive_max_entries に達したらその場で子プロセスを止める
 
 Phase 1: 展開しない。中身をリストするのみ
 
+カタログ（metadata.json）には一覧の先頭 archive_catalog_entries 件だけを入れる（catalog_listing）。
+全件はアーカイブ一覧キャッシュと転置インデックスから引く。
+
+archive_cache が有効なら、(size, mtime, 先頭・末尾ブロックの指紋) が同じアーカイブは
+保存済みの一覧を返す（一覧を作り直さない）。
+
 安全対策：
 - 最大エントリ数制限
 - 合計サイズ推定
@@ -22,42 +32,288 @@ Phase 1: 展開しない。中身をリストするのみ
 """
 
 import os
+import zlib
+import struct
 import subprocess
 import json
 import logging
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 
-try:
-    import zipfile
-    ZIPFILE_AVAILABLE = True
-except ImportError:
-    ZIPFILE_AVAILABLE = False
-
 try:
     import tarfile
     TARFILE_AVAILABLE = True
 except ImportError:
     TARFILE_AVAILABLE = False
 
+try:
+    from .throttle import IOThrottle, ThrottledReader, get_throttle
+    from .tools import get_tools
+    from .zip_directory import ZipDirectory
+    from .archive_cache import ArchiveCache, archive_fingerprint
+except ImportError:
+    from throttle import IOThrottle, ThrottledReader, get_throttle
+    from tools import get_tools
+    from zip_directory import ZipDirectory
+    from archive_cache import ArchiveCache, archive_fingerprint
+
 
 logger = logging.getLogger(__name__)
 
 
+# 一覧を作れる拡張子（キャッシュの対象）
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tgz', '.gz', '.7z', '.rar')
+
+# gzip ヘッダのフラグ
+GZIP_MAGIC = b'\x1f\x8b'
+GZIP_FHCRC = 0x02
+GZIP_FEXTRA = 0x04
+GZIP_FNAME = 0x08
+GZIP_FCOMMENT = 0x10
+# gzip 末尾（CRC32 + ISIZE）のバイト数
+GZIP_TRAILER_SIZE = 8
+# deflate の最大圧縮率（これ以上は 1 バイトの圧縮データに収まらない）
+DEFLATE_MAX_RATIO = 1032
+# tar ヘッダの ustar マジック（512 バイトブロックの 257 バイト目から）
+TAR_MAGIC_OFFSET = 257
+TAR_MAGICS = (b'ustar\x00', b'ustar ')
+
+
+def read_gzip_header(f) -> Dict:
+    """
+    gzip のヘッダ（FNAME）と末尾（ISIZE）を読む（展開しない）
+    
+    Args:
+        f: 先頭に位置したバイナリファイル（seek 可能）
+    
+    Returns:
+        {'name': 元のファイル名 or None, 'size': 展開後のサイズ（2^32 の剰余）,
+         'compressed_size': ファイルサイズ, 'header_size': ヘッダのバイト数}
+    
+    Raises:
+        ValueError: gzip ではない、または途中で切れている・ISIZE がありえない値（壊れている）
+    """
+    header = f.read(10)
+    if len(header) < 10 or header[:2] != GZIP_MAGIC or header[2] != 8:
+        raise ValueError("Not a gzipped file")
+    flags = header[3]
+    
+    if flags & GZIP_FEXTRA:
+        (extra_length,) = struct.unpack('<H', f.read(2))
+        f.seek(extra_length, os.SEEK_CUR)
+    
+    name = None
+    if flags & GZIP_FNAME:
+        # ゼロ終端の Latin-1 文字列（長すぎる名前は打ち切る）
+        raw = bytearray()
+        while len(raw) < 4096:
+            chunk = f.read(256)
+            if not chunk:
+                break
+            end = chunk.find(b'\0')
+            if end >= 0:
+                raw += chunk[:end]
+                f.seek(end + 1 - len(chunk), os.SEEK_CUR)
+                break
+            raw += chunk
+        name = raw.decode('latin-1')
+    header_size = f.tell()
+    
+    # 末尾（CRC32 + ISIZE）が無ければ、最後の 4 バイトは ISIZE ではない
+    compressed_size = f.seek(0, os.SEEK_END)
+    payload = compressed_size - header_size - GZIP_TRAILER_SIZE
+    if payload < 0:
+        raise ValueError("Truncated gzip file")
+    f.seek(-4, os.SEEK_END)
+    (size,) = struct.unpack('<I', f.read(4))
+    # 4 GiB 未満しか展開できない大きさなら ISIZE は剰余ではなく、deflate の最大圧縮率を超えられない
+    if payload * DEFLATE_MAX_RATIO < 1 << 32 and size > payload * DEFLATE_MAX_RATIO:
+        raise ValueError("Corrupt gzip file: ISIZE exceeds the maximum deflate ratio")
+    return {
+        'name': name,
+        'size': size,
+        'compressed_size': f.tell(),
+        'header_size': header_size
+    }
+
+
+def _gzip_is_multi_member(info: Dict) -> bool:
+    """
+    ISIZE が 1 メンバーとしては小さすぎるか（= 複数メンバーの gzip）
+    
+    1 メンバーの deflate データは無圧縮ブロックで格納した大きさ（ブロックヘッダ分だけ増える）を
+    超えないため、圧縮データがそれより大きければ ISIZE は最後のメンバーの分だけとわかる。
+    最後のメンバーが大きい複数メンバーの gzip は、展開しない限り区別できない。
+    
+    Args:
+        info: read_gzip_header の戻り値
+    
+    Returns:
+        複数メンバーと判定できれば True
+    """
+    payload = info['compressed_size'] - info['header_size'] - GZIP_TRAILER_SIZE
+    # 無圧縮ブロックのヘッダ（64 KiB ごとに 5 バイト）と同期フラッシュの空ブロックの分の余裕
+    return payload > info['size'] + (info['size'] >> 10) + 64
+
+
+def _gzip_contains_tar(f, header_size: int) -> bool:
+    """gzip の中身が tar か（先頭の 512 バイトだけ展開して ustar マジックを見る）"""
+    f.seek(header_size)
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    block = b''
+    while len(block) < 512:
+        chunk = f.read(4096)
+        if not chunk:
+            break
+        block += decompressor.decompress(chunk, 512 - len(block))
+        if decompressor.eof:
+            break
+    return block[TAR_MAGIC_OFFSET:TAR_MAGIC_OFFSET + 6] in TAR_MAGICS
+
+
+def _int_or_none(value: Optional[str]) -> Optional[int]:
+    """数値の文字列を int に（空・不正なら None）"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_7z_slt(lines: Iterable[str]) -> Iterator[Dict]:
+    """
+    `7z l -slt` の出力を 1 エントリずつ解析
+    
+    "----------" より後が「Key = Value」行のブロック（空行区切り）の並びになっている。
+    
+    Args:
+        lines: 出力の各行（ファイルオブジェクト可）
+    
+    Yields:
+        ZIP と同じ形のエントリ辞書（name, size, is_dir, compressed_size）
+    """
+    in_entries = False
+    fields = {}
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not in_entries:
+            in_entries = line.startswith('----------')
+            continue
+        
+        if not line:
+            if 'Path' in fields:
+                yield _7z_entry(fields)
+            fields = {}
+            continue
+        
+        if line.endswith(' ='):
+            fields[line[:-2]] = ''
+        else:
+            key, sep, value = line.partition(' = ')
+            if sep:
+                fields[key] = value
+    
+    if 'Path' in fields:
+        yield _7z_entry(fields)
+
+
+def _7z_entry(fields: Dict[str, str]) -> Dict:
+    """7z の 1 ブロックをエントリ辞書に（ソリッド圧縮では Packed Size が空のことがある）"""
+    return {
+        'name': fields['Path'],
+        'size': _int_or_none(fields.get('Size')) or 0,
+        'is_dir': fields.get('Folder') == '+' or fields.get('Attributes', '').startswith('D'),
+        'compressed_size': _int_or_none(fields.get('Packed Size'))
+    }
+
+
+def parse_unrar_lt(lines: Iterable[str]) -> Iterator[Dict]:
+    """
+    `unrar lt` の出力を 1 エントリずつ解析
+    
+    各エントリは「Key: Value」行のブロック（空行区切り）。Name の無いブロック
+    （先頭の Archive: / Details: など）は読み飛ばす。
+    
+    Args:
+        lines: 出力の各行（ファイルオブジェクト可）
+    
+    Yields:
+        ZIP と同じ形のエントリ辞書（name, size, is_dir, compressed_size）
+    """
+    fields = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if 'Name' in fields:
+                yield _unrar_entry(fields)
+            fields = {}
+            continue
+        
+        key, sep, value = line.partition(': ')
+        if sep:
+            fields[key] = value
+    
+    if 'Name' in fields:
+        yield _unrar_entry(fields)
+
+
+def _unrar_entry(fields: Dict[str, str]) -> Dict:
+    """unrar の 1 ブロックをエントリ辞書に"""
+    return {
+        'name': fields['Name'],
+        'size': _int_or_none(fields.get('Size')) or 0,
+        'is_dir': fields.get('Type') == 'Directory',
+        'compressed_size': _int_or_none(fields.get('Packed size'))
+    }
+
+
+def catalog_listing(archive_meta: Dict, max_entries: int) -> Dict:
+    """
+    カタログ用に一覧を先頭 max_entries 件に切り詰める
+    
+    全件はアーカイブ一覧キャッシュと転置インデックス（archive_index）にあるため、
+    カタログ（metadata.json）にはアーカイブごとに数万件の辞書を入れない。
+    切り詰めたら catalog_truncated を立てる（entry_count は元の件数のまま）。
+    
+    Args:
+        archive_meta: ArchiveListExtractor.extract の結果（変更しない）
+        max_entries: カタログに残す件数（0 なら切り詰めない）
+    
+    Returns:
+        切り詰めた写し（切り詰める必要が無ければ archive_meta そのもの）
+    """
+    entries = archive_meta.get('entries') or []
+    if max_entries <= 0 or len(entries) <= max_entries:
+        return archive_meta
+    compact = dict(archive_meta)
+    compact['entries'] = entries[:max_entries]
+    compact['catalog_truncated'] = True
+    return compact
+
+
 class ArchiveListExtractor:
     """アーカイブ中身一覧抽出器"""
     
-    def __init__(self, config: dict):
+    # 一覧の形・内容が変わったら上げる（アーカイブ一覧キャッシュが無効化される）
+    VERSION = 1
+    
+    def __init__(self, config: dict, throttle: Optional[IOThrottle] = None):
         """
         初期化
         
         Args:
             config: config.yaml から metadata セクション
+            throttle: I/O 制限（省略時はプロセス共有のもの）
         """
+        self.throttle = throttle or get_throttle()
         self.config = config
         self.max_entries = config.get('archive_max_entries', 50000)
         self.max_size_gb = config.get('archive_max_size_gb', 50)
         self.max_size_bytes = self.max_size_gb * 1024 * 1024 * 1024
+        self.command_timeout = float(config.get('archive_list_timeout_sec', 60))
+        self.cache = None
+        if config.get('archive_cache', True):
+            self.cache = ArchiveCache(config.get('archive_cache_path', 'data/raw/archive_cache.sqlite'))
     
     def extract(self, filepath: str) -> Dict:
         """
@@ -85,13 +341,48 @@ class ArchiveListExtractor:
             'error': None
         }
         
+        cache_key = None
+        if self.cache is not None and ext in ARCHIVE_EXTENSIONS:
+            cache_key = self._cache_key(filepath)
+            if cache_key is not None:
+                try:
+                    cached = self.cache.get(filepath, cache_key, self.max_entries, self.VERSION)
+                except Exception as e:
+                    logger.warning(f"Archive cache lookup failed for {filepath}: {e}")
+                    cached = None
+                if cached is not None:
+                    return cached
+        
+        meta = self._extract_listing(filepath, ext, meta)
+        if cache_key is not None:
+            try:
+                self.cache.put(filepath, cache_key, self.max_entries, self.VERSION, meta)
+            except Exception as e:
+                logger.warning(f"Archive cache write failed for {filepath}: {e}")
+        return meta
+    
+    def _extract_listing(self, filepath: str, ext: str, meta: Dict) -> Dict:
+        """
+        形式ごとに一覧を作る（キャッシュを使わない）
+        
+        Args:
+            filepath: アーカイブファイルパス
+            ext: 拡張子（小文字）
+            meta: メタデータ辞書（更新される）
+        
+        Returns:
+            メタデータ辞書
+        """
         try:
             if ext == '.zip':
                 return self._extract_zip(filepath, meta)
             
-            elif ext in ['.tar', '.gz', '.tgz']:
+            elif ext in ['.tar', '.tgz'] or filepath.lower().endswith('.tar.gz'):
                 return self._extract_tar(filepath, meta)
             
+            elif ext == '.gz':
+                return self._extract_gzip(filepath, meta)
+            
             elif ext in ['.7z', '.rar']:
                 return self._extract_external_command(filepath, ext, meta)
             
@@ -100,10 +391,29 @@ class ArchiveListExtractor:
         
         except Exception as e:
             meta['error'] = str(e)
+            meta['error_type'] = type(e).__name__
             logger.warning(f"Error extracting archive {filepath}: {e}")
         
         return meta
     
+    def _cache_key(self, filepath: str) -> Optional[Tuple[int, int, str]]:
+        """
+        キャッシュキー（先頭・末尾の数 KiB だけを読む）
+        
+        Args:
+            filepath: アーカイブファイルパス
+        
+        Returns:
+            (size, mtime_ns, fingerprint)。読めなければ None
+        """
+        try:
+            with open(filepath, 'rb') as raw:
+                stat = os.fstat(raw.fileno())
+                fingerprint = archive_fingerprint(ThrottledReader(raw, self.throttle), stat.st_size)
+            return stat.st_size, stat.st_mtime_ns, fingerprint
+        except OSError:
+            return None
+    
     def _extract_zip(self, filepath: str, meta: Dict) -> Dict:
         """
         ZIP ファイルを処理
@@ -119,33 +429,20 @@ class ArchiveListExtractor:
         Returns:
             メタデータ辞書
         """
-        if not ZIPFILE_AVAILABLE:
-            meta['error'] = "zipfile module not available"
-            return meta
-        
         try:
-            with zipfile.ZipFile(filepath, 'r') as zf:
-                infolist = zf.infolist()
+            # ZipInfo を全件作らず、上限件数までのレコードだけを読む
+            with open(filepath, 'rb') as raw, ZipDirectory(raw) as directory:
+                try:
+                    for entry in directory.entries(self.max_entries):
+                        self._append_entry(meta, entry)
+                finally:
+                    self.throttle.read(directory.bytes_read)
                 
-                for i, info in enumerate(infolist[:self.max_entries]):
-                    entry = {
-                        'name': info.filename,
-                        'size': info.file_size,
-                        'is_dir': info.is_dir(),
-                        'compressed_size': info.compress_size
-                    }
-                    
-                    # パストラバーサル検出
-                    if self._has_path_traversal(info.filename):
-                        entry['warning'] = "Possible path traversal"
-                        meta['warnings'].append(f"Path traversal in: {info.filename}")
-                    
-                    meta['entries'].append(entry)
-                    meta['total_size_bytes'] += info.file_size
-                
-                if len(infolist) > self.max_entries:
+                # 合計件数は EOCD の値
+                total = directory.total_entries
+                if total > self.max_entries:
                     meta['warnings'].append(
-                        f"Archive truncated: {len(infolist)} entries, showing {self.max_entries}"
+                        f"Archive truncated: {total} entries, showing {self.max_entries}"
                     )
                 
                 if meta['total_size_bytes'] > self.max_size_bytes:
@@ -153,10 +450,11 @@ class ArchiveListExtractor:
                         f"Large archive: {meta['total_size_bytes'] / (1024**3):.1f} GB"
                     )
                 
-                meta['entry_count'] = min(len(infolist), self.max_entries)
+                meta['entry_count'] = len(meta['entries'])
         
         except Exception as e:
             meta['error'] = str(e)
+            meta['error_type'] = type(e).__name__
         
         return meta
     
@@ -180,30 +478,22 @@ class ArchiveListExtractor:
             return meta
         
         try:
-            # 圧縮形式を自動判定
-            mode = 'r:*' if filepath.endswith(('.tar.gz', '.tgz')) else 'r:*'
-            
-            with tarfile.open(filepath, mode) as tf:
-                members = tf.getmembers()
-                
-                for i, member in enumerate(members[:self.max_entries]):
-                    entry = {
+            # 圧縮形式は自動判定。getmembers() は圧縮 tar を最後まで展開するため、
+            # next() で 1 件ずつ読み、上限件数に達したら止める
+            with open(filepath, 'rb') as raw, \
+                    tarfile.open(fileobj=ThrottledReader(raw, self.throttle), mode='r:*') as tf:
+                member = tf.next()
+                while member is not None and len(meta['entries']) < self.max_entries:
+                    self._append_entry(meta, {
                         'name': member.name,
                         'size': member.size,
                         'is_dir': member.isdir()
-                    }
-                    
-                    # パストラバーサル検出
-                    if self._has_path_traversal(member.name):
-                        entry['warning'] = "Possible path traversal"
-                        meta['warnings'].append(f"Path traversal in: {member.name}")
-                    
-                    meta['entries'].append(entry)
-                    meta['total_size_bytes'] += member.size
+                    })
+                    member = tf.next()
                 
-                if len(members) > self.max_entries:
+                if member is not None:
                     meta['warnings'].append(
-                        f"Archive truncated: {len(members)} entries, showing {self.max_entries}"
+                        f"Archive truncated: more than {self.max_entries} entries, showing {self.max_entries}"
                     )
                 
                 if meta['total_size_bytes'] > self.max_size_bytes:
@@ -211,13 +501,60 @@ class ArchiveListExtractor:
                         f"Large archive: {meta['total_size_bytes'] / (1024**3):.1f} GB"
                     )
                 
-                meta['entry_count'] = min(len(members), self.max_entries)
+                meta['entry_count'] = len(meta['entries'])
         
         except Exception as e:
             meta['error'] = str(e)
+            meta['error_type'] = type(e).__name__
         
         return meta
     
+    def _extract_gzip(self, filepath: str, meta: Dict) -> Dict:
+        """
+        単体の gzip を処理（中身が tar なら _extract_tar）
+        
+        【Phase 1 note】
+        Only the gzip header and trailer are read; nothing is decompressed
+        except the first tar block needed to tell a tarball from a single file.
+        
+        Args:
+            filepath: .gz ファイルパス
+            meta: メタデータ辞書（更新される）
+        
+        Returns:
+            メタデータ辞書
+        """
+        try:
+            with open(filepath, 'rb') as raw:
+                f = ThrottledReader(raw, self.throttle)
+                info = read_gzip_header(f)
+                if _gzip_contains_tar(f, info['header_size']):
+                    return self._extract_tar(filepath, meta)
+        except Exception as e:
+            meta['error'] = str(e)
+            meta['error_type'] = type(e).__name__
+            return meta
+        
+        # FNAME が無ければ .gz を除いたファイル名
+        name = info['name'] or os.path.basename(filepath)[:-3]
+        self._append_entry(meta, {
+            'name': name,
+            'size': info['size'],
+            'is_dir': False,
+            'compressed_size': info['compressed_size']
+        })
+        meta['entry_count'] = 1
+        
+        # ISIZE は 2^32 の剰余で、複数メンバーなら最後のメンバーの分だけ。
+        # どちらの場合も実際のサイズは ISIZE 以上なので、下限として残す
+        if info['compressed_size'] * DEFLATE_MAX_RATIO >= 1 << 32:
+            meta['size_is_lower_bound'] = True
+            meta['warnings'].append("Uncompressed size is only known modulo 4 GiB")
+        elif _gzip_is_multi_member(info):
+            meta['size_is_lower_bound'] = True
+            meta['warnings'].append("Multi-member gzip: uncompressed size covers only the last member")
+        return meta
+    
     def _extract_external_command(self, filepath: str, ext: str, meta: Dict) -> Dict:
         """
         外部コマンド（7z, rar）で処理
@@ -239,54 +576,121 @@ class ArchiveListExtractor:
             return meta
     
     def _extract_7z(self, filepath: str, meta: Dict) -> Dict:
-        """7z コマンドで処理"""
-        # 実装例：外部の 7z コマンドを呼び出す
-        # Phase 1では基本的なサポートのみ
-        try:
-            result = subprocess.run(
-                ['7z', 'l', filepath],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            if result.returncode == 0:
-                # パースロジック（簡略版）
-                meta['format'] = '.7z'
-                meta['info'] = "7z listing available"
-                # 本来はパースして entries を埋める
-            else:
-                meta['error'] = "7z command failed"
-        except FileNotFoundError:
+        """7z コマンド（`7z l -slt`）で処理"""
+        tools = get_tools()
+        if not tools.available('7z'):
             meta['error'] = "7z command not found"
-        except Exception as e:
-            meta['error'] = str(e)
+            return meta
         
-        return meta
+        meta['format'] = '.7z'
+        return self._list_with_command(
+            '7z', [tools.command('7z'), 'l', '-slt', filepath], parse_7z_slt, meta
+        )
     
     def _extract_rar(self, filepath: str, meta: Dict) -> Dict:
-        """RAR コマンドで処理"""
-        # unrar コマンドを使用
+        """RAR コマンド（`unrar lt`）で処理"""
+        tools = get_tools()
+        if not tools.available('unrar'):
+            meta['error'] = "unrar command not found"
+            return meta
+        
+        meta['format'] = '.rar'
+        # -p-: パスワードを問い合わせない
+        return self._list_with_command(
+            'unrar', [tools.command('unrar'), 'lt', '-p-', filepath], parse_unrar_lt, meta
+        )
+    
+    def _list_with_command(self, name: str, command: List[str], parser, meta: Dict) -> Dict:
+        """
+        一覧コマンドの出力をパイプから読みながら解析
+        
+        archive_max_entries 件に達したら読むのをやめて子プロセスを kill する
+        （巨大なソリッドアーカイブでも一覧の全体を待たない）。
+        archive_list_timeout_sec を超えた場合も kill し、それまでのエントリを残す。
+        
+        Args:
+            name: コマンド名（エラーメッセージ用）
+            command: 実行するコマンド
+            parser: 出力行 → エントリ辞書のジェネレータ関数
+            meta: メタデータ辞書（更新される）
+        
+        Returns:
+            メタデータ辞書
+        """
+        # ファイル名をロケールに依らず UTF-8 で受け取る
+        env = dict(os.environ, LC_ALL='C.UTF-8', LANG='C.UTF-8')
+        truncated = False
+        timed_out = threading.Event()
+        
         try:
-            result = subprocess.run(
-                ['unrar', 'l', filepath],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            if result.returncode == 0:
-                # パースロジック（簡略版）
-                meta['format'] = '.rar'
-                meta['info'] = "rar listing available"
-                # 本来はパースして entries を埋める
-            else:
-                meta['error'] = "unrar command failed"
+            with self.throttle.subprocess_slot():
+                process = subprocess.Popen(
+                    command,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    env=env,
+                    encoding='utf-8',
+                    errors='replace'
+                )
+                
+                def kill() -> None:
+                    timed_out.set()
+                    process.kill()
+                
+                timer = threading.Timer(self.command_timeout, kill)
+                timer.daemon = True
+                timer.start()
+                try:
+                    for entry in parser(process.stdout):
+                        if len(meta['entries']) >= self.max_entries:
+                            truncated = True
+                            break
+                        self._append_entry(meta, entry)
+                finally:
+                    timer.cancel()
+                    if process.poll() is None and (truncated or timed_out.is_set()):
+                        process.kill()
+                    process.stdout.close()
+                    stderr = process.stderr.read() if not truncated else ''
+                    process.stderr.close()
+                    returncode = process.wait()
         except FileNotFoundError:
-            meta['error'] = "unrar command not found"
-        except Exception as e:
-            meta['error'] = str(e)
+            meta['error'] = f"{name} command not found"
+            return meta
         
+        meta['entry_count'] = len(meta['entries'])
+        if truncated:
+            meta['warnings'].append(
+                f"Archive truncated: more than {self.max_entries} entries, showing {self.max_entries}"
+            )
+        elif timed_out.is_set():
+            meta['error'] = f"{name} listing timeout"
+            meta['error_type'] = 'TimeoutExpired'
+        elif returncode != 0:
+            message = stderr.strip().splitlines()
+            meta['error'] = f"{name} command failed" + (f": {message[-1]}" if message else "")
+        
+        if meta['total_size_bytes'] > self.max_size_bytes:
+            meta['warnings'].append(
+                f"Large archive: {meta['total_size_bytes'] / (1024**3):.1f} GB"
+            )
         return meta
     
+    def _append_entry(self, meta: Dict, entry: Dict) -> None:
+        """
+        エントリを追加（パストラバーサル検出・合計サイズの加算）
+        
+        Args:
+            meta: メタデータ辞書（更新される）
+            entry: エントリ辞書
+        """
+        if self._has_path_traversal(entry['name']):
+            entry['warning'] = "Possible path traversal"
+            meta['warnings'].append(f"Path traversal in: {entry['name']}")
+        meta['entries'].append(entry)
+        meta['total_size_bytes'] += entry['size']
+    
     def _has_path_traversal(self, path: str) -> bool:
         """
         パストラバーサル（../）の検出
@@ -307,7 +711,7 @@ if __name__ == '__main__':
         print("Usage: python archive_list.py <filepath>")
         sys.exit(1)
     
-    config = {'archive_max_entries': 50000, 'archive_max_size_gb': 50}
+    config = {'archive_max_entries': 50000, 'archive_max_size_gb': 50, 'archive_cache': False}
     extractor = ArchiveListExtractor(config)
     meta = extractor.extract(sys.argv[1])
     print(json.dumps(meta, indent=2, ensure_ascii=False))
@@ -0,0 +1,192 @@
+"""
+catalog_io.py - メタデータカタログの入出力
+
+走査結果（メタデータレコード）の保存形式：
+- .json                  : 従来の JSON 配列（全件をメモリに載せる）
+- .ndjson / .jsonl       : 1 行 1 レコード（逐次書き出し・逐次読み込み）
+- .ndjson.gz / .jsonl.gz : gzip 圧縮 NDJSON
+- .ndjson.zst / .jsonl.zst : zstd 圧縮 NDJSON（zstandard がある場合）
+
+NDJSON は見つけた順に書き出せるため、走査中もメモリ使用量が一定。
+書き込みは一時ファイルに行い、完了時に置き換える（途中で落ちても前回分は残る）。
+
+【Phase 1 design constraints】
+- This module serializes metadata records only; media contents are never stored.
+"""
+
+import os
+import io
+import gzip
+import json
+import logging
+from typing import Dict, Iterable, Iterator
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+
+NDJSON_SUFFIXES = ('.ndjson', '.jsonl')
+
+
+def is_ndjson_path(path: str) -> bool:
+    """
+    NDJSON 形式（圧縮含む）のパスか判定
+    
+    Args:
+        path: ファイルパス
+    
+    Returns:
+        NDJSON なら True
+    """
+    base = path.lower()
+    for suffix in ('.gz', '.zst'):
+        if base.endswith(suffix):
+            base = base[:-len(suffix)]
+    return base.endswith(NDJSON_SUFFIXES)
+
+
+def _compression_of(path: str) -> str:
+    """拡張子から圧縮形式を判定（'gz' / 'zst' / ''）"""
+    lower = path.lower()
+    if lower.endswith('.gz'):
+        return 'gz'
+    if lower.endswith('.zst'):
+        return 'zst'
+    return ''
+
+
+def _open_text(path: str, mode: str, compression: str):
+    """
+    （必要なら圧縮付きで）UTF-8 テキストストリームを開く
+    
+    Args:
+        path: ファイルパス
+        mode: 'r' または 'w'
+        compression: 'gz' / 'zst' / ''
+    
+    Returns:
+        テキストストリーム
+    """
+    if compression == 'gz':
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    
+    if compression == 'zst':
+        if not ZSTD_AVAILABLE:
+            raise ImportError("zstandard is required for .zst catalogs")
+        raw = open(path, mode + 'b')
+        if mode == 'w':
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    
+    return open(path, mode, encoding='utf-8')
+
+
+class NDJSONWriter:
+    """NDJSON カタログの逐次書き出し（with 文で使用）"""
+    
+    def __init__(self, output_path: str):
+        """
+        初期化
+        
+        Args:
+            output_path: 出力パス（.ndjson / .ndjson.gz / .ndjson.zst など）
+        """
+        self.output_path = output_path
+        self.tmp_path = output_path + '.tmp'
+        self.count = 0
+        self._f = None
+    
+    def __enter__(self) -> 'NDJSONWriter':
+        dirname = os.path.dirname(self.output_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        # 一時ファイルも出力パスと同じ圧縮形式で書く
+        self._f = _open_text(self.tmp_path, 'w', _compression_of(self.output_path))
+        return self
+    
+    def write(self, meta: Dict) -> None:
+        """
+        1 レコード書き出す
+        
+        Args:
+            meta: メタデータ辞書（CompactCatalog のレコードビューも可）
+        """
+        if not isinstance(meta, dict):
+            meta = dict(meta)
+        self._f.write(json.dumps(meta, ensure_ascii=False, separators=(',', ':')))
+        self._f.write('\n')
+        self.count += 1
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._f.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.output_path)
+        else:
+            try:
+                os.remove(self.tmp_path)
+            except OSError:
+                pass
+
+
+def write_records(output_path: str, records: Iterable[Dict]) -> int:
+    """
+    レコードをカタログに保存（形式は拡張子で判定）
+    
+    Args:
+        output_path: 出力パス
+        records: メタデータレコード（リスト・ジェネレータどちらでも可）
+    
+    Returns:
+        書き出した件数
+    """
+    if is_ndjson_path(output_path):
+        with NDJSONWriter(output_path) as writer:
+            for meta in records:
+                writer.write(meta)
+        return writer.count
+    
+    records = [meta if isinstance(meta, dict) else dict(meta) for meta in records]
+    dirname = os.path.dirname(output_path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    return len(records)
+
+
+def iter_records(input_path: str) -> Iterator[Dict]:
+    """
+    カタログのレコードを逐次読み込む（形式は拡張子で判定）
+    
+    NDJSON は 1 行ずつ読むためメモリ一定。
+    従来の JSON 配列は全体を読み込んでから 1 件ずつ返す。
+    
+    Args:
+        input_path: カタログのパス
+    
+    Yields:
+        メタデータ辞書
+    """
+    if not is_ndjson_path(input_path):
+        with open(input_path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+    
+    with _open_text(input_path, 'r', _compression_of(input_path)) as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                # 書き込み途中で落ちた末尾行などは飛ばして続行
+                logger.warning(f"Skipping malformed line {line_no} in {input_path}: {e}")
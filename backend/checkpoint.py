@@ -0,0 +1,239 @@
+"""
+checkpoint.py - 走査のチェックポイントと再開
+
+長時間の全走査が再起動・USB 切断・OOM などで中断されても、
+次回は止まった位置から再開できるようにする。
+
+ルートごとに以下を保存する：
+- 走査フロンティア（深さ優先スタックに残っている未走査ディレクトリ）
+- それまでに出力したレコード（スプール NDJSON とそのバイト位置）
+
+チェックポイントはディレクトリ単位の区切りでのみ取るため、
+「スプールに書いたレコード」と「フロンティア」は常に整合する。
+再開時はスプールのレコードを再出力し、走査済みのサブツリーには触れない。
+
+【Phase 1 design constraints】
+- Only traversal state and metadata records are persisted; no file contents.
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+CHECKPOINT_VERSION = 1
+STATE_FILE = 'state.json'
+
+
+class RootCheckpoint:
+    """1 ルート分のチェックポイント（走査スレッドから使う）"""
+    
+    def __init__(self, owner: 'ScanCheckpoint', index: int, root_path: str, state: Optional[Dict]):
+        """
+        初期化
+        
+        Args:
+            owner: 親の ScanCheckpoint
+            index: ルート番号（スプールファイル名に使用）
+            root_path: 走査ルート
+            state: 前回保存した状態（無ければ None）
+        """
+        self.owner = owner
+        self.root_path = root_path
+        self.spool_path = os.path.join(owner.checkpoint_dir, f"root_{index}.ndjson")
+        self.state = state or {'stack': None, 'offset': 0, 'count': 0, 'done': False}
+        self.last_saved = time.monotonic()
+        self._spool = None
+    
+    @property
+    def resumable(self) -> bool:
+        """前回の途中状態から再開できるか"""
+        return self.state['stack'] is not None or self.state['done']
+    
+    def replay(self) -> Iterator[Tuple[Dict, Optional[List[int]]]]:
+        """
+        前回までに出力したレコードを再出力
+        
+        チェックポイント以降に書かれた分（フロンティアと整合しない分）は切り捨てる。
+        
+        Yields:
+            (メタデータ, ファイル同一性 or None)
+        """
+        if not os.path.exists(self.spool_path):
+            return
+        
+        os.truncate(self.spool_path, self.state['offset'])
+        with open(self.spool_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                meta, ident = json.loads(line)
+                yield meta, ident
+    
+    def start_stack(self) -> List[str]:
+        """走査を始めるスタック（再開時は保存済みフロンティア）"""
+        if self.state['stack'] is not None:
+            logger.info(
+                f"Resuming {self.root_path}: {self.state['count']} records, "
+                f"{len(self.state['stack'])} directories pending"
+            )
+            return list(self.state['stack'])
+        return [self.root_path]
+    
+    def add(self, records: List[Dict], identities: Optional[Dict]) -> None:
+        """
+        1 ディレクトリ分のレコードをスプールに追記
+        
+        Args:
+            records: メタデータレコード
+            identities: path → ファイル同一性（記録していなければ None）
+        """
+        if not records:
+            return
+        if self._spool is None:
+            self._open_spool()
+        
+        for meta in records:
+            ident = identities.get(meta['path']) if identities is not None else None
+            self._spool.write(json.dumps([meta, ident], ensure_ascii=False, separators=(',', ':')))
+            self._spool.write('\n')
+        self.state['count'] += len(records)
+    
+    def _open_spool(self) -> None:
+        """
+        スプールを開く
+        
+        新規走査では前回（チェックポイントを保存せずに中断した走査）の残りを捨て、
+        再開時は保存済みの位置より後ろ（フロンティアと整合しない分）を切り捨ててから追記する。
+        """
+        os.makedirs(self.owner.checkpoint_dir, exist_ok=True)
+        if not self.resumable:
+            self._spool = open(self.spool_path, 'w', encoding='utf-8')
+            return
+        if os.path.exists(self.spool_path):
+            os.truncate(self.spool_path, self.state['offset'])
+        self._spool = open(self.spool_path, 'a', encoding='utf-8')
+    
+    def maybe_save(self, stack: List[str]) -> None:
+        """
+        前回保存から interval 秒経っていればチェックポイントを保存
+        
+        Args:
+            stack: 現在の深さ優先スタック（ディレクトリ区切りの時点）
+        """
+        if time.monotonic() - self.last_saved >= self.owner.interval_sec:
+            self.save(stack)
+    
+    def save(self, stack: Optional[List[str]], done: bool = False) -> None:
+        """
+        チェックポイントを保存
+        
+        Args:
+            stack: 現在の深さ優先スタック
+            done: このルートの走査が完了したか
+        """
+        if self._spool is not None:
+            self._spool.flush()
+            os.fsync(self._spool.fileno())
+            self.state['offset'] = self._spool.tell()
+        self.state['stack'] = list(stack) if stack is not None else []
+        self.state['done'] = done
+        self.last_saved = time.monotonic()
+        self.owner.save()
+    
+    def close(self) -> None:
+        """スプールを閉じる"""
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+
+
+class ScanCheckpoint:
+    """走査全体のチェックポイント（ルートごとの状態をまとめて保存）"""
+    
+    def __init__(self, checkpoint_dir: str = "data/raw/checkpoint", interval_sec: float = 60.0):
+        """
+        初期化
+        
+        Args:
+            checkpoint_dir: チェックポイント保存先ディレクトリ
+            interval_sec: チェックポイントの保存間隔（秒）
+        """
+        self.checkpoint_dir = checkpoint_dir
+        self.interval_sec = interval_sec
+        self.roots = {}
+        self._lock = threading.Lock()
+    
+    def begin(self, root_paths: List[str]) -> None:
+        """
+        走査開始：前回の状態を読み込む（ルート構成が違えば破棄して最初から）
+        
+        Args:
+            root_paths: 今回の走査ルート
+        """
+        saved = self._load()
+        if saved is not None and saved.get('roots_order') != root_paths:
+            logger.info("Checkpoint roots differ from current config - starting over")
+            self.discard()
+            saved = None
+        
+        states = (saved or {}).get('roots', {})
+        self.roots = {
+            root_path: RootCheckpoint(self, i, root_path, states.get(root_path))
+            for i, root_path in enumerate(root_paths)
+        }
+    
+    def for_root(self, root_path: str) -> Optional[RootCheckpoint]:
+        """ルートのチェックポイントを取得"""
+        return self.roots.get(root_path)
+    
+    def save(self) -> None:
+        """全ルートの状態をまとめて保存（一時ファイル経由）"""
+        with self._lock:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            state = {
+                'version': CHECKPOINT_VERSION,
+                'roots_order': list(self.roots),
+                'roots': {root_path: root.state for root_path, root in self.roots.items()}
+            }
+            path = os.path.join(self.checkpoint_dir, STATE_FILE)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + '.tmp', path)
+    
+    def complete(self) -> None:
+        """走査完了：チェックポイントを削除"""
+        for root in self.roots.values():
+            root.close()
+        self.discard()
+    
+    def close(self) -> None:
+        """中断時：スプールを閉じる（状態は最後の保存時点のまま残る）"""
+        for root in self.roots.values():
+            root.close()
+    
+    def discard(self) -> None:
+        """チェックポイントを破棄"""
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+    
+    def _load(self) -> Optional[Dict]:
+        """保存済みの状態を読み込む（無い・壊れている場合は None）"""
+        path = os.path.join(self.checkpoint_dir, STATE_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('version') != CHECKPOINT_VERSION:
+                return None
+            return state
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Error loading checkpoint {path}: {e}")
+            return None
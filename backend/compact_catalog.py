@@ -0,0 +1,277 @@
+"""
+compact_catalog.py - 省メモリな列指向カタログ
+
+走査レコードを 1 件 1 辞書で持つと、9 キー＋入れ子の sidecar_files 辞書で
+1 件あたり 1KB 前後になり、500 万ファイルでは数 GB〜十数 GB に達する。
+ここでは同じレコードを列ごとに詰めて保持する：
+
+- path        : ディレクトリ部分は intern したテーブルの番号、ファイル名は UTF-8 の連結バッファ
+- name / name_without_ext / ext : ファイル名から導出（走査時と同じ規則）
+- size        : array('q')
+- mtime       : ISO 文字列ではなく naive datetime のマイクロ秒を array('q') に
+- kind        : 種別コード array('B')
+- sidecar_files と、抽出器が追加したキー（video_meta など）: 該当レコードのみの疎な辞書
+
+各レコードは CatalogRecord（辞書と同じように読めるビュー）として取り出せるため、
+MediaIndexer._create_document などはそのまま使える。
+
+【Phase 1 design constraints】
+- Only scan metadata records are stored; media contents are never read.
+"""
+
+import os
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+# 列で持つキー（この順で辞書に戻す。走査レコードと同じ順序）
+BASE_KEYS = ('path', 'name', 'name_without_ext', 'ext', 'size', 'mtime', 'kind', 'sidecar_files')
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class CatalogRecord(MutableMapping):
+    """CompactCatalog の 1 レコード分のビュー（辞書として読み書きできる）"""
+    
+    __slots__ = ('_catalog', '_index')
+    
+    def __init__(self, catalog: 'CompactCatalog', index: int):
+        self._catalog = catalog
+        self._index = index
+    
+    def __getitem__(self, key: str):
+        return self._catalog._get_field(self._index, key)
+    
+    def __setitem__(self, key: str, value) -> None:
+        self._catalog._set_field(self._index, key, value)
+    
+    def __delitem__(self, key: str) -> None:
+        self._catalog._del_field(self._index, key)
+    
+    def __contains__(self, key) -> bool:
+        return key in BASE_KEYS or key in self._catalog._extras.get(self._index, ())
+    
+    def __iter__(self) -> Iterator[str]:
+        yield from BASE_KEYS
+        for key in self._catalog._extras.get(self._index, {}):
+            if key not in BASE_KEYS:
+                yield key
+    
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+    
+    def __repr__(self) -> str:
+        return f"CatalogRecord({self.to_dict()!r})"
+    
+    def to_dict(self) -> Dict:
+        """通常の辞書に戻す（JSON 書き出し用）"""
+        return {key: self[key] for key in self}
+
+
+class CompactCatalog:
+    """走査レコードの列指向ストア（list of dict の代わりに使う）"""
+    
+    def __init__(self, records: Optional[Iterable[Dict]] = None):
+        """
+        初期化
+        
+        Args:
+            records: 最初に追加するレコード
+        """
+        # ディレクトリ部分（末尾の区切り文字まで）の intern テーブル
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self._dir_idx = array('I')
+        # ファイル名は UTF-8（surrogatepass）で連結し、開始位置を持つ
+        self._names = bytearray()
+        self._name_offsets = array('Q', [0])
+        self._size = array('q')
+        self._mtime_us = array('q')
+        self._kinds: List[str] = []
+        self._kind_ids: Dict[str, int] = {}
+        self._kind = array('B')
+        # 疎な列：付随ファイル・抽出結果・列に収まらない値（index → {key: value}）
+        self._sidecars: Dict[int, Dict] = {}
+        self._extras: Dict[int, Dict] = {}
+        
+        if records is not None:
+            self.extend(records)
+    
+    def __len__(self) -> int:
+        return len(self._size)
+    
+    def __getitem__(self, index: int) -> CatalogRecord:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return CatalogRecord(self, index)
+    
+    def __setitem__(self, index: int, meta: Dict) -> None:
+        """レコードを丸ごと置き換える（scan_incremental で前回レコードを引き継ぐ場合など）"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        self._extras.pop(index, None)
+        self._sidecars.pop(index, None)
+        current = self[index]
+        for key, value in meta.items():
+            current[key] = value
+    
+    def __iter__(self) -> Iterator[CatalogRecord]:
+        for index in range(len(self)):
+            yield CatalogRecord(self, index)
+    
+    def iter_dicts(self) -> Iterator[Dict]:
+        """レコードを通常の辞書として順に返す"""
+        for record in self:
+            yield record.to_dict()
+    
+    def append(self, meta: Dict) -> None:
+        """
+        レコードを 1 件追加
+        
+        Args:
+            meta: 走査レコード（走査器の出力形式。追加のキーがあっても可）
+        """
+        index = len(self)
+        path = meta['path']
+        name = meta.get('name', os.path.basename(path))
+        extras = {}
+        
+        # パス = ディレクトリ部分 + ファイル名（一致しない場合はそのまま持つ）
+        if name and path.endswith(name):
+            prefix = path[:len(path) - len(name)]
+        else:
+            prefix = ''
+            extras['path'] = path
+        
+        dir_id = self._dir_ids.get(prefix)
+        if dir_id is None:
+            dir_id = len(self._dirs)
+            self._dirs.append(prefix)
+            self._dir_ids[prefix] = dir_id
+        self._dir_idx.append(dir_id)
+        
+        self._names += name.encode('utf-8', 'surrogatepass')
+        self._name_offsets.append(len(self._names))
+        
+        self._size.append(int(meta.get('size', 0)))
+        self._mtime_us.append(0)
+        self._kind.append(0)
+        self._set_mtime(index, meta.get('mtime'), extras)
+        self._set_kind(index, meta.get('kind', 'unknown'))
+        
+        # ファイル名から導出できない値だけ別に持つ
+        name_without_ext, ext = os.path.splitext(name)
+        if meta.get('name_without_ext', name_without_ext) != name_without_ext:
+            extras['name_without_ext'] = meta['name_without_ext']
+        if meta.get('ext', ext.lower()) != ext.lower():
+            extras['ext'] = meta['ext']
+        
+        sidecars = meta.get('sidecar_files')
+        if sidecars:
+            self._sidecars[index] = sidecars
+        
+        for key, value in meta.items():
+            if key not in BASE_KEYS:
+                extras[key] = value
+        if extras:
+            self._extras[index] = extras
+    
+    def extend(self, records: Iterable[Dict]) -> None:
+        """レコードをまとめて追加"""
+        for meta in records:
+            self.append(meta)
+    
+    def _name(self, index: int) -> str:
+        start, end = self._name_offsets[index], self._name_offsets[index + 1]
+        return self._names[start:end].decode('utf-8', 'surrogatepass')
+    
+    def _set_mtime(self, index: int, mtime, extras: Dict) -> None:
+        """ISO 文字列の mtime をマイクロ秒で格納（変換できなければ extras に持つ）"""
+        try:
+            self._mtime_us[index] = (datetime.fromisoformat(mtime) - _EPOCH) // _MICROSECOND
+            extras.pop('mtime', None)
+        except (TypeError, ValueError, OverflowError):
+            extras['mtime'] = mtime
+    
+    def _set_kind(self, index: int, kind: str) -> None:
+        kind_id = self._kind_ids.get(kind)
+        if kind_id is None:
+            kind_id = len(self._kinds)
+            self._kinds.append(kind)
+            self._kind_ids[kind] = kind_id
+        self._kind[index] = kind_id
+    
+    def _get_field(self, index: int, key: str):
+        extras = self._extras.get(index)
+        if extras is not None and key in extras:
+            return extras[key]
+        
+        if key == 'path':
+            return self._dirs[self._dir_idx[index]] + self._name(index)
+        if key == 'name':
+            return self._name(index)
+        if key == 'name_without_ext':
+            return os.path.splitext(self._name(index))[0]
+        if key == 'ext':
+            return os.path.splitext(self._name(index))[1].lower()
+        if key == 'size':
+            return self._size[index]
+        if key == 'mtime':
+            return (_EPOCH + self._mtime_us[index] * _MICROSECOND).isoformat()
+        if key == 'kind':
+            return self._kinds[self._kind[index]]
+        if key == 'sidecar_files':
+            # 付随ファイルが無いレコードは毎回新しい空辞書を返す（変更は代入で行う）
+            return self._sidecars.get(index, {})
+        raise KeyError(key)
+    
+    def _set_field(self, index: int, key: str, value) -> None:
+        extras = self._extras.setdefault(index, {})
+        if key == 'size' and isinstance(value, int):
+            self._size[index] = value
+            extras.pop(key, None)
+        elif key == 'mtime':
+            self._set_mtime(index, value, extras)
+        elif key == 'kind' and isinstance(value, str):
+            self._set_kind(index, value)
+            extras.pop(key, None)
+        elif key == 'sidecar_files' and isinstance(value, dict):
+            if value:
+                self._sidecars[index] = value
+            else:
+                self._sidecars.pop(index, None)
+            extras.pop(key, None)
+        elif key in ('path', 'name', 'name_without_ext', 'ext') and value == self._derived(index, key):
+            extras.pop(key, None)
+        else:
+            # path / name の変更や型の違う値は列に収めず上書き値として持つ
+            extras[key] = value
+        if not extras:
+            del self._extras[index]
+    
+    def _del_field(self, index: int, key: str) -> None:
+        if key in BASE_KEYS:
+            raise KeyError(f"cannot delete base field: {key}")
+        extras = self._extras.get(index)
+        if extras is None or key not in extras:
+            raise KeyError(key)
+        del extras[key]
+        if not extras:
+            del self._extras[index]
+    
+    def _derived(self, index: int, key: str) -> str:
+        """列から組み立てた値（上書き値を無視）"""
+        name = self._name(index)
+        if key == 'path':
+            return self._dirs[self._dir_idx[index]] + name
+        if key == 'name':
+            return name
+        name_without_ext, ext = os.path.splitext(name)
+        return name_without_ext if key == 'name_without_ext' else ext.lower()
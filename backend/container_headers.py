@@ -0,0 +1,810 @@
+"""
+container_headers.py - MP4/MOV・Matroska/WebM のヘッダ解析（ffprobe を起動しない高速経路）
+
+コンテナのヘッダ部分だけを seek / read で読み、VideoAudioMetaExtractor._parse_ffprobe_output と
+同じ形（duration_sec / tags / video / audio）のメタデータを作る。
+
+- MP4/MOV      : moov 内の mvhd（長さ）、trak ごとの mdhd / hdlr（時間単位・種別・言語）、
+                 stsd（コーデック・解像度・チャンネル数・サンプリング周波数）、stts（フレームレート）、
+                 stsz（ビットレート）、udta の ilst / ©xxx（タグ）
+- Matroska/WebM: EBML ヘッダ、Segment の Info（長さ・タイトル）・Tracks・Tags・Attachments
+                 （最初の Cluster より後ろにある要素は SeekHead から探す）
+
+ffprobe と同じ結果を出せないもの（未対応のコーデック、断片化 MP4、カバー画像付きのファイルなど）は
+None を返すか該当項目を None にし、呼び出し側で ffprobe にフォールバックさせる。
+
+【Phase 1 design constraints】
+- Only container headers and sample tables are read; media samples are never decoded.
+"""
+
+import io
+import os
+import struct
+from fractions import Fraction
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# 拡張子 → コンテナ形式
+NATIVE_EXTENSIONS = {
+    '.mp4': 'mp4',
+    '.m4v': 'mp4',
+    '.mov': 'mp4',
+    '.mkv': 'matroska',
+    '.webm': 'matroska'
+}
+
+# 1 つのヘッダ要素として読む最大バイト数（壊れたサイズ値で巨大な読み込みをしない）
+MAX_HEADER_READ = 1 << 20
+
+# ビットレート計算のために読む stsz の上限（4 バイト × サンプル数。25fps の映像で約 11 分）
+# これより長いトラックはビットレートを None にする（ヘッダ解析は数 KB〜数十 KB の読み込みに留める）
+MAX_STSZ_READ = 64 << 10
+
+# mdhd の言語コード「指定なし」（ffprobe は言語を出さない）
+MP4_LANGUAGE_UNSPECIFIED = 0x7FFF
+
+# フレームレートを求める stts のエントリ数上限（これを超える可変フレームレートは ffprobe に任せる）
+MAX_STTS_ENTRIES = 4096
+
+# Matroska で最初の Cluster を探すまでに見る Segment 直下の要素数
+MAX_SEGMENT_CHILDREN = 64
+
+
+# ---- MP4 / MOV -------------------------------------------------------------
+
+# stsd のサンプルエントリ → ffprobe の codec_name
+MP4_VIDEO_CODECS = {
+    b'avc1': 'h264', b'avc3': 'h264',
+    b'hvc1': 'hevc', b'hev1': 'hevc', b'dvh1': 'hevc', b'dvhe': 'hevc',
+    b'av01': 'av1',
+    b'vp09': 'vp9', b'vp08': 'vp8',
+    b'apch': 'prores', b'apcn': 'prores', b'apcs': 'prores', b'apco': 'prores',
+    b'ap4h': 'prores', b'ap4x': 'prores',
+    b'jpeg': 'mjpeg', b'mjpa': 'mjpeg',
+    b'h263': 'h263', b's263': 'h263'
+}
+MP4_AUDIO_CODECS = {
+    b'ac-3': 'ac3', b'ec-3': 'eac3',
+    b'Opus': 'opus', b'fLaC': 'flac', b'alac': 'alac', b'.mp3': 'mp3'
+}
+# mp4a の esds にある objectTypeIndication → codec_name
+MP4A_OBJECT_TYPES = {0x40: 'aac', 0x66: 'aac', 0x67: 'aac', 0x68: 'aac', 0x69: 'mp3', 0x6B: 'mp3'}
+
+# udta のタグ → _parse_ffprobe_output が使うキー
+MP4_TAGS = {b'\xa9nam': 'title', b'\xa9ART': 'artist', b'\xa9alb': 'album', b'\xa9day': 'date'}
+
+
+def _read_at(f, pos: int, size: int) -> bytes:
+    """pos から size バイト読む（足りなければ ValueError。上限は MAX_HEADER_READ）"""
+    if size > MAX_HEADER_READ:
+        raise ValueError(f"Header too large: {size} bytes")
+    f.seek(pos)
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError("Truncated header")
+    return data
+
+
+def _iter_boxes(f, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    start〜end にある MP4 ボックスを順に返す（中身は読まない）
+    
+    Yields:
+        (ボックス種別, 中身の開始位置, 中身の終了位置)
+    """
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack('>Q', large)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            raise ValueError(f"Invalid box size: {box_type!r}")
+        yield box_type, pos + header_size, min(pos + size, end)
+        pos += size
+
+
+def _find_box(f, start: int, end: int, path: Tuple[bytes, ...]) -> Optional[Tuple[int, int]]:
+    """path の順に子ボックスをたどる（見つからなければ None）"""
+    for box_type, box_start, box_end in _iter_boxes(f, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return box_start, box_end
+            return _find_box(f, box_start, box_end, path[1:])
+    return None
+
+
+def parse_mp4(f) -> Optional[Dict]:
+    """
+    MP4 / MOV のヘッダを解析
+    
+    Args:
+        f: バイナリモードで開いたファイル（seek 可能）
+    
+    Returns:
+        _parse_ffprobe_output と同じ形のメタデータ（対応していない構造なら None）
+    """
+    file_end = f.seek(0, os.SEEK_END)
+    
+    # moov はファイル末尾にあることもある（mdat は読まずに飛ばす）
+    moov = None
+    for box_type, start, end in _iter_boxes(f, 0, file_end):
+        if box_type == b'moov':
+            moov = (start, end)
+            break
+    if moov is None:
+        return None
+    
+    timescale = duration = 0
+    tags = {'title': None, 'artist': None, 'album': None, 'date': None}
+    tracks = []
+    for box_type, start, end in _iter_boxes(f, *moov):
+        if box_type == b'mvhd':
+            data = _read_at(f, start, min(end - start, 32))
+            if data[0] == 1:
+                timescale, duration = struct.unpack('>IQ', data[20:32])
+            else:
+                timescale, duration = struct.unpack('>II', data[12:20])
+        elif box_type == b'mvex':
+            # 断片化 MP4（長さ・サンプル表が moof 側にある）
+            return None
+        elif box_type == b'trak':
+            tracks.append(_parse_mp4_track(f, start, end))
+        elif box_type in (b'udta', b'meta'):
+            if not _parse_mp4_tags(f, box_type, start, end, tags):
+                # カバー画像は ffprobe では映像ストリームとして出るため揃えられない
+                return None
+    
+    if not timescale or not duration:
+        return None
+    
+    # MP4 は major_brand などのタグが必ずあるため、ffprobe の出力では tags が常に存在する
+    meta = {'duration_sec': round(duration / timescale, 6), 'tags': tags}
+    for kind, stream in tracks:
+        if kind == 'video':
+            meta['video'] = stream
+        elif kind == 'audio':
+            meta.setdefault('audio', []).append(stream)
+    return meta
+
+
+def _parse_mp4_track(f, start: int, end: int) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    trak ボックスを解析
+    
+    Returns:
+        ('video' / 'audio' / None, ストリーム情報)
+    """
+    mdia = _find_box(f, start, end, (b'mdia',))
+    if mdia is None:
+        return None, None
+    
+    timescale = duration = language = handler = None
+    stbl = None
+    for box_type, box_start, box_end in _iter_boxes(f, *mdia):
+        if box_type == b'mdhd':
+            data = _read_at(f, box_start, min(box_end - box_start, 36))
+            if data[0] == 1:
+                timescale, duration, language = struct.unpack('>IQH', data[20:34])
+            else:
+                timescale, duration, language = struct.unpack('>IIH', data[12:22])
+        elif box_type == b'hdlr':
+            handler = _read_at(f, box_start, 12)[8:12]
+        elif box_type == b'minf':
+            stbl = _find_box(f, box_start, box_end, (b'stbl',))
+    
+    if handler not in (b'vide', b'soun') or stbl is None or not timescale:
+        return None, None
+    
+    entry = fps = bitrate = None
+    for box_type, box_start, box_end in _iter_boxes(f, *stbl):
+        if box_type == b'stsd':
+            entry = (box_start, box_end)
+        elif box_type == b'stts' and handler == b'vide':
+            fps = _mp4_frame_rate(f, box_start, box_end, timescale)
+        elif box_type == b'stsz':
+            bitrate = _mp4_bitrate(f, box_start, box_end, timescale, duration)
+    if entry is None:
+        return None, None
+    
+    if handler == b'vide':
+        return 'video', _parse_mp4_video_entry(f, *entry, fps, bitrate)
+    return 'audio', _parse_mp4_audio_entry(f, *entry, timescale, bitrate, _mp4_language(language))
+
+
+def _parse_mp4_video_entry(f, start: int, end: int, fps: Optional[float],
+                           bitrate: Optional[str]) -> Dict:
+    """stsd の最初の映像サンプルエントリを解析"""
+    data = _read_at(f, start, min(end - start, 8 + 8 + 36))
+    # stsd: version/flags(4) entry_count(4)、エントリ: size(4) 種別(4) reserved(6) dref(2) pre_defined 等(16) 幅(2) 高さ(2)
+    fourcc = data[12:16]
+    width, height = struct.unpack('>HH', data[40:44])
+    return {
+        'codec': MP4_VIDEO_CODECS.get(fourcc),
+        'width': width,
+        'height': height,
+        'fps': fps,
+        'bitrate': bitrate
+    }
+
+
+def _parse_mp4_audio_entry(f, start: int, end: int, timescale: int, bitrate: Optional[str],
+                           language: Optional[str]) -> Dict:
+    """stsd の最初の音声サンプルエントリを解析"""
+    entry_size = struct.unpack('>I', _read_at(f, start + 8, 4))[0]
+    entry_start = start + 8
+    entry_end = min(entry_start + entry_size, end)
+    data = _read_at(f, entry_start, min(entry_end - entry_start, 8 + 56))
+    fourcc = data[4:8]
+    
+    # SoundDescription: version(2) revision(2) vendor(4) channels(2) sample_size(2) ... sample_rate(16.16)
+    version = struct.unpack('>H', data[16:18])[0]
+    channels = struct.unpack('>H', data[24:26])[0]
+    sample_rate = struct.unpack('>I', data[32:36])[0] >> 16
+    children = entry_start + 36
+    if version == 1:
+        children += 16
+    elif version == 2:
+        sample_rate = int(struct.unpack('>d', data[40:48])[0])
+        channels = struct.unpack('>I', data[48:52])[0]
+        children += 36
+    
+    codec = MP4_AUDIO_CODECS.get(fourcc)
+    if fourcc == b'mp4a':
+        codec = MP4A_OBJECT_TYPES.get(_mp4a_object_type(f, children, entry_end))
+    
+    return {
+        'codec': codec,
+        'sample_rate': str(sample_rate or timescale),
+        'channels': channels,
+        'bitrate': bitrate,
+        'language': language
+    }
+
+
+def _mp4a_object_type(f, start: int, end: int) -> Optional[int]:
+    """mp4a の esds（QuickTime では wave の中）から objectTypeIndication を取り出す"""
+    esds = _find_box(f, start, end, (b'esds',)) or _find_box(f, start, end, (b'wave', b'esds'))
+    if esds is None:
+        return None
+    data = _read_at(f, esds[0], min(esds[1] - esds[0], 256))
+    
+    pos = 4  # version/flags
+    while pos < len(data):
+        tag = data[pos]
+        pos += 1
+        # 記述子の長さ（7 ビットずつ、最大 4 バイト）
+        for _ in range(4):
+            if pos >= len(data):
+                return None
+            more = data[pos] & 0x80
+            pos += 1
+            if not more:
+                break
+        if tag == 0x03:
+            # ES_Descriptor: ES_ID(2) flags(1) [依存 ES_ID(2)] [URL] [OCR_ES_ID(2)]
+            flags = data[pos + 2]
+            pos += 3
+            if flags & 0x80:
+                pos += 2
+            if flags & 0x40:
+                pos += 1 + data[pos]
+            if flags & 0x20:
+                pos += 2
+        elif tag == 0x04:
+            return data[pos] if pos < len(data) else None
+        else:
+            return None
+    return None
+
+
+def _mp4_frame_rate(f, start: int, end: int, timescale: int) -> Optional[float]:
+    """stts から最も多いフレーム間隔でフレームレートを求める"""
+    count = struct.unpack('>I', _read_at(f, start + 4, 4))[0]
+    if not count or count > MAX_STTS_ENTRIES:
+        return None
+    entries = struct.unpack(f'>{count * 2}I', _read_at(f, start + 8, count * 8))
+    
+    frames = {}
+    for sample_count, delta in zip(entries[::2], entries[1::2]):
+        if delta:
+            frames[delta] = frames.get(delta, 0) + sample_count
+    if not frames:
+        return None
+    delta = max(frames, key=frames.get)
+    return float(Fraction(timescale, delta))
+
+
+def _mp4_bitrate(f, start: int, end: int, timescale: int, duration: Optional[int]) -> Optional[str]:
+    """
+    stsz のサンプルサイズ合計とトラック長からビットレートを求める（ffprobe と同じ計算）
+    
+    サンプルごとのサイズ表が MAX_STSZ_READ を超える長いトラックは読まずに None を返す。
+    """
+    if not duration:
+        return None
+    sample_size, count = struct.unpack('>II', _read_at(f, start + 4, 8))
+    if sample_size:
+        data_size = sample_size * count
+    elif count * 4 <= MAX_STSZ_READ:
+        data_size = sum(struct.unpack(f'>{count}I', _read_at(f, start + 12, count * 4)))
+    else:
+        return None
+    if not data_size:
+        return None
+    return str((data_size * 8 * timescale + duration // 2) // duration)
+
+
+def _mp4_language(code: Optional[int]) -> Optional[str]:
+    """mdhd の言語コード（ISO 639-2 を 5 ビット × 3 に詰めたもの）を文字列に"""
+    if code is None or code == MP4_LANGUAGE_UNSPECIFIED:
+        return None
+    if code >= 0x400:
+        language = ''.join(chr(((code >> shift) & 0x1F) + 0x60) for shift in (10, 5, 0))
+        # a-z 以外を含むもの（壊れた値）は言語として扱わない
+        return language if all('a' <= c <= 'z' for c in language) else None
+    # 0x400 未満は Macintosh の言語番号（0 = 英語）。他は ffprobe の表を持たないので扱わない
+    return 'eng' if code == 0 else None
+
+
+def _parse_mp4_tags(f, box_type: bytes, start: int, end: int, tags: Dict) -> bool:
+    """
+    udta / meta からタグを読む
+    
+    Returns:
+        ffprobe と同じ結果を出せるか（カバー画像があれば False）
+    """
+    if box_type == b'udta':
+        for child_type, child_start, child_end in _iter_boxes(f, start, end):
+            if child_type == b'meta':
+                if not _parse_mp4_tags(f, child_type, child_start, child_end, tags):
+                    return False
+            elif child_type in MP4_TAGS:
+                # QuickTime 形式: 長さ(2) 言語(2) 文字列
+                data = _read_at(f, child_start, min(child_end - child_start, 4096))
+                if len(data) >= 4:
+                    length = struct.unpack('>H', data[:2])[0]
+                    tags[MP4_TAGS[child_type]] = data[4:4 + length].decode('utf-8', errors='replace')
+        return True
+    
+    # ISO の meta は version/flags(4) を持つが、QuickTime の meta は持たない
+    if _read_at(f, start, min(end - start, 8))[4:8] != b'hdlr':
+        start += 4
+    ilst = _find_box(f, start, end, (b'ilst',))
+    if ilst is None:
+        return True
+    for item_type, item_start, item_end in _iter_boxes(f, *ilst):
+        if item_type == b'covr':
+            return False
+        if item_type in MP4_TAGS:
+            value = _find_box(f, item_start, item_end, (b'data',))
+            if value is not None:
+                data = _read_at(f, value[0], min(value[1] - value[0], 4096))
+                # data: 型(4) ロケール(4) 値
+                tags[MP4_TAGS[item_type]] = data[8:].decode('utf-8', errors='replace')
+    return True
+
+
+# ---- Matroska / WebM ------------------------------------------------------
+
+EBML_HEADER = 0x1A45DFA3
+EBML_DOC_TYPE = 0x4282
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMESTAMP_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TITLE = 0x7BA9
+DATE_UTC = 0x4461
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+LANGUAGE = 0x22B59C
+DEFAULT_DURATION = 0x23E383
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+AUDIO = 0xE1
+SAMPLING_FREQUENCY = 0xB5
+OUTPUT_SAMPLING_FREQUENCY = 0x78B5
+CHANNELS = 0x9F
+BIT_DEPTH = 0x6264
+TAGS = 0x1254C367
+TAG = 0x7373
+TARGETS = 0x63C0
+TARGET_UIDS = (0x63C4, 0x63C5, 0x63C6, 0x63C9)  # Chapter / Track / Attachment / Edition
+SIMPLE_TAG = 0x67C8
+TAG_NAME = 0x45A3
+TAG_STRING = 0x4487
+ATTACHMENTS = 0x1941A469
+ATTACHED_FILE = 0x61A7
+FILE_MIME_TYPE = 0x4660
+CLUSTER = 0x1F43B675
+
+# CodecID → ffprobe の codec_name
+MATROSKA_CODECS = {
+    'V_MPEG4/ISO/AVC': 'h264',
+    'V_MPEGH/ISO/HEVC': 'hevc',
+    'V_AV1': 'av1',
+    'V_VP8': 'vp8',
+    'V_VP9': 'vp9',
+    'V_MPEG4/ISO/ASP': 'mpeg4',
+    'V_MPEG4/ISO/SP': 'mpeg4',
+    'V_MPEG4/ISO/AP': 'mpeg4',
+    'V_MPEG2': 'mpeg2video',
+    'V_MPEG1': 'mpeg1video',
+    'V_THEORA': 'theora',
+    'V_PRORES': 'prores',
+    'V_MJPEG': 'mjpeg',
+    'A_AAC': 'aac',
+    'A_MPEG/L3': 'mp3',
+    'A_MPEG/L2': 'mp2',
+    'A_AC3': 'ac3',
+    'A_EAC3': 'eac3',
+    'A_DTS': 'dts',
+    'A_TRUEHD': 'truehd',
+    'A_OPUS': 'opus',
+    'A_VORBIS': 'vorbis',
+    'A_FLAC': 'flac',
+    'A_ALAC': 'alac'
+}
+
+# ffprobe がフォーマットのタグとして出すもののうち、_parse_ffprobe_output が使うキー
+MATROSKA_TAG_KEYS = ('title', 'artist', 'album', 'date')
+
+
+def _read_vint(f, keep_marker: bool = False) -> Tuple[Optional[int], int]:
+    """
+    EBML の可変長整数を読む
+    
+    Args:
+        f: ファイル
+        keep_marker: 先頭の長さビットを残すか（要素 ID は残す）
+    
+    Returns:
+        (値（サイズ不明なら None）, バイト数)
+    """
+    first = f.read(1)
+    if not first:
+        raise ValueError("Unexpected end of EBML data")
+    byte = first[0]
+    length = 1
+    mask = 0x80
+    while not byte & mask:
+        mask >>= 1
+        length += 1
+        if not mask:
+            raise ValueError("Invalid EBML variable-length integer")
+    
+    rest = f.read(length - 1)
+    if len(rest) < length - 1:
+        raise ValueError("Unexpected end of EBML data")
+    value = byte if keep_marker else byte & (mask - 1)
+    for b in rest:
+        value = (value << 8) | b
+    
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return None, length
+    return value, length
+
+
+def _iter_elements(f, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """
+    start〜end にある EBML 要素を順に返す（中身は読まない）
+    
+    Yields:
+        (要素 ID, 中身の開始位置, 中身の終了位置。サイズ不明なら end)
+    """
+    pos = start
+    while pos < end:
+        f.seek(pos)
+        element_id, id_length = _read_vint(f, keep_marker=True)
+        size, size_length = _read_vint(f)
+        data_start = pos + id_length + size_length
+        data_end = end if size is None else min(data_start + size, end)
+        yield element_id, data_start, data_end
+        pos = data_end
+
+
+def _read_children(f, start: int, end: int) -> io.BytesIO:
+    """要素の中身をメモリに読む（小さいヘッダ要素用）"""
+    return io.BytesIO(_read_at(f, start, min(end - start, MAX_HEADER_READ)))
+
+
+def _uint(data: bytes) -> int:
+    return int.from_bytes(data, 'big')
+
+
+def _float(data: bytes) -> float:
+    if len(data) == 4:
+        return struct.unpack('>f', data)[0]
+    if len(data) == 8:
+        return struct.unpack('>d', data)[0]
+    return 0.0
+
+
+def _string(data: bytes) -> str:
+    return data.rstrip(b'\x00').decode('utf-8', errors='replace')
+
+
+def _values(buf: io.BytesIO) -> Iterator[Tuple[int, bytes]]:
+    """メモリ上の要素の子を (ID, 中身) で返す"""
+    data = buf.getvalue()
+    for element_id, start, stop in _iter_elements(buf, 0, len(data)):
+        yield element_id, data[start:stop]
+
+
+def parse_matroska(f) -> Optional[Dict]:
+    """
+    Matroska / WebM のヘッダを解析
+    
+    Args:
+        f: バイナリモードで開いたファイル（seek 可能）
+    
+    Returns:
+        _parse_ffprobe_output と同じ形のメタデータ（対応していない構造なら None）
+    """
+    file_end = f.seek(0, os.SEEK_END)
+    
+    elements = _iter_elements(f, 0, file_end)
+    element_id, start, end = next(elements, (None, 0, 0))
+    if element_id != EBML_HEADER:
+        return None
+    doc_type = None
+    for child_id, value in _values(_read_children(f, start, end)):
+        if child_id == EBML_DOC_TYPE:
+            doc_type = _string(value)
+    if doc_type not in ('matroska', 'webm'):
+        return None
+    
+    segment = None
+    for element_id, start, end in elements:
+        if element_id == SEGMENT:
+            segment = (start, end)
+            break
+    if segment is None:
+        return None
+    
+    positions = _matroska_positions(f, *segment)
+    if INFO not in positions or TRACKS not in positions:
+        return None
+    
+    def element_range(element_id: int) -> Tuple[int, int]:
+        found_id, start, end = next(_iter_elements(f, positions[element_id], segment[1]))
+        if found_id != element_id:
+            raise ValueError(f"SeekHead points to a different element: {found_id:#x}")
+        return start, end
+    
+    if ATTACHMENTS in positions and _matroska_has_cover(f, *element_range(ATTACHMENTS)):
+        # 画像の添付は ffprobe では映像ストリーム（カバー画像）として出るため揃えられない
+        return None
+    
+    timestamp_scale = 1_000_000
+    duration = title = date_utc = None
+    for child_id, value in _values(_read_children(f, *element_range(INFO))):
+        if child_id == TIMESTAMP_SCALE:
+            timestamp_scale = _uint(value)
+        elif child_id == DURATION:
+            duration = _float(value)
+        elif child_id == TITLE:
+            title = _string(value)
+        elif child_id == DATE_UTC:
+            date_utc = value
+    if not duration:
+        return None
+    
+    meta = {'duration_sec': round(duration * timestamp_scale / 1e9, 6)}
+    
+    global_tags = _matroska_global_tags(f, *element_range(TAGS)) if TAGS in positions else {}
+    if title is not None or date_utc is not None or global_tags:
+        tags = {key: global_tags.get(key) for key in MATROSKA_TAG_KEYS}
+        if title is not None:
+            tags['title'] = title
+        meta['tags'] = tags
+    
+    for child_id, value in _values(_read_children(f, *element_range(TRACKS))):
+        if child_id != TRACK_ENTRY:
+            continue
+        kind, stream = _parse_matroska_track(io.BytesIO(value))
+        if kind == 'video':
+            meta['video'] = stream
+        elif kind == 'audio':
+            meta.setdefault('audio', []).append(stream)
+    return meta
+
+
+def _matroska_positions(f, start: int, end: int) -> Dict[int, int]:
+    """
+    Segment 直下の Info / Tracks / Tags / Attachments の位置を集める
+    
+    最初の Cluster までを順に見て、その先にある要素は SeekHead の位置を使う。
+    
+    Returns:
+        要素 ID → 要素（ヘッダ）の開始位置
+    """
+    wanted = (INFO, TRACKS, TAGS, ATTACHMENTS)
+    positions = {}
+    seek_heads = []
+    
+    # 要素は隙間なく並ぶので、ヘッダの開始位置は直前の要素の終わり
+    element_start = start
+    for count, (element_id, data_start, data_end) in enumerate(_iter_elements(f, start, end)):
+        if element_id == CLUSTER or count >= MAX_SEGMENT_CHILDREN:
+            break
+        if element_id == SEEK_HEAD:
+            seek_heads.append((data_start, data_end))
+        elif element_id in wanted:
+            positions[element_id] = element_start
+        element_start = data_end
+    
+    seen = set()
+    while seek_heads:
+        head = seek_heads.pop()
+        if head in seen:
+            continue
+        seen.add(head)
+        for seek_id, seek_position in _seek_entries(f, *head):
+            position = start + seek_position
+            if seek_id == SEEK_HEAD and position < end:
+                _, data_start, data_end = next(_iter_elements(f, position, end))
+                seek_heads.append((data_start, data_end))
+            elif seek_id in wanted and seek_id not in positions:
+                positions[seek_id] = position
+    return positions
+
+
+def _seek_entries(f, start: int, end: int) -> List[Tuple[int, int]]:
+    """SeekHead の (要素 ID, Segment 内の位置) を読む"""
+    entries = []
+    for child_id, value in _values(_read_children(f, start, end)):
+        if child_id != SEEK:
+            continue
+        seek_id = seek_position = None
+        for field_id, field in _values(io.BytesIO(value)):
+            if field_id == SEEK_ID:
+                seek_id = _uint(field)
+            elif field_id == SEEK_POSITION:
+                seek_position = _uint(field)
+        if seek_id is not None and seek_position is not None:
+            entries.append((seek_id, seek_position))
+    return entries
+
+
+def _parse_matroska_track(buf: io.BytesIO) -> Tuple[Optional[str], Optional[Dict]]:
+    """
+    TrackEntry を解析
+    
+    Returns:
+        ('video' / 'audio' / None, ストリーム情報)
+    """
+    track_type = codec_id = default_duration = None
+    # 仕様上の既定値は eng だが、ffprobe は Language 要素が無い・und のときは言語を出さない
+    language = None
+    video = audio = None
+    for field_id, value in _values(buf):
+        if field_id == TRACK_TYPE:
+            track_type = _uint(value)
+        elif field_id == CODEC_ID:
+            codec_id = _string(value)
+        elif field_id == LANGUAGE:
+            language = _string(value)
+            if language == 'und':
+                language = None
+        elif field_id == DEFAULT_DURATION:
+            default_duration = _uint(value)
+        elif field_id == VIDEO:
+            video = dict(_values(io.BytesIO(value)))
+        elif field_id == AUDIO:
+            audio = dict(_values(io.BytesIO(value)))
+    
+    if track_type == 1:
+        video = video or {}
+        fps = None
+        if default_duration:
+            # ffprobe と同じく分母の小さい分数に丸める（41708333ns → 24000/1001）
+            fps = float(Fraction(10 ** 9, default_duration).limit_denominator(1001))
+        return 'video', {
+            'codec': MATROSKA_CODECS.get(codec_id),
+            'width': _uint(video.get(PIXEL_WIDTH, b'')) or None,
+            'height': _uint(video.get(PIXEL_HEIGHT, b'')) or None,
+            'fps': fps,
+            'bitrate': None
+        }
+    
+    if track_type == 2:
+        audio = audio or {}
+        sample_rate = _float(audio.get(OUTPUT_SAMPLING_FREQUENCY, b'')) \
+            or _float(audio.get(SAMPLING_FREQUENCY, b'')) or 8000.0
+        channels = _uint(audio[CHANNELS]) if CHANNELS in audio else 1
+        return 'audio', {
+            'codec': _matroska_audio_codec(codec_id, _uint(audio.get(BIT_DEPTH, b''))),
+            'sample_rate': str(int(sample_rate)),
+            'channels': channels,
+            'bitrate': None,
+            'language': language
+        }
+    return None, None
+
+
+def _matroska_audio_codec(codec_id: Optional[str], bit_depth: int) -> Optional[str]:
+    """音声の CodecID → codec_name（PCM はビット深度で決まる）"""
+    if codec_id is None:
+        return None
+    if codec_id.startswith('A_AAC'):
+        return 'aac'
+    if codec_id == 'A_PCM/INT/LIT' and bit_depth in (16, 24, 32):
+        return f"pcm_s{bit_depth}le"
+    if codec_id == 'A_PCM/INT/BIG' and bit_depth in (16, 24, 32):
+        return f"pcm_s{bit_depth}be"
+    if codec_id in ('A_PCM/INT/LIT', 'A_PCM/INT/BIG') and bit_depth == 8:
+        return 'pcm_u8'
+    if codec_id == 'A_PCM/FLOAT/IEEE' and bit_depth in (32, 64):
+        return f"pcm_f{bit_depth}le"
+    return MATROSKA_CODECS.get(codec_id)
+
+
+def _matroska_global_tags(f, start: int, end: int) -> Dict[str, str]:
+    """Tags のうち、特定のトラック・チャプター等を対象としないタグ（ffprobe ではフォーマットのタグ）"""
+    tags = {}
+    for tag_id, value in _values(_read_children(f, start, end)):
+        if tag_id != TAG:
+            continue
+        fields = list(_values(io.BytesIO(value)))
+        targets = dict(_values(io.BytesIO(dict(fields).get(TARGETS, b''))))
+        if any(_uint(targets.get(uid, b'')) for uid in TARGET_UIDS):
+            continue
+        for field_id, simple_tag in fields:
+            if field_id != SIMPLE_TAG:
+                continue
+            simple = dict(_values(io.BytesIO(simple_tag)))
+            if TAG_NAME in simple:
+                tags[_string(simple[TAG_NAME])] = _string(simple.get(TAG_STRING, b''))
+    return tags
+
+
+def _matroska_has_cover(f, start: int, end: int) -> bool:
+    """画像の添付ファイルがあるか（添付の中身は読まない）"""
+    for element_id, file_start, file_end in _iter_elements(f, start, end):
+        if element_id != ATTACHED_FILE:
+            continue
+        for field_id, field_start, field_end in _iter_elements(f, file_start, file_end):
+            if field_id == FILE_MIME_TYPE:
+                if _string(_read_at(f, field_start, min(field_end - field_start, 256))).startswith('image/'):
+                    return True
+    return False
+
+
+def parse_container(f, ext: str) -> Optional[Dict]:
+    """
+    拡張子に応じてヘッダを解析
+    
+    Args:
+        f: バイナリモードで開いたファイル（seek 可能）
+        ext: 拡張子（小文字・ドット付き）
+    
+    Returns:
+        _parse_ffprobe_output と同じ形のメタデータ（未対応なら None）
+    
+    Raises:
+        ValueError / struct.error: ヘッダが壊れている
+    """
+    container = NATIVE_EXTENSIONS.get(ext)
+    if container == 'mp4':
+        return parse_mp4(f)
+    if container == 'matroska':
+        return parse_matroska(f)
+    return None
@@ -0,0 +1,148 @@
+"""
+dir_cache.py - ディレクトリ mtime キャッシュ（サブツリー枝刈り用）
+
+各ディレクトリの mtime・リンク数と、そのディレクトリ直下の
+走査結果（ファイルレコード・サブディレクトリ）を記録する。
+次回走査で mtime が変わっていないディレクトリは一覧取得を省略し、
+キャッシュ済みのファイル集合を再利用する。
+
+子エントリ数は記録しない（一覧を取らずに今の件数を知る方法が無く、比較できないため）。
+リンク数は補助的な確認で、ext4 などではサブディレクトリ数 + 2 になり、
+mtime を復元するコピー（rsync -t など）でのサブディレクトリの増減を検出できる。
+btrfs など常に 1 のファイルシステムでは何も検出しない（mtime だけで判定する）。
+
+注意：
+- ディレクトリ mtime は直下のエントリ追加・削除・リネームでのみ更新される。
+  既存ファイルの上書き（サイズ・mtime の変化）は検出できないため、
+  定期的にキャッシュなしの全走査を行うこと。
+- サブディレクトリは枝刈りしたディレクトリでも個別に mtime を確認するため、
+  深い階層での変更は検出される。
+
+【Phase 1 design constraints】
+- Only directory/file system metadata is cached; file contents are never read.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+DIR_CACHE_VERSION = 1
+
+# mtime がこの範囲内で走査開始時刻に近いディレクトリはキャッシュしない
+# （同一タイムスタンプ内の後続変更を見逃さないため。FAT は 2 秒精度）
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+class DirectoryCache:
+    """ディレクトリ単位の走査結果キャッシュ"""
+    
+    def __init__(self, cache_path: str = "data/raw/dir_cache.json"):
+        """
+        初期化
+        
+        Args:
+            cache_path: キャッシュ JSON のパス
+        """
+        self.cache_path = cache_path
+        self.previous = {}
+        self.current = {}
+        self.scan_started_ns = 0
+        self.hits = 0
+        self.misses = 0
+        # 並列走査ではワーカースレッドから呼ばれる
+        self._lock = threading.Lock()
+    
+    def begin(self) -> None:
+        """走査開始：前回キャッシュを読み込み、今回分を初期化"""
+        self.previous = self._load()
+        self.current = {}
+        self.scan_started_ns = time.time_ns()
+        self.hits = 0
+        self.misses = 0
+    
+    def lookup(self, dirpath: str, stat: os.stat_result) -> Optional[Dict]:
+        """
+        未変更ディレクトリのキャッシュを取得
+        
+        Args:
+            dirpath: ディレクトリパス
+            stat: ディレクトリの stat 結果
+        
+        Returns:
+            キャッシュエントリ（mtime・リンク数が変わった・未登録なら None）
+        """
+        cached = self.previous.get(dirpath)
+        with self._lock:
+            if (
+                cached is None
+                or cached['mtime_ns'] != stat.st_mtime_ns
+                or cached['nlink'] != stat.st_nlink
+            ):
+                self.misses += 1
+                return None
+            
+            # 今回のキャッシュにも引き継ぐ
+            self.current[dirpath] = cached
+            self.hits += 1
+            return cached
+    
+    def record(self, dirpath: str, stat: os.stat_result,
+               subdirs: List[str], files: List[Tuple[Dict, List[int]]]) -> None:
+        """
+        一覧取得したディレクトリの結果を記録
+        
+        Args:
+            dirpath: ディレクトリパス
+            stat: 一覧取得前に取ったディレクトリの stat 結果
+            subdirs: 辿るサブディレクトリのパス
+            files: (メタデータレコード, ファイル同一性) のリスト
+        """
+        if stat.st_mtime_ns >= self.scan_started_ns - RACY_WINDOW_NS:
+            return
+        
+        entry = {
+            'mtime_ns': stat.st_mtime_ns,
+            'nlink': stat.st_nlink,
+            'subdirs': subdirs,
+            'files': [[meta, list(ident)] for meta, ident in files]
+        }
+        with self._lock:
+            self.current[dirpath] = entry
+    
+    def save(self) -> None:
+        """今回の走査で確認したディレクトリのみを保存（消えたディレクトリは落ちる）"""
+        dirname = os.path.dirname(self.cache_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': DIR_CACHE_VERSION, 'dirs': self.current}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+        
+        logger.info(
+            f"Directory cache saved: {self.cache_path} "
+            f"({len(self.current)} dirs, {self.hits} reused, {self.misses} listed)"
+        )
+    
+    def _load(self) -> Dict[str, Dict]:
+        """前回キャッシュを読み込む（無い・壊れている場合は空）"""
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != DIR_CACHE_VERSION:
+                logger.warning(f"Directory cache version mismatch, ignoring: {self.cache_path}")
+                return {}
+            return data.get('dirs', {})
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Error loading directory cache {self.cache_path}: {e}")
+            return {}
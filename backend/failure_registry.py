@@ -0,0 +1,313 @@
+"""
+failure_registry.py - 抽出に失敗したファイルの永続レジストリ（SQLite）
+
+壊れた動画（ffprobe がタイムアウトまで止まる）や壊れたアーカイブを毎回処理し直さないよう、
+失敗したファイルを (path, size, mtime_ns) とエラーの種類・試行回数で記録する。
+
+- 記録中のファイルは retry_at まで抽出をスキップ（前回のエラーをそのまま出力）
+- 失敗が続くほど retry_at を指数的に延ばす（base, 2*base, 4*base, ... 上限 max）
+- サイズ・mtime が変わったファイルは記録を無視して処理し直す（再び失敗すれば試行回数 1 から）
+- 成功したら記録を削除
+- ツールが無いなど、ファイル以外が原因のエラーは記録しない
+
+【Phase 1 design constraints】
+- Only error classes and messages are recorded; file contents are never stored.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+# 1 回の IN 句に渡すパス数（SQLite のパラメータ数上限より小さく）
+LOOKUP_CHUNK = 500
+
+# 既定のバックオフ（1 日から倍々、上限 30 日）
+DEFAULT_BACKOFF_SEC = 24 * 3600
+DEFAULT_MAX_BACKOFF_SEC = 30 * 24 * 3600
+
+# ファイルではなく環境が原因のエラー（記録しない）
+ENVIRONMENT_ERRORS = (
+    'not available',
+    'command not found',
+    'Unsupported archive format',
+    'Unknown external format',
+    'module not available'
+)
+
+# (path, size, mtime_ns)
+FileKey = Tuple[str, int, int]
+
+
+def classify_error(result: Dict) -> Optional[str]:
+    """
+    抽出結果のエラーの種類を判定
+    
+    Args:
+        result: 抽出結果（error キーを持つ辞書）
+    
+    Returns:
+        エラーの種類（error_type があればそれ、タイムアウトなら 'timeout'、それ以外は 'error'）。
+        エラーが無い・環境が原因なら None
+    """
+    message = result.get('error')
+    if message is None:
+        return None
+    message = str(message)
+    if any(pattern in message for pattern in ENVIRONMENT_ERRORS):
+        return None
+    if result.get('error_type'):
+        return result['error_type']
+    if 'timeout' in message.lower():
+        return 'timeout'
+    return 'error'
+
+
+class FailureRegistry:
+    """失敗ファイルのレジストリ"""
+    
+    def __init__(self, db_path: str = "data/raw/failures.sqlite",
+                 backoff_sec: float = DEFAULT_BACKOFF_SEC, max_backoff_sec: float = DEFAULT_MAX_BACKOFF_SEC):
+        """
+        初期化（無ければ作成）
+        
+        Args:
+            db_path: SQLite ファイルのパス
+            backoff_sec: 1 回目の失敗後にスキップする秒数
+            max_backoff_sec: スキップする秒数の上限
+        """
+        self.db_path = db_path
+        self.backoff_sec = max(0.0, float(backoff_sec))
+        self.max_backoff_sec = max(self.backoff_sec, float(max_backoff_sec))
+        dirname = os.path.dirname(db_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        
+        # パイプラインでは走査スレッド（検索）とメインスレッド（書き込み）から使う
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS failures ("
+                " extractor TEXT NOT NULL, path TEXT NOT NULL,"
+                " size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+                " error_class TEXT NOT NULL, message TEXT,"
+                " attempts INTEGER NOT NULL,"
+                " first_failed REAL NOT NULL, last_failed REAL NOT NULL, retry_at REAL NOT NULL,"
+                " PRIMARY KEY (extractor, path))"
+            )
+    
+    def get_many(self, extractor: str, files: Iterable[FileKey]) -> Dict[str, Dict]:
+        """
+        一括検索
+        
+        Args:
+            extractor: 抽出器名（'video_meta' など）
+            files: (path, size, mtime_ns) のリスト
+        
+        Returns:
+            path → 記録（retry_at を過ぎたものも含む。サイズ・mtime が変わっていれば changed が True）
+        """
+        wanted = {path: (size, mtime_ns) for path, size, mtime_ns in files}
+        found = {}
+        paths = list(wanted)
+        with self._lock:
+            for start in range(0, len(paths), LOOKUP_CHUNK):
+                chunk = paths[start:start + LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT path, size, mtime_ns, error_class, message, attempts, retry_at FROM failures"
+                    f" WHERE extractor = ? AND path IN ({','.join('?' * len(chunk))})",
+                    [extractor, *chunk]
+                )
+                for path, size, mtime_ns, error_class, message, attempts, retry_at in rows:
+                    found[path] = {
+                        'error_class': error_class,
+                        'message': message,
+                        'attempts': attempts,
+                        'retry_at': retry_at,
+                        'changed': wanted[path] != (size, mtime_ns)
+                    }
+        return found
+    
+    def record_many(self, extractor: str, failures: Iterable[Tuple[str, int, int, str, str]],
+                    now: Optional[float] = None) -> None:
+        """
+        失敗を一括記録（同じファイルの記録があれば試行回数を増やし、スキップ期間を延ばす）
+        
+        Args:
+            extractor: 抽出器名
+            failures: (path, size, mtime_ns, エラーの種類, メッセージ) のリスト
+            now: 現在時刻（UNIX 秒。省略時は time.time()）
+        """
+        failures = list(failures)
+        if not failures:
+            return
+        now = time.time() if now is None else now
+        
+        with self._lock, self._conn:
+            previous = {}
+            paths = [failure[0] for failure in failures]
+            for start in range(0, len(paths), LOOKUP_CHUNK):
+                chunk = paths[start:start + LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT path, size, mtime_ns, attempts, first_failed FROM failures"
+                    f" WHERE extractor = ? AND path IN ({','.join('?' * len(chunk))})",
+                    [extractor, *chunk]
+                )
+                for path, size, mtime_ns, attempts, first_failed in rows:
+                    previous[path] = (size, mtime_ns, attempts, first_failed)
+            
+            rows = []
+            for path, size, mtime_ns, error_class, message in failures:
+                attempts, first_failed = 1, now
+                prev = previous.get(path)
+                if prev is not None and prev[:2] == (size, mtime_ns):
+                    attempts, first_failed = prev[2] + 1, prev[3]
+                previous[path] = (size, mtime_ns, attempts, first_failed)
+                rows.append((
+                    extractor, path, size, mtime_ns, error_class, message,
+                    attempts, first_failed, now, now + self.backoff(attempts)
+                ))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO failures"
+                " (extractor, path, size, mtime_ns, error_class, message,"
+                " attempts, first_failed, last_failed, retry_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+    
+    def record(self, extractor: str, path: str, size: int, mtime_ns: int,
+               error_class: str, message: str) -> None:
+        """1 件記録"""
+        self.record_many(extractor, [(path, size, mtime_ns, error_class, message)])
+    
+    def clear_many(self, extractor: Optional[str], paths: Iterable[str]) -> int:
+        """
+        記録を一括削除（成功したファイル）
+        
+        Args:
+            extractor: 抽出器名（None ならすべての抽出器）
+            paths: ファイルパス
+        
+        Returns:
+            削除した行数
+        """
+        paths = list(paths)
+        deleted = 0
+        with self._lock, self._conn:
+            for start in range(0, len(paths), LOOKUP_CHUNK):
+                chunk = paths[start:start + LOOKUP_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                if extractor is None:
+                    deleted += self._conn.execute(
+                        f"DELETE FROM failures WHERE path IN ({placeholders})", chunk
+                    ).rowcount
+                else:
+                    deleted += self._conn.execute(
+                        f"DELETE FROM failures WHERE extractor = ? AND path IN ({placeholders})",
+                        [extractor, *chunk]
+                    ).rowcount
+        return deleted
+    
+    def backoff(self, attempts: int) -> float:
+        """
+        試行回数に応じたスキップ秒数
+        
+        Args:
+            attempts: 連続して失敗した回数（1 以上）
+        
+        Returns:
+            backoff_sec * 2^(attempts-1)（上限 max_backoff_sec）
+        """
+        return min(self.max_backoff_sec, self.backoff_sec * (2 ** min(max(0, attempts - 1), 32)))
+    
+    def report(self, extractor: Optional[str] = None, quarantined_only: bool = False,
+               now: Optional[float] = None) -> List[Dict]:
+        """
+        記録の一覧（試行回数の多い順）
+        
+        Args:
+            extractor: 抽出器名で絞り込む（省略時はすべて）
+            quarantined_only: スキップ期間中のものだけ
+            now: 現在時刻（UNIX 秒）
+        
+        Returns:
+            記録の辞書のリスト
+        """
+        now = time.time() if now is None else now
+        sql = ("SELECT extractor, path, size, mtime_ns, error_class, message,"
+               " attempts, first_failed, last_failed, retry_at FROM failures WHERE 1 = 1")
+        params = []
+        if extractor is not None:
+            sql += " AND extractor = ?"
+            params.append(extractor)
+        if quarantined_only:
+            sql += " AND retry_at > ?"
+            params.append(now)
+        sql += " ORDER BY attempts DESC, path"
+        
+        columns = ('extractor', 'path', 'size', 'mtime_ns', 'error_class', 'message',
+                   'attempts', 'first_failed', 'last_failed', 'retry_at')
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        entries = []
+        for row in rows:
+            entry = dict(zip(columns, row))
+            entry['quarantined'] = entry['retry_at'] > now
+            entries.append(entry)
+        return entries
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        抽出器ごとの件数
+        
+        Returns:
+            抽出器名 → 行数
+        """
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT extractor, COUNT(*) FROM failures GROUP BY extractor"
+            ).fetchall())
+    
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == '__main__':
+    import sys
+    import json
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="List files skipped because extraction keeps failing")
+    parser.add_argument('--db', default="data/raw/failures.sqlite")
+    parser.add_argument('--extractor', default=None, help="e.g. video_meta, archive_meta")
+    parser.add_argument('--all', action='store_true', help="include files whose backoff has expired")
+    parser.add_argument('--clear', nargs='+', metavar='PATH', help="forget these files (retry next run)")
+    parser.add_argument('--json', action='store_true', help="print JSON instead of a table")
+    args = parser.parse_args()
+    
+    registry = FailureRegistry(args.db)
+    if args.clear:
+        deleted = registry.clear_many(args.extractor, args.clear)
+        print(f"Cleared {deleted} entries")
+    else:
+        entries = registry.report(args.extractor, quarantined_only=not args.all)
+        if args.json:
+            print(json.dumps(entries, indent=2, ensure_ascii=False))
+        else:
+            for entry in entries:
+                retry = datetime.fromtimestamp(entry['retry_at']).strftime('%Y-%m-%d %H:%M')
+                print(f"{entry['extractor']}\t{entry['error_class']}\tx{entry['attempts']}"
+                      f"\tretry {retry}\t{entry['path']}\t{entry['message']}")
+            print(f"{len(entries)} files", file=sys.stderr)
+    registry.close()
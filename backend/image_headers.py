@@ -0,0 +1,362 @@
+"""
+image_headers.py - 画像ヘッダの直接解析（Pillow を使わない高速経路）
+
+先頭のヘッダ部分だけを読み、ImageMetaExtractor と同じ形（format / width / height / mode / exif）の
+メタデータを作る。形式はファイル内容（マジックナンバー）で判定する：
+
+- JPEG : SOF までのマーカーを順にたどり、APP1 の EXIF と SOF の幅・高さ・成分数を読む（他の APPn は読み飛ばす）
+- PNG  : IHDR と、最初の IDAT までの eXIf
+- WebP : VP8 / VP8L / VP8X ヘッダ（VP8X で EXIF がある場合は EXIF チャンクまで読み飛ばす）
+- GIF  : 論理画面サイズとグローバルカラーテーブル
+- BMP  : BITMAPINFOHEADER 系（パレット画像はパレットも読む）
+
+EXIF は Pillow の _getexif と同じく IFD0・Exif IFD・GPS IFD を合わせ、値は Pillow と同じ表記で文字列化する。
+Pillow と同じ結果を出せないもの（MPO、16 ビットグレースケール PNG、ビットフィールド BMP など）は None を返し、
+呼び出し側で Pillow にフォールバックさせる。
+
+【Phase 1 design constraints】
+- Only file headers and EXIF blocks are read; pixel data is never decoded.
+"""
+
+import struct
+from typing import Dict, Optional, Tuple
+
+
+# 抽出する EXIF タグ（Pillow の ExifTags.TAGS と同じ名前）
+EXIF_TAGS = {
+    0x010F: 'Make',
+    0x0110: 'Model',
+    0x0112: 'Orientation',
+    0x0131: 'Software',
+    0x0132: 'DateTime',
+    0x9003: 'DateTimeOriginal',
+    0x8825: 'GPSInfo'
+}
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+
+# TIFF の型 → 1 要素のバイト数
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+# APP1 など 1 セグメント・チャンクとして読む上限
+MAX_SEGMENT_READ = 1 << 20
+
+# JPEG の SOF マーカー（DHT / JPG / DAC を除く C0〜CF）
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# 成分数 → Pillow のモード
+JPEG_MODES = {1: 'L', 3: 'RGB', 4: 'CMYK'}
+
+# (ビット深度, カラータイプ) → Pillow のモード（16 ビットグレーは Pillow の版でモードが違うため扱わない）
+PNG_MODES = {
+    (1, 0): '1', (2, 0): 'L', (4, 0): 'L', (8, 0): 'L',
+    (8, 2): 'RGB', (16, 2): 'RGB',
+    (1, 3): 'P', (2, 3): 'P', (4, 3): 'P', (8, 3): 'P',
+    (8, 4): 'LA', (16, 4): 'LA',
+    (8, 6): 'RGBA', (16, 6): 'RGBA'
+}
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# ImageMagick がテキストチャンクに EXIF を入れる形式（Pillow は読むがここでは扱わない）
+PNG_RAW_EXIF_KEYWORD = b'Raw profile type exif'
+
+
+def _read_exact(f, size: int) -> bytes:
+    """size バイト読む（足りなければ ValueError）"""
+    if size > MAX_SEGMENT_READ:
+        raise ValueError(f"Segment too large: {size} bytes")
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError("Truncated image header")
+    return data
+
+
+def parse_image(f) -> Optional[Tuple[Dict, Optional[bytes]]]:
+    """
+    画像ヘッダを解析
+    
+    Args:
+        f: バイナリモードで開いたファイル（seek 可能）
+    
+    Returns:
+        ({'format', 'width', 'height', 'mode'}, EXIF の TIFF データ（無ければ None))。
+        対応していない形式・構造なら None
+    
+    Raises:
+        ValueError / struct.error: ヘッダが壊れている
+    """
+    head = f.read(32)
+    if head.startswith(b'\xff\xd8'):
+        return _parse_jpeg(f)
+    if head.startswith(PNG_SIGNATURE):
+        return _parse_png(f)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return _parse_webp(f)
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return _parse_gif(f, head)
+    if head[:2] == b'BM':
+        return _parse_bmp(f, head)
+    return None
+
+
+def _parse_jpeg(f) -> Optional[Tuple[Dict, Optional[bytes]]]:
+    """JPEG: SOF までのマーカーをたどる"""
+    f.seek(2)
+    exif = None
+    while True:
+        # マーカー: 0xFF（詰め物の 0xFF が続くことがある）+ 種別
+        if _read_exact(f, 1) != b'\xff':
+            raise ValueError("Invalid JPEG marker")
+        marker = 0xFF
+        while marker == 0xFF:
+            marker = _read_exact(f, 1)[0]
+        
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            continue
+        if marker in (0xD9, 0xDA):
+            # SOF より先に画像データ・終端が来た
+            return None
+        
+        length = struct.unpack('>H', _read_exact(f, 2))[0]
+        if length < 2:
+            raise ValueError("Invalid JPEG segment length")
+        start = f.tell()
+        
+        if marker == 0xE1 and exif is None:
+            data = _read_exact(f, length - 2)
+            if data.startswith(b'Exif\x00\x00'):
+                exif = data[6:]
+        elif marker == 0xE2 and length >= 6 and _read_exact(f, 4) == b'MPF\x00':
+            # 複数画像（MPO）は Pillow では別形式として開かれる
+            return None
+        elif marker in JPEG_SOF_MARKERS:
+            _, height, width, components = struct.unpack('>BHHB', _read_exact(f, 6))
+            mode = JPEG_MODES.get(components)
+            if not width or not height or mode is None:
+                return None
+            return {'format': 'JPEG', 'width': width, 'height': height, 'mode': mode}, exif
+        
+        f.seek(start + length - 2)
+
+
+def _parse_png(f) -> Optional[Tuple[Dict, Optional[bytes]]]:
+    """PNG: IHDR と最初の IDAT までのチャンク"""
+    f.seek(len(PNG_SIGNATURE))
+    info = None
+    exif = None
+    while True:
+        length, chunk_type = struct.unpack('>I4s', _read_exact(f, 8))
+        start = f.tell()
+        
+        if chunk_type == b'IHDR':
+            width, height, bit_depth, color_type = struct.unpack('>IIBB', _read_exact(f, 10))
+            mode = PNG_MODES.get((bit_depth, color_type))
+            if mode is None:
+                return None
+            info = {'format': 'PNG', 'width': width, 'height': height, 'mode': mode}
+        elif info is None:
+            raise ValueError("PNG does not start with IHDR")
+        elif chunk_type == b'eXIf':
+            exif = _read_exact(f, length)
+        elif chunk_type in (b'tEXt', b'zTXt', b'iTXt'):
+            if _read_exact(f, min(length, 80)).startswith(PNG_RAW_EXIF_KEYWORD):
+                return None
+        elif chunk_type in (b'IDAT', b'IEND'):
+            return info, exif
+        
+        # 中身 + CRC(4)
+        f.seek(start + length + 4)
+
+
+def _parse_webp(f) -> Optional[Tuple[Dict, Optional[bytes]]]:
+    """WebP: 最初のチャンク（VP8 / VP8L / VP8X）"""
+    f.seek(12)
+    chunk_type, size = struct.unpack('<4sI', _read_exact(f, 8))
+    data = _read_exact(f, min(size, 30))
+    
+    if chunk_type == b'VP8 ':
+        if data[3:6] != b'\x9d\x01\x2a':
+            raise ValueError("Invalid VP8 frame header")
+        width, height = struct.unpack('<HH', data[6:10])
+        return {'format': 'WEBP', 'width': width & 0x3FFF, 'height': height & 0x3FFF, 'mode': 'RGB'}, None
+    
+    if chunk_type == b'VP8L':
+        if data[0] != 0x2F:
+            raise ValueError("Invalid VP8L signature")
+        bits = struct.unpack('<I', data[1:5])[0]
+        return {
+            'format': 'WEBP',
+            'width': (bits & 0x3FFF) + 1,
+            'height': ((bits >> 14) & 0x3FFF) + 1,
+            'mode': 'RGBA' if bits & (1 << 28) else 'RGB'
+        }, None
+    
+    if chunk_type == b'VP8X':
+        flags = data[0]
+        info = {
+            'format': 'WEBP',
+            'width': int.from_bytes(data[4:7], 'little') + 1,
+            'height': int.from_bytes(data[7:10], 'little') + 1,
+            'mode': 'RGBA' if flags & 0x10 else 'RGB'
+        }
+        exif = None
+        if flags & 0x08:
+            # EXIF チャンクは画像データの後ろにあるため、チャンクヘッダだけたどる
+            pos = 12 + 8 + size + (size & 1)
+            while True:
+                f.seek(pos)
+                header = f.read(8)
+                if len(header) < 8:
+                    break
+                chunk_type, size = struct.unpack('<4sI', header)
+                if chunk_type == b'EXIF':
+                    exif = _read_exact(f, size)
+                    break
+                pos += 8 + size + (size & 1)
+        return info, exif
+    
+    return None
+
+
+def _parse_gif(f, head: bytes) -> Optional[Tuple[Dict, Optional[bytes]]]:
+    """GIF: 論理画面サイズとグローバルカラーテーブル"""
+    width, height, flags = struct.unpack('<HHB', head[6:11])
+    if not flags & 0x80:
+        # ローカルカラーテーブルだけの GIF はモードの判定を Pillow に任せる
+        return None
+    
+    entries = 2 << (flags & 0x07)
+    f.seek(13)
+    palette = _read_exact(f, entries * 3)
+    # Pillow はパレットが 0〜n の灰色の並びなら L、それ以外は P で開く
+    grayscale = all(palette[i] == palette[i + 1] == palette[i + 2] == i // 3 for i in range(0, len(palette), 3))
+    return {'format': 'GIF', 'width': width, 'height': height, 'mode': 'L' if grayscale else 'P'}, None
+
+
+def _parse_bmp(f, head: bytes) -> Optional[Tuple[Dict, Optional[bytes]]]:
+    """BMP: BITMAPCOREHEADER / BITMAPINFOHEADER 系"""
+    header_size = struct.unpack('<I', head[14:18])[0]
+    if header_size == 12:
+        width, height, _, bits = struct.unpack('<HHHH', head[18:26])
+        compression = colors = 0
+        palette_entry = 3
+    elif header_size in (40, 52, 56, 64, 108, 124):
+        f.seek(18)
+        width, height, _, bits, compression = struct.unpack('<iiHHI', _read_exact(f, 16))
+        f.seek(46)
+        colors = struct.unpack('<I', _read_exact(f, 4))[0]
+        palette_entry = 4
+    else:
+        return None
+    
+    # ビットフィールド等（compression 3 以上）は Pillow に任せる
+    if compression > 2 or not width or not height:
+        return None
+    
+    info = {'format': 'BMP', 'width': abs(width), 'height': abs(height), 'mode': 'RGB'}
+    if bits in (16, 24, 32):
+        return info, None
+    if bits not in (1, 4, 8):
+        return None
+    
+    colors = colors or (1 << bits)
+    if colors > 256:
+        return None
+    f.seek(14 + header_size)
+    palette = _read_exact(f, colors * palette_entry)
+    # Pillow と同じく、パレットが灰色の並び（2 色なら黒・白）なら 1 / L、それ以外は P
+    indices = (0, 255) if colors == 2 else range(colors)
+    grayscale = all(
+        palette[i * palette_entry:i * palette_entry + 3] == bytes((value,)) * 3
+        for i, value in enumerate(indices)
+    )
+    if grayscale:
+        info['mode'] = '1' if colors == 2 else 'L'
+    else:
+        info['mode'] = 'P'
+    return info, None
+
+
+def _read_ifd(data: bytes, endian: str, offset: int) -> Dict:
+    """
+    TIFF の IFD を読む（範囲外の項目は飛ばす）
+    
+    値は Pillow と同じ型にする：ASCII → str、BYTE / UNDEFINED → bytes、RATIONAL → float、
+    1 要素なら単独の値、複数なら tuple
+    
+    Returns:
+        タグ番号 → 値
+    """
+    result = {}
+    if offset + 2 > len(data):
+        return result
+    count = struct.unpack(endian + 'H', data[offset:offset + 2])[0]
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(data):
+            break
+        tag, value_type, value_count = struct.unpack(endian + 'HHI', data[entry:entry + 8])
+        size = TIFF_TYPE_SIZES.get(value_type)
+        if size is None:
+            continue
+        
+        total = size * value_count
+        if total <= 4:
+            raw = data[entry + 8:entry + 8 + total]
+        else:
+            value_offset = struct.unpack(endian + 'I', data[entry + 8:entry + 12])[0]
+            if value_offset + total > len(data):
+                continue
+            raw = data[value_offset:value_offset + total]
+        result[tag] = _tiff_value(raw, value_type, value_count, endian)
+    return result
+
+
+def _tiff_value(raw: bytes, value_type: int, count: int, endian: str):
+    """TIFF の値を Pillow と同じ型に変換"""
+    if value_type == 2:
+        # Pillow と同じく末尾の NUL を 1 つだけ落とし latin-1 で読む
+        if raw.endswith(b'\x00'):
+            raw = raw[:-1]
+        return raw.decode('latin-1', 'replace')
+    if value_type in (1, 7):
+        return raw
+    
+    if value_type in (5, 10):
+        code = 'I' if value_type == 5 else 'i'
+        pairs = struct.unpack(endian + code * (2 * count), raw)
+        values = tuple(
+            num / den if den else float('nan')
+            for num, den in zip(pairs[::2], pairs[1::2])
+        )
+    else:
+        code = {3: 'H', 4: 'I', 6: 'b', 8: 'h', 9: 'i', 11: 'f', 12: 'd'}[value_type]
+        values = struct.unpack(endian + code * count, raw)
+    return values[0] if len(values) == 1 else values
+
+
+def read_exif(data: bytes) -> Dict[str, str]:
+    """
+    EXIF（TIFF 形式）から抽出対象のタグを読む
+    
+    Args:
+        data: TIFF ヘッダから始まる EXIF データ（先頭の 'Exif\\0\\0' はあってもよい）
+    
+    Returns:
+        タグ名 → 値の文字列（Pillow の str(value) と同じ表記。GPSInfo はタグ番号 → 値の辞書の文字列）
+    """
+    if data.startswith(b'Exif\x00\x00'):
+        data = data[6:]
+    if data[:4] == b'II*\x00':
+        endian = '<'
+    elif data[:4] == b'MM\x00*':
+        endian = '>'
+    else:
+        return {}
+    
+    ifd0 = struct.unpack(endian + 'I', data[4:8])[0]
+    merged = _read_ifd(data, endian, ifd0)
+    if isinstance(merged.get(EXIF_IFD), int):
+        merged.update(_read_ifd(data, endian, merged[EXIF_IFD]))
+    if isinstance(merged.get(GPS_IFD), int):
+        merged[GPS_IFD] = _read_ifd(data, endian, merged[GPS_IFD])
+    
+    return {EXIF_TAGS[tag]: str(value) for tag, value in merged.items() if tag in EXIF_TAGS}
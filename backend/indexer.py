@@ -16,9 +16,10 @@ Chroma / FAISS に保存
 """
 
 import json
+import hashlib
 import logging
 import os
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 from datetime import datetime
 from pathlib import Path
 
@@ -35,6 +36,11 @@ try:
 except ImportError:
     YAML_AVAILABLE = False
 
+try:
+    from .catalog_io import iter_records
+except ImportError:
+    from catalog_io import iter_records
+
 
 logger = logging.getLogger(__name__)
 
@@ -84,14 +90,13 @@ class MediaIndexer:
         JSONファイルからメタデータを読み込む
         
         Args:
-            filepath: メタデータJSONファイルパス
+            filepath: メタデータJSONファイルパス（NDJSON も可）
         
         Returns:
             メタデータリスト
         """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                metadata_list = json.load(f)
+            metadata_list = list(iter_records(filepath))
             logger.info(f"Loaded {len(metadata_list)} items from {filepath}")
             return metadata_list
         except FileNotFoundError:
@@ -101,18 +106,40 @@ class MediaIndexer:
             logger.error(f"Error loading metadata: {e}")
             return []
     
-    def index_metadata(self, metadata_list: List[Dict]) -> None:
+    def iter_metadata_from_file(self, filepath: str = "data/raw/metadata.ndjson") -> Iterator[Dict]:
+        """
+        メタデータカタログを 1 件ずつ読み込む（ストリーミング）
+        
+        NDJSON（.ndjson / .jsonl、.gz / .zst 圧縮可）は 1 行ずつ読むため、
+        ライブラリの規模によらずメモリ使用量が一定。
+        
+        Args:
+            filepath: メタデータカタログのパス
+        
+        Yields:
+            メタデータ辞書
+        """
+        try:
+            yield from iter_records(filepath)
+        except FileNotFoundError:
+            logger.error(f"Metadata file not found: {filepath}")
+        except Exception as e:
+            logger.error(f"Error loading metadata: {e}")
+    
+    def index_metadata(self, metadata_list: Iterable[Dict]) -> None:
         """
         メタデータリストをインデックス化
         
         Args:
-            metadata_list: scanner.py から得たメタデータリスト
+            metadata_list: scanner.py から得たメタデータ（リスト・ジェネレータどちらでも可）
         """
         if not CHROMADB_AVAILABLE:
             logger.error("chromadb not available - skipping indexing")
             return
         
+        count = 0
         for i, meta in enumerate(metadata_list):
+            count += 1
             try:
                 # メディア情報を文章化
                 document = self._create_document(meta)
@@ -121,11 +148,12 @@ class MediaIndexer:
                 metadata_dict = self._extract_metadata(meta)
                 
                 # Chroma に追加（collection 単位）
+                # ID はパスから決まるため、再実行・差分更新でも重複しない
                 if self.collection:
-                    self.collection.add(
+                    self.collection.upsert(
                         documents=[document],
                         metadatas=[metadata_dict],
-                        ids=[f"media_{i}"]
+                        ids=[self._document_id(meta.get('path', ''))]
                     )
                 
                 if (i + 1) % 100 == 0:
@@ -135,7 +163,73 @@ class MediaIndexer:
                 logger.warning(f"Error indexing {meta.get('path')}: {e}")
         
         # 新 API では自動的に保存される（persist 不要）
-        logger.info(f"Indexed {len(metadata_list)} items successfully")
+        logger.info(f"Indexed {count} items successfully")
+    
+    def upsert_metadata(self, metadata_list: List[Dict], batch_size: int = 500) -> int:
+        """
+        メタデータをまとめて追加・更新（watcher などの差分更新用）
+        
+        Args:
+            metadata_list: 追加・更新するメタデータ
+            batch_size: 1 回の upsert に渡す件数
+        
+        Returns:
+            反映した件数
+        """
+        if not self.collection:
+            logger.error("Collection not initialized - skipping upsert")
+            return 0
+        
+        count = 0
+        for start in range(0, len(metadata_list), batch_size):
+            ids, documents, metadatas = [], [], []
+            for meta in metadata_list[start:start + batch_size]:
+                try:
+                    document = self._create_document(meta)
+                    metadata_dict = self._extract_metadata(meta)
+                except Exception as e:
+                    logger.warning(f"Error preparing {meta.get('path')}: {e}")
+                    continue
+                ids.append(self._document_id(meta.get('path', '')))
+                documents.append(document)
+                metadatas.append(metadata_dict)
+            
+            if not ids:
+                continue
+            try:
+                self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas)
+                count += len(ids)
+            except Exception as e:
+                logger.warning(f"Error upserting batch at {start}: {e}")
+        
+        return count
+    
+    def delete_paths(self, paths: List[str]) -> None:
+        """
+        パス指定でインデックスから削除
+        
+        Args:
+            paths: 削除するファイルパス
+        """
+        if not self.collection or not paths:
+            return
+        
+        try:
+            self.collection.delete(ids=[self._document_id(path) for path in paths])
+        except Exception as e:
+            logger.warning(f"Error deleting {len(paths)} items: {e}")
+    
+    def _document_id(self, path: str) -> str:
+        """
+        パスから安定したドキュメント ID を生成
+        
+        Args:
+            path: ファイルパス
+        
+        Returns:
+            ドキュメント ID
+        """
+        return "media_" + hashlib.sha1(path.encode('utf-8', 'surrogateescape')).hexdigest()
     
     def _create_document(self, meta: Dict) -> str:
         """
@@ -0,0 +1,121 @@
+"""
+manifest.py - 走査マニフェスト（差分走査用）
+
+前回走査時のファイル同一性 (path, size, mtime, device, inode) を保存し、
+今回の走査結果と比較して added / modified / unchanged / deleted に分類する。
+
+【Phase 1 design constraints】
+- Only file-system identity (size, mtime, device, inode) is recorded.
+- File contents are NOT hashed or read.
+"""
+
+import os
+import json
+import logging
+from typing import Dict, List, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+MANIFEST_VERSION = 1
+
+# (size, mtime_ns, device, inode)
+FileIdentity = Tuple[int, int, int, int]
+
+
+def file_identity(stat: os.stat_result) -> FileIdentity:
+    """
+    stat 結果からファイル同一性を作る
+    
+    Args:
+        stat: os.stat / DirEntry.stat の結果
+    
+    Returns:
+        (size, mtime_ns, device, inode)
+    """
+    return (stat.st_size, stat.st_mtime_ns, stat.st_dev, stat.st_ino)
+
+
+class FileManifest:
+    """前回走査のファイル同一性マニフェスト"""
+    
+    def __init__(self, manifest_path: str = "data/raw/manifest.json"):
+        """
+        初期化
+        
+        Args:
+            manifest_path: マニフェスト JSON のパス
+        """
+        self.manifest_path = manifest_path
+        self.files = {}
+    
+    def load(self) -> Dict[str, FileIdentity]:
+        """
+        マニフェストを読み込む（無い・壊れている場合は空）
+        
+        Returns:
+            path → 同一性 の辞書
+        """
+        self.files = {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != MANIFEST_VERSION:
+                logger.warning(f"Manifest version mismatch, ignoring: {self.manifest_path}")
+                return self.files
+            self.files = {path: tuple(ident) for path, ident in data.get('files', {}).items()}
+            logger.info(f"Loaded manifest: {len(self.files)} files")
+        except FileNotFoundError:
+            logger.info(f"No manifest found, full scan: {self.manifest_path}")
+        except Exception as e:
+            logger.warning(f"Error loading manifest {self.manifest_path}: {e}")
+        return self.files
+    
+    def save(self, files: Dict[str, FileIdentity]) -> None:
+        """
+        マニフェストを保存（一時ファイル経由で置き換え）
+        
+        Args:
+            files: path → 同一性 の辞書
+        """
+        dirname = os.path.dirname(self.manifest_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': files}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+        
+        self.files = files
+        logger.info(f"Manifest saved: {self.manifest_path}")
+    
+    def classify(self, current: Dict[str, FileIdentity]) -> Dict[str, List[str]]:
+        """
+        前回マニフェストと今回の走査結果を比較
+        
+        Args:
+            current: 今回の path → 同一性
+        
+        Returns:
+            added / modified / unchanged / deleted ごとのパスリスト
+        """
+        changes = {
+            'added': [],
+            'modified': [],
+            'unchanged': [],
+            'deleted': []
+        }
+        
+        for path, ident in current.items():
+            previous = self.files.get(path)
+            if previous is None:
+                changes['added'].append(path)
+            elif previous != ident:
+                changes['modified'].append(path)
+            else:
+                changes['unchanged'].append(path)
+        
+        changes['deleted'] = [path for path in self.files if path not in current]
+        return changes
@@ -7,6 +7,10 @@ mutagen または ffprobe を使用して音声ファイルのタグ情報を抽
 
 mutagen が無い場合は ffprobe でフォールバック
 
+1 ファイルにつきプローブは 1 回まで：mutagen が扱える拡張子なら mutagen、
+mutagen が扱えない（拡張子・解析失敗）場合だけ ffprobe を 1 回（lean→full のやり直しなし）。
+大量のファイルは extract_batch / iter_extract_batch でスレッドプールに分散できる。
+
 【Phase 1 design constraints】
 - This module extracts ONLY metadata tags and technical properties.
 - Speech recognition, audio content analysis, and mood inference are NOT performed.
@@ -14,9 +18,11 @@ mutagen が無い場合は ffprobe でフォールバック
 - Audio content interpretation is intentionally deferred to Phase 2+.
 """
 
+import os
 import json
 import logging
-from typing import Dict, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 
 try:
     from mutagen import File as MutagenFile
@@ -25,19 +31,50 @@ except ImportError:
     MUTAGEN_AVAILABLE = False
     logging.warning("Mutagen not installed - audio tag extraction will fallback to ffprobe")
 
-from .meta_video_audio import VideoAudioMetaExtractor
+try:
+    from .meta_video_audio import VideoAudioMetaExtractor
+    from .throttle import IOThrottle
+except ImportError:
+    from meta_video_audio import VideoAudioMetaExtractor
+    from throttle import IOThrottle
 
 
 logger = logging.getLogger(__name__)
 
 
+# mutagen が解析できる拡張子（これ以外は mutagen で開かずに ffprobe へ回す）
+MUTAGEN_EXTENSIONS = frozenset({
+    '.mp3', '.mp2', '.flac', '.ogg', '.oga', '.opus', '.spx',
+    '.m4a', '.m4b', '.m4p', '.mp4', '.aac', '.ac3',
+    '.wma', '.asf', '.wav', '.aif', '.aiff',
+    '.ape', '.wv', '.mpc', '.ofr', '.tta', '.dsf', '.dff'
+})
+
+
 class AudioMetaExtractor:
     """音声ファイルメタデータ抽出器"""
     
-    def __init__(self):
-        """初期化"""
+    # 出力の形・内容が変わったら上げる（抽出結果キャッシュが無効化される）
+    VERSION = 1
+    
+    def __init__(self, throttle: Optional[IOThrottle] = None, ffprobe_path: str = 'ffprobe',
+                 timeout: float = 30.0, workers: int = 8):
+        """
+        初期化（ffprobe の可用性確認は共有レジストリで初回利用時に 1 回だけ）
+        
+        Args:
+            throttle: I/O 制限（省略時はプロセス共有のもの）
+            ffprobe_path: ffprobe コマンド
+            timeout: ffprobe の 1 ファイルあたりのタイムアウト（秒）
+            workers: 一括抽出のスレッド数
+        """
         self.mutagen_available = MUTAGEN_AVAILABLE
-        self.ffprobe = VideoAudioMetaExtractor()
+        self.workers = max(1, int(workers))
+        # フォールバックは 1 回で済ませる（full プロファイル・ヘッダ直接解析なし）
+        self.ffprobe = VideoAudioMetaExtractor(
+            throttle=throttle, ffprobe_path=ffprobe_path, timeout=timeout,
+            profile='full', native=False
+        )
     
     def extract(self, filepath: str) -> Dict:
         """
@@ -54,8 +91,9 @@ class AudioMetaExtractor:
             'error': None
         }
         
-        # mutagen を試す（優先度高）
-        if self.mutagen_available:
+        # mutagen を試す（優先度高。扱えない拡張子は開かない）
+        ext = os.path.splitext(filepath)[1].lower()
+        if self.mutagen_available and ext in MUTAGEN_EXTENSIONS:
             try:
                 tag_data = self._extract_with_mutagen(filepath)
                 if tag_data:
@@ -70,6 +108,59 @@ class AudioMetaExtractor:
         
         return meta
     
+    def iter_extract_batch(self, filepaths: Iterable[str],
+                           workers: Optional[int] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        複数ファイルをスレッドプールで抽出し、終わった順に返す
+        
+        mutagen の読み込みと ffprobe の待ちは GIL を手放すため、スレッドで十分並行になる。
+        未処理のパスはスレッド数の 2 倍までしか先読みしない。
+        
+        Args:
+            filepaths: ファイルパス（ジェネレータ可）
+            workers: スレッド数（省略時は self.workers）
+        
+        Yields:
+            (ファイルパス, メタデータ辞書)
+        """
+        workers = max(1, workers or self.workers)
+        paths = iter(filepaths)
+        pending = {}
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='audio-meta')
+        
+        def fill() -> None:
+            while len(pending) < workers * 2:
+                filepath = next(paths, None)
+                if filepath is None:
+                    return
+                pending[pool.submit(self.extract, filepath)] = filepath
+        
+        try:
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+                fill()
+        finally:
+            # 途中で打ち切られたら未着手の分は捨てる
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
+    
+    def extract_batch(self, filepaths: Iterable[str], workers: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        複数ファイルをスレッドプールで抽出
+        
+        Args:
+            filepaths: ファイルパス
+            workers: スレッド数
+        
+        Returns:
+            ファイルパス → メタデータ辞書
+        """
+        return dict(self.iter_extract_batch(filepaths, workers))
+    
     def _extract_with_mutagen(self, filepath: str) -> Optional[Dict]:
         """
         mutagen で タグを抽出
@@ -139,9 +230,13 @@ if __name__ == '__main__':
     import sys
     
     if len(sys.argv) < 2:
-        print("Usage: python meta_audio.py <filepath>")
+        print("Usage: python meta_audio.py <filepath> [<filepath> ...]")
         sys.exit(1)
     
     extractor = AudioMetaExtractor()
-    meta = extractor.extract(sys.argv[1])
+    if len(sys.argv) == 2:
+        meta = extractor.extract(sys.argv[1])
+    else:
+        # 複数指定時はスレッドプールで並行実行
+        meta = extractor.extract_batch(sys.argv[1:])
     print(json.dumps(meta, indent=2, ensure_ascii=False))
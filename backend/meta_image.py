@@ -7,6 +7,12 @@ Pillow で画像情報、EXIF で以下を取得（可能な範囲）：
 
 Phase 1では基本情報が中心。物体認識はPhase 2以降
 
+JPEG / PNG / WebP / GIF / BMP はまず image_headers で先頭のヘッダだけを読み
+（Pillow のプラグイン読み込みと EXIF 全体の解析を省く）、扱えない場合だけ Pillow を使う。
+
+大量の画像は extract_batch / iter_extract_batch でプロセスプールに分散できる
+（ワーカーは一定件数ごとに作り直して Pillow のメモリ増加を抑え、1 ファイルごとのタイムアウトを超えたら kill する）。
+
 【Phase 1 design constraints】
 - This module extracts ONLY image metadata (dimensions, format, basic EXIF).
 - Image content analysis (object detection, scene understanding) is NOT performed.
@@ -14,10 +20,22 @@ Phase 1では基本情報が中心。物体認識はPhase 2以降
 - Visual feature extraction is intentionally deferred to Phase 2+.
 """
 
+import os
 import json
+import time
 import logging
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+try:
+    from .throttle import IOThrottle, ThrottledReader, get_throttle
+    from .image_headers import parse_image, read_exif
+except ImportError:
+    from throttle import IOThrottle, ThrottledReader, get_throttle
+    from image_headers import parse_image, read_exif
 
 try:
     from PIL import Image
@@ -31,12 +49,89 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+# iter_extract_batch でパスを読み切った印
+_EXHAUSTED = object()
+
+# 空いているワーカーがあるとき・stop を見るときに、結果を待つ最長時間（秒）
+FEED_POLL_SEC = 0.1
+
+
+def _batch_worker(conn, native: bool, limits: Dict, max_tasks: int) -> None:
+    """
+    一括抽出のワーカープロセス（パイプで受けたパスを順に抽出して返す）
+    
+    Args:
+        conn: 親とのパイプ（None を受けるか max_tasks 件処理したら終了）
+        native: ヘッダを直接読むか
+        limits: 親の I/O 制限値（set_limits の引数）
+        max_tasks: 処理したら終了する件数（0 で無制限）
+    """
+    get_throttle().set_limits(**limits)
+    extractor = ImageMetaExtractor(native=native)
+    done = 0
+    while not max_tasks or done < max_tasks:
+        try:
+            filepath = conn.recv()
+        except EOFError:
+            return
+        if filepath is None:
+            return
+        conn.send((filepath, extractor.extract(filepath)))
+        done += 1
+
+
+class _BatchWorker:
+    """一括抽出のワーカープロセス 1 つ分の状態"""
+    
+    __slots__ = ('process', 'conn', 'filepath', 'deadline', 'tasks')
+    
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.filepath = None
+        self.deadline = 0.0
+        self.tasks = 0
+    
+    def stop(self, kill: bool = False) -> None:
+        """プロセスを終了させて回収"""
+        if kill and self.process.is_alive():
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
 class ImageMetaExtractor:
     """画像メタデータ抽出器"""
     
-    def __init__(self):
-        """初期化"""
+    # 出力の形・内容が変わったら上げる（抽出結果キャッシュが無効化される）
+    VERSION = 2
+    
+    def __init__(self, throttle: Optional[IOThrottle] = None, native: bool = True,
+                 processes: Optional[int] = None, max_tasks_per_child: int = 500, timeout: float = 30.0):
+        """
+        初期化
+        
+        Args:
+            throttle: I/O 制限（ヘッダの直接読み込みに使う。省略時はプロセス共有のもの）
+            native: JPEG / PNG / WebP / GIF / BMP のヘッダを直接読むか（扱えなければ Pillow を使う）
+            processes: 一括抽出のワーカープロセス数（省略時は CPU 数）
+            max_tasks_per_child: 一括抽出でワーカーを作り直すまでの件数（0 で作り直さない）
+            timeout: 一括抽出での 1 ファイルあたりのタイムアウト（秒。超えたらワーカーを kill）
+        """
         self.pil_available = PIL_AVAILABLE
+        self.throttle = throttle or get_throttle()
+        self.native = native
+        self.processes = processes or os.cpu_count() or 1
+        self.max_tasks_per_child = max(0, int(max_tasks_per_child))
+        self.timeout = timeout
     
     def extract(self, filepath: str) -> Dict:
         """
@@ -48,6 +143,11 @@ class ImageMetaExtractor:
         Returns:
             メタデータ辞書
         """
+        if self.native:
+            meta = self._extract_native(filepath)
+            if meta is not None:
+                return meta
+        
         meta = {
             'pil_available': self.pil_available,
             'error': None
@@ -76,6 +176,171 @@ class ImageMetaExtractor:
         
         return meta
     
+    def iter_extract_batch(self, filepaths: Iterable[str], processes: Optional[int] = None,
+                           max_tasks_per_child: Optional[int] = None, timeout: Optional[float] = None,
+                           stop: Optional[threading.Event] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        複数ファイルをプロセスプールで抽出し、終わった順に返す
+        
+        各ワーカーには 1 件ずつ渡す（パイプはワーカーごと）。タイムアウトしたファイル・
+        ワーカーが異常終了したファイルはエラーとして返し、そのワーカーだけを作り直す。
+        途中で打ち切る（ジェネレータを閉じる）とワーカーはすべて終了する。
+        
+        filepaths が None を返すと「今は渡すものが無い」とみなし、実行中の分の回収・タイムアウト処理に
+        進んでから再び読む（パイプラインのように後からパスが届く場合は、待ち時間を区切って None を返す）。
+        
+        Args:
+            filepaths: ファイルパス（ジェネレータ可。必要な分だけ読み進める）
+            processes: ワーカープロセス数（省略時は self.processes）
+            max_tasks_per_child: ワーカーを作り直すまでの件数（省略時は self.max_tasks_per_child）
+            timeout: 1 ファイルあたりのタイムアウト（秒。省略時は self.timeout）
+            stop: 設定されたら実行中のワーカーを kill して終わる（別スレッドから止める場合）
+        
+        Yields:
+            (ファイルパス, メタデータ辞書)
+        """
+        processes = max(1, processes or self.processes)
+        max_tasks = self.max_tasks_per_child if max_tasks_per_child is None else max(0, max_tasks_per_child)
+        timeout = self.timeout if timeout is None else timeout
+        
+        metrics = self.throttle.metrics()
+        limits = {
+            'stat_per_sec': metrics['limit_stat_per_sec'],
+            'read_bytes_per_sec': metrics['limit_read_bytes_per_sec'],
+            'max_subprocesses': metrics['limit_subprocesses']
+        }
+        # fork だと親のスレッド・ロックの状態を引き継ぐため spawn で作る
+        context = multiprocessing.get_context('spawn')
+        
+        def start() -> _BatchWorker:
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_batch_worker, args=(child_conn, self.native, limits, max_tasks), daemon=True
+            )
+            process.start()
+            child_conn.close()
+            return _BatchWorker(process, parent_conn)
+        
+        paths = iter(filepaths)
+        exhausted = False
+        workers = [start() for _ in range(processes)]
+        try:
+            while True:
+                if stop is not None and stop.is_set():
+                    return
+                
+                # 空いているワーカーに 1 件ずつ渡す
+                for worker in workers:
+                    if worker.filepath is not None or exhausted:
+                        continue
+                    filepath = next(paths, _EXHAUSTED)
+                    if filepath is _EXHAUSTED:
+                        exhausted = True
+                        break
+                    if filepath is None:
+                        # 今は渡すものが無い（後から追加される）。実行中の分の回収に進む
+                        break
+                    worker.conn.send(filepath)
+                    worker.filepath = filepath
+                    worker.deadline = time.monotonic() + timeout
+                    worker.tasks += 1
+                
+                busy = [worker for worker in workers if worker.filepath is not None]
+                if not busy:
+                    if exhausted:
+                        return
+                    continue
+                
+                wait_sec = max(0.0, min(worker.deadline for worker in busy) - time.monotonic())
+                if stop is not None or (not exhausted and len(busy) < len(workers)):
+                    wait_sec = min(wait_sec, FEED_POLL_SEC)
+                ready = set(wait([worker.conn for worker in busy], wait_sec))
+                now = time.monotonic()
+                
+                for i, worker in enumerate(workers):
+                    if worker.filepath is None:
+                        continue
+                    
+                    if worker.conn in ready:
+                        try:
+                            filepath, meta = worker.conn.recv()
+                        except (EOFError, OSError):
+                            # Pillow の異常終了など
+                            filepath, meta = worker.filepath, self._batch_error("worker process died")
+                            worker.stop(kill=True)
+                            workers[i] = start()
+                        else:
+                            worker.filepath = None
+                            if max_tasks and worker.tasks >= max_tasks:
+                                # 一定件数ごとに作り直してメモリを解放する
+                                worker.stop()
+                                workers[i] = start()
+                        yield filepath, meta
+                    
+                    elif worker.deadline <= now:
+                        logger.warning(f"Image extraction timed out after {timeout}s: {worker.filepath}")
+                        filepath = worker.filepath
+                        worker.stop(kill=True)
+                        workers[i] = start()
+                        yield filepath, self._batch_error("image extraction timeout")
+        finally:
+            for worker in workers:
+                worker.stop(kill=worker.filepath is not None)
+    
+    def extract_batch(self, filepaths: Iterable[str], processes: Optional[int] = None,
+                      max_tasks_per_child: Optional[int] = None,
+                      timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        複数ファイルをプロセスプールで抽出
+        
+        Args:
+            filepaths: ファイルパス
+            processes: ワーカープロセス数
+            max_tasks_per_child: ワーカーを作り直すまでの件数
+            timeout: 1 ファイルあたりのタイムアウト（秒）
+        
+        Returns:
+            ファイルパス → メタデータ辞書
+        """
+        return dict(self.iter_extract_batch(filepaths, processes, max_tasks_per_child, timeout))
+    
+    def _batch_error(self, message: str) -> Dict:
+        """一括抽出で結果が得られなかったファイルのメタデータ"""
+        return {
+            'pil_available': self.pil_available,
+            'error': message
+        }
+    
+    def _extract_native(self, filepath: str) -> Optional[Dict]:
+        """
+        ヘッダを直接読んで抽出（Pillow を使わない）
+        
+        Args:
+            filepath: ファイルパス
+        
+        Returns:
+            メタデータ辞書（extract と同じ形）。扱えない形式・構造なら None
+        """
+        try:
+            with open(filepath, 'rb') as raw:
+                parsed = parse_image(ThrottledReader(raw, self.throttle))
+            if parsed is None:
+                return None
+            info, exif = parsed
+            exif_data = read_exif(exif) if exif else None
+        except Exception as e:
+            logger.debug(f"Header parse failed, falling back to Pillow: {filepath}: {e}")
+            return None
+        
+        meta = {
+            'pil_available': self.pil_available,
+            'error': None
+        }
+        meta.update(info)
+        if exif_data:
+            meta['exif'] = exif_data
+        return meta
+    
     def _extract_exif(self, img: 'Image.Image') -> Optional[Dict]:
         """
         EXIF データを抽出
@@ -122,9 +387,15 @@ if __name__ == '__main__':
     import sys
     
     if len(sys.argv) < 2:
-        print("Usage: python meta_image.py <filepath>")
+        print("Usage: python meta_image.py [--no-native] <filepath> [<filepath> ...]")
         sys.exit(1)
     
-    extractor = ImageMetaExtractor()
-    meta = extractor.extract(sys.argv[1])
+    native = sys.argv[1] != '--no-native'
+    filepaths = sys.argv[1:] if native else sys.argv[2:]
+    extractor = ImageMetaExtractor(native=native)
+    if len(filepaths) == 1:
+        meta = extractor.extract(filepaths[0])
+    else:
+        # 複数指定時はプロセスプールで並行実行
+        meta = extractor.extract_batch(filepaths)
     print(json.dumps(meta, indent=2, ensure_ascii=False))
@@ -8,6 +8,17 @@ ffprobe を使用して以下を抽出：
 
 ffprobe が無い場合は graceful に失敗
 
+既定の lean プロファイルでは、使う項目だけを -show_entries で要求し、
+-probesize / -analyzeduration を小さく抑えて読み込み量を減らす
+（ネットワーク越しの大きな MKV などで効く）。
+結果が欠けていれば（長さ・コーデック・解像度などが取れない）通常のプローブでやり直す。
+
+.mp4 / .m4v / .mov / .mkv / .webm はまず container_headers でヘッダを直接読み
+（数 KB の seek / read。ffprobe を起動しない）、結果が欠けている場合だけ ffprobe を使う。
+
+大量のファイルは extract_batch / iter_extract_async で ffprobe を並行実行できる
+（asyncio のサブプロセス。同時実行数の上限・ファイルごとのタイムアウト・キャンセル対応）
+
 【Phase 1 design constraints】
 - This module extracts ONLY technical metadata (duration, resolution, codec, bitrate).
 - Media content analysis (speech, visual features, etc.) is NOT performed.
@@ -15,37 +26,78 @@ ffprobe が無い場合は graceful に失敗
 - Codec and format information are for indexing purposes only, not interpretation.
 """
 
+import os
+import asyncio
 import subprocess
 import json
 import logging
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
 from pathlib import Path
 
+try:
+    from .throttle import IOThrottle, ThrottledReader, get_throttle, FFPROBE_READ_ESTIMATE
+    from .container_headers import NATIVE_EXTENSIONS, parse_container
+    from .tools import get_tools
+except ImportError:
+    from throttle import IOThrottle, ThrottledReader, get_throttle, FFPROBE_READ_ESTIMATE
+    from container_headers import NATIVE_EXTENSIONS, parse_container
+    from tools import get_tools
+
 
 logger = logging.getLogger(__name__)
 
 
+# lean プロファイルで要求する項目（_parse_ffprobe_output が使うものだけ）
+LEAN_SHOW_ENTRIES = (
+    'format=duration'
+    ':format_tags=title,artist,album,date'
+    ':stream=codec_type,codec_name,width,height,r_frame_rate,bit_rate,sample_rate,channels'
+    ':stream_tags=language'
+)
+
+# lean プロファイルの読み込み上限（ffprobe の既定は 5MB / 5 秒）
+LEAN_PROBESIZE = 1_000_000
+LEAN_ANALYZEDURATION_US = 1_000_000
+
+
 class VideoAudioMetaExtractor:
     """ffprobe 使用メタデータ抽出器"""
     
-    def __init__(self):
-        """ffprobe の可用性をチェック"""
-        self.ffprobe_available = self._check_ffprobe()
+    # 出力の形・内容が変わったら上げる（抽出結果キャッシュが無効化される）
+    VERSION = 3
     
-    def _check_ffprobe(self) -> bool:
-        """ffprobe コマンドが利用可能か確認"""
-        try:
-            subprocess.run(
-                ['ffprobe', '-version'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=5
-            )
-            logger.info("ffprobe is available")
-            return True
-        except (FileNotFoundError, subprocess.TimeoutExpired):
-            logger.warning("ffprobe not found - will use fallback metadata extraction")
-            return False
+    def __init__(self, throttle: Optional[IOThrottle] = None, ffprobe_path: str = 'ffprobe',
+                 timeout: float = 30.0, concurrency: int = 16, profile: str = 'lean',
+                 probesize: int = LEAN_PROBESIZE, analyzeduration_us: int = LEAN_ANALYZEDURATION_US,
+                 native: bool = True):
+        """
+        初期化（ffprobe の可用性は初めて必要になったときに共有レジストリで確認する）
+        
+        Args:
+            throttle: I/O 制限（省略時はプロセス共有のもの）
+            ffprobe_path: ffprobe コマンド
+            timeout: 1 ファイルあたりのタイムアウト（秒）
+            concurrency: 一括抽出で同時に動かす ffprobe の数
+            profile: 'lean'（必要な項目だけ・読み込み量を制限し、欠けたら full でやり直す）か 'full'
+            probesize: lean プロファイルの -probesize（バイト）
+            analyzeduration_us: lean プロファイルの -analyzeduration（マイクロ秒）
+            native: MP4/MOV・Matroska/WebM のヘッダを直接読むか（欠けていれば ffprobe を使う）
+        """
+        if profile not in ('lean', 'full'):
+            raise ValueError(f"Unknown ffprobe profile: {profile}")
+        self.ffprobe_path = ffprobe_path
+        self.timeout = timeout
+        self.concurrency = max(1, int(concurrency))
+        self.profile = profile
+        self.probesize = max(32, int(probesize))
+        self.analyzeduration_us = max(0, int(analyzeduration_us))
+        self.native = native
+        self.throttle = throttle or get_throttle()
+    
+    @property
+    def ffprobe_available(self) -> bool:
+        """ffprobe コマンドが利用可能か（プロセス共有・ディスクキャッシュ付きのレジストリで確認）"""
+        return get_tools().available('ffprobe', self.ffprobe_path)
     
     def extract(self, filepath: str) -> Dict:
         """
@@ -57,6 +109,11 @@ class VideoAudioMetaExtractor:
         Returns:
             メタデータ辞書
         """
+        if self.native:
+            meta = self._extract_native(filepath)
+            if meta is not None:
+                return meta
+        
         meta = {
             'ffprobe_available': self.ffprobe_available,
             'error': None
@@ -67,36 +124,316 @@ class VideoAudioMetaExtractor:
             return meta
         
         try:
-            result = subprocess.run(
-                [
-                    'ffprobe',
-                    '-v', 'quiet',
-                    '-print_format', 'json',
-                    '-show_format',
-                    '-show_streams',
-                    filepath
-                ],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            for lean in self._probe_plan():
+                meta = {'ffprobe_available': True, 'error': None}
+                self._charge_read(filepath, lean)
+                
+                with self.throttle.subprocess_slot():
+                    result = subprocess.run(
+                        self._ffprobe_command(filepath, lean),
+                        capture_output=True,
+                        text=True,
+                        timeout=self.timeout
+                    )
+                
+                self._apply_result(result.returncode, result.stdout, result.stderr, meta)
+                if not (lean and self._needs_full_probe(meta)):
+                    break
+                logger.debug(f"Lean probe incomplete, retrying with full probe: {filepath}")
             
-            if result.returncode != 0:
-                meta['error'] = result.stderr
+        except subprocess.TimeoutExpired:
+            meta['error'] = "ffprobe timeout"
+        except Exception as e:
+            meta['error'] = str(e)
+        
+        return meta
+    
+    async def extract_async(self, filepath: str, timeout: Optional[float] = None) -> Dict:
+        """
+        extract の asyncio 版（ffprobe を asyncio のサブプロセスで実行）
+        
+        タイムアウト・キャンセル時は ffprobe を kill して回収する。
+        lean プロファイルで結果が欠けた場合の full でのやり直しも extract と同じ。
+        
+        Args:
+            filepath: ファイルパス
+            timeout: タイムアウト（秒。省略時は self.timeout）
+        
+        Returns:
+            メタデータ辞書（extract と同じ形）
+        """
+        if self.native:
+            # ヘッダの読み込みは小さいが、ネットワーク越しの待ちでイベントループを止めない
+            meta = await asyncio.get_running_loop().run_in_executor(None, self._extract_native, filepath)
+            if meta is not None:
                 return meta
+        
+        meta = {
+            'ffprobe_available': self.ffprobe_available,
+            'error': None
+        }
+        
+        if not self.ffprobe_available:
+            meta['error'] = "ffprobe not available"
+            return meta
+        
+        timeout = self.timeout if timeout is None else timeout
+        for lean in self._probe_plan():
+            meta = {'ffprobe_available': True, 'error': None}
+            if not await self._probe_async(filepath, lean, timeout, meta):
+                break
+            if not (lean and self._needs_full_probe(meta)):
+                break
+            logger.debug(f"Lean probe incomplete, retrying with full probe: {filepath}")
+        
+        return meta
+    
+    async def _probe_async(self, filepath: str, lean: bool, timeout: float, meta: Dict) -> bool:
+        """
+        ffprobe を 1 回実行して結果をメタデータに反映
+        
+        実行中は throttle の外部プロセス枠を 1 つ使う（同期の extract・7z / unrar と共有）。
+        
+        Returns:
+            ffprobe が時間内に終わったか（タイムアウト・例外時は False）
+        """
+        try:
+            # 読み込み量の制限で待つ場合もイベントループは止めない
+            await asyncio.get_running_loop().run_in_executor(None, self._charge_read, filepath, lean)
             
-            data = json.loads(result.stdout)
-            self._parse_ffprobe_output(data, meta)
+            async with self.throttle.subprocess_slot_async():
+                proc = None
+                try:
+                    proc = await asyncio.create_subprocess_exec(
+                        *self._ffprobe_command(filepath, lean),
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE
+                    )
+                    stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+                finally:
+                    # タイムアウト・キャンセル時に ffprobe を残さない（回収してから枠を返す）
+                    if proc is not None and proc.returncode is None:
+                        try:
+                            proc.kill()
+                        except ProcessLookupError:
+                            pass
+                        await proc.wait()
             
-        except json.JSONDecodeError as e:
-            meta['error'] = f"JSON parse error: {e}"
-        except subprocess.TimeoutExpired:
+            self._apply_result(
+                proc.returncode,
+                stdout.decode('utf-8', errors='replace'),
+                stderr.decode('utf-8', errors='replace'),
+                meta
+            )
+            return True
+        
+        except asyncio.TimeoutError:
             meta['error'] = "ffprobe timeout"
         except Exception as e:
             meta['error'] = str(e)
+        return False
+    
+    async def iter_extract_async(self, filepaths: Iterable[str], concurrency: Optional[int] = None,
+                                 timeout: Optional[float] = None) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        複数ファイルを並行して抽出し、終わった順に返す（非同期ジェネレータ）
+        
+        ffprobe の同時実行数は concurrency まで。各 ffprobe は throttle の外部プロセス枠を取るため、
+        同時に動く他の抽出器・一覧取得と合わせても max_subprocesses を超えない。
+        1 ファイルがタイムアウトしても他は止まらない。
+        途中で打ち切る・キャンセルすると実行中の ffprobe は kill される。
+        
+        Args:
+            filepaths: ファイルパス（ジェネレータ可。必要な分だけ読み進める）
+            concurrency: 同時実行数（省略時は self.concurrency）
+            timeout: 1 ファイルあたりのタイムアウト（秒）
+        
+        Yields:
+            (ファイルパス, メタデータ辞書)
+        """
+        limit = concurrency or self.concurrency
+        subprocess_limit = self.throttle.metrics()['limit_subprocesses']
+        if subprocess_limit:
+            limit = min(limit, subprocess_limit)
+        
+        paths = iter(filepaths)
+        results = asyncio.Queue(maxsize=limit)
+        done = object()
         
+        async def worker() -> None:
+            try:
+                # イベントループは 1 スレッドなので、共有イテレータから順に取り出してよい
+                for path in paths:
+                    await results.put((path, await self.extract_async(path, timeout)))
+            except asyncio.CancelledError:
+                # 打ち切られた（受け手はもう読まない）。満杯のキューへの終了の印で止まらないよう送らない
+                raise
+            except Exception as e:
+                logger.error(f"Batch worker failed: {e}")
+            await results.put(done)
+        
+        workers = [asyncio.create_task(worker()) for _ in range(limit)]
+        try:
+            remaining = len(workers)
+            while remaining:
+                item = await results.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                yield item
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def extract_batch_async(self, filepaths: Iterable[str], concurrency: Optional[int] = None,
+                                  timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        複数ファイルを並行して抽出（asyncio 版）
+        
+        Args:
+            filepaths: ファイルパス
+            concurrency: 同時実行数
+            timeout: 1 ファイルあたりのタイムアウト（秒）
+        
+        Returns:
+            ファイルパス → メタデータ辞書
+        """
+        return {
+            path: meta
+            async for path, meta in self.iter_extract_async(filepaths, concurrency, timeout)
+        }
+    
+    def extract_batch(self, filepaths: Iterable[str], concurrency: Optional[int] = None,
+                      timeout: Optional[float] = None) -> Dict[str, Dict]:
+        """
+        複数ファイルを並行して抽出（同期 API。内部でイベントループを回す）
+        
+        Args:
+            filepaths: ファイルパス
+            concurrency: 同時実行数（省略時は self.concurrency）
+            timeout: 1 ファイルあたりのタイムアウト（秒）
+        
+        Returns:
+            ファイルパス → メタデータ辞書
+        """
+        return asyncio.run(self.extract_batch_async(filepaths, concurrency, timeout))
+    
+    def _extract_native(self, filepath: str) -> Optional[Dict]:
+        """
+        コンテナのヘッダを直接読んで抽出（ffprobe を起動しない）
+        
+        Args:
+            filepath: ファイルパス
+        
+        Returns:
+            メタデータ辞書（extract と同じ形）。対応していない・結果が欠けている場合は None
+        """
+        ext = os.path.splitext(filepath)[1].lower()
+        if ext not in NATIVE_EXTENSIONS:
+            return None
+        
+        try:
+            with open(filepath, 'rb') as raw:
+                parsed = parse_container(ThrottledReader(raw, self.throttle), ext)
+        except Exception as e:
+            logger.debug(f"Header parse failed, falling back to ffprobe: {filepath}: {e}")
+            return None
+        if parsed is None:
+            return None
+        
+        meta = {'ffprobe_available': self.ffprobe_available, 'error': None}
+        meta.update(parsed)
+        if self._needs_full_probe(meta):
+            return None
         return meta
     
+    def _probe_plan(self) -> Tuple[bool, ...]:
+        """試すプローブの順（True = lean）"""
+        return (True, False) if self.profile == 'lean' else (False,)
+    
+    def _ffprobe_command(self, filepath: str, lean: bool = False) -> List[str]:
+        """
+        ffprobe のコマンドライン
+        
+        Args:
+            filepath: ファイルパス
+            lean: 使う項目だけを要求し、読み込み量を制限するか
+        
+        Returns:
+            コマンドライン
+        """
+        if lean:
+            return [
+                self.ffprobe_path,
+                '-v', 'quiet',
+                '-probesize', str(self.probesize),
+                '-analyzeduration', str(self.analyzeduration_us),
+                '-print_format', 'json',
+                '-show_entries', LEAN_SHOW_ENTRIES,
+                filepath
+            ]
+        return [
+            self.ffprobe_path,
+            '-v', 'quiet',
+            '-print_format', 'json',
+            '-show_format',
+            '-show_streams',
+            filepath
+        ]
+    
+    def _needs_full_probe(self, meta: Dict) -> bool:
+        """
+        lean プローブ・ヘッダ解析の結果が欠けているか（full でやり直すべきか）
+        
+        ビットレートはコンテナによっては full でも取れないため見ない。
+        
+        Args:
+            meta: lean プローブの結果
+        
+        Returns:
+            やり直すべきなら True
+        """
+        if meta.get('error') is not None or 'duration_sec' not in meta:
+            return True
+        
+        video = meta.get('video')
+        audio = meta.get('audio', [])
+        if video is None and not audio:
+            return True
+        if video is not None and not (video['codec'] and video['width'] and video['height'] and video['fps']):
+            return True
+        return any(not (stream['codec'] and stream['sample_rate'] and stream['channels']) for stream in audio)
+    
+    def _charge_read(self, filepath: str, lean: bool = False) -> None:
+        """ffprobe の読み込み量を推定値（ファイルサイズと probesize の小さい方）で計上"""
+        probesize = self.probesize if lean else FFPROBE_READ_ESTIMATE
+        try:
+            self.throttle.read(min(os.path.getsize(filepath), probesize))
+        except OSError:
+            pass
+    
+    def _apply_result(self, returncode: int, stdout: str, stderr: str, meta: Dict) -> None:
+        """
+        ffprobe の実行結果をメタデータに反映
+        
+        Args:
+            returncode: 終了コード
+            stdout: 標準出力（JSON）
+            stderr: 標準エラー出力
+            meta: 格納先メタデータ辞書（更新される）
+        """
+        if returncode != 0:
+            meta['error'] = stderr
+            return
+        
+        try:
+            data = json.loads(stdout)
+        except json.JSONDecodeError as e:
+            meta['error'] = f"JSON parse error: {e}"
+            return
+        self._parse_ffprobe_output(data, meta)
+    
     def _parse_ffprobe_output(self, data: Dict, meta: Dict) -> None:
         """
         ffprobe 出力を解析
@@ -171,9 +508,22 @@ if __name__ == '__main__':
     import sys
     
     if len(sys.argv) < 2:
-        print("Usage: python meta_video_audio.py <filepath>")
+        print("Usage: python meta_video_audio.py [--full] [--no-native] <filepath> [<filepath> ...]")
         sys.exit(1)
     
-    extractor = VideoAudioMetaExtractor()
-    meta = extractor.extract(sys.argv[1])
+    profile = 'lean'
+    native = True
+    while len(sys.argv) > 2 and sys.argv[1] in ('--full', '--no-native'):
+        if sys.argv[1] == '--full':
+            profile = 'full'
+        else:
+            native = False
+        del sys.argv[1]
+    
+    extractor = VideoAudioMetaExtractor(profile=profile, native=native)
+    if len(sys.argv) == 2:
+        meta = extractor.extract(sys.argv[1])
+    else:
+        # 複数指定時は並行実行
+        meta = extractor.extract_batch(sys.argv[1:])
     print(json.dumps(meta, indent=2, ensure_ascii=False))
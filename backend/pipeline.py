@@ -0,0 +1,833 @@
+"""
+pipeline.py - 走査 → 抽出 → インデックス化の並列パイプライン
+
+MediaScanner の出力を種別ごとの抽出器に流し、結果をまとめて Chroma に登録する。
+
+    scanner（スレッド）
+      → 抽出ワーカー（種別ごと）
+          CPU 主体（既定: image）       : プロセスプール（画像は作り直し・タイムアウト付きの専用ワーカー）
+          外部プロセス主体（video など）: スレッドプール
+      → インデックス登録（メインスレッド、index_batch_size 件ずつ upsert）
+      → カタログ書き出し（metadata.json / .ndjson）
+
+レコードには video_meta / image_meta / audio_meta / archive_meta と、
+付随ファイルがあれば text_sources が追加される（_create_document がそのまま使う形）。
+
+抽出中・登録待ちのレコード数は queue_size までに制限する。
+インデックス登録が遅れると抽出の投入が止まり、さらに走査も止まる（バックプレッシャー）。
+段ごとの処理件数・スループットは report_interval_sec ごとにログに出す。
+
+metadata.probe_cache が有効なら、動画・画像・音声の抽出結果を (path, size, mtime_ns, 抽出器バージョン)
+でキャッシュし、変更のないファイルはプローブしない（走査レコード一定件数ごとに一括検索）。
+metadata.failure_registry が有効なら、抽出に失敗したファイルを記録し、変更されるまで
+指数バックオフでスキップする（前回のエラーを quarantined: true 付きで出力）。
+metadata.archive_index が有効なら、アーカイブのエントリパスを転置インデックス（archive_index.py）に
+登録する（Chroma とは別。「このファイルを含むアーカイブ」の検索用）。
+カタログのアーカイブ一覧は先頭 metadata.archive_catalog_entries 件に切り詰める
+（全件はアーカイブ一覧キャッシュと転置インデックスにある）。
+
+【Phase 1 design constraints】
+- Extractors return technical metadata and sidecar text only.
+- Media content analysis is NOT performed at any stage.
+"""
+
+import os
+import sys
+import time
+import queue
+import multiprocessing
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .scanner import MediaScanner
+    from .meta_video_audio import VideoAudioMetaExtractor, LEAN_PROBESIZE, LEAN_ANALYZEDURATION_US
+    from .meta_image import ImageMetaExtractor, FEED_POLL_SEC
+    from .meta_audio import AudioMetaExtractor
+    from .archive_list import ArchiveListExtractor, catalog_listing
+    from .text_sources import TextSourceExtractor
+    from .catalog_io import write_records
+    from .throttle import configure_throttle
+    from .tools import configure_tools
+    from .probe_cache import ProbeCache
+    from .failure_registry import (
+        FailureRegistry, classify_error, DEFAULT_BACKOFF_SEC, DEFAULT_MAX_BACKOFF_SEC
+    )
+    from .archive_index import ArchiveIndex, WRITE_BATCH as ARCHIVE_INDEX_BATCH
+except ImportError:
+    from scanner import MediaScanner
+    from meta_video_audio import VideoAudioMetaExtractor, LEAN_PROBESIZE, LEAN_ANALYZEDURATION_US
+    from meta_image import ImageMetaExtractor, FEED_POLL_SEC
+    from meta_audio import AudioMetaExtractor
+    from archive_list import ArchiveListExtractor, catalog_listing
+    from text_sources import TextSourceExtractor
+    from catalog_io import write_records
+    from throttle import configure_throttle
+    from tools import configure_tools
+    from probe_cache import ProbeCache
+    from failure_registry import (
+        FailureRegistry, classify_error, DEFAULT_BACKOFF_SEC, DEFAULT_MAX_BACKOFF_SEC
+    )
+    from archive_index import ArchiveIndex, WRITE_BATCH as ARCHIVE_INDEX_BATCH
+
+
+logger = logging.getLogger(__name__)
+
+
+# 種別 → 抽出結果を格納するキー
+META_KEYS = {
+    'video': 'video_meta',
+    'image': 'image_meta',
+    'audio': 'audio_meta',
+    'archive': 'archive_meta'
+}
+
+
+# 結果をキャッシュする抽出器（種別 → クラス。VERSION が上がるとキャッシュは無効）
+CACHED_EXTRACTORS = {
+    'video': VideoAudioMetaExtractor,
+    'image': ImageMetaExtractor,
+    'audio': AudioMetaExtractor
+}
+
+# キャッシュを一括検索する走査レコード数・一括保存する件数
+CACHE_LOOKUP_BATCH = 256
+CACHE_WRITE_BATCH = 500
+
+
+# ワーカー（プロセス・スレッド）ごとの抽出器
+_worker_config = {}
+_extractors = {}
+_extractors_lock = threading.Lock()
+
+
+def _init_worker(metadata_config: Dict, throttle_config: Optional[Dict]) -> None:
+    """
+    抽出ワーカーの初期化（プロセスプールの initializer。スレッド用には親プロセスで 1 回呼ぶ）
+    
+    Args:
+        metadata_config: config.yaml の metadata セクション
+        throttle_config: config.yaml の throttle セクション
+    """
+    global _worker_config
+    _worker_config = metadata_config or {}
+    configure_throttle(throttle_config)
+    configure_tools(_worker_config)
+
+
+def _extractor(name: str):
+    """抽出器を初回利用時に作成（ffprobe の可用性確認などを 1 回で済ませる）"""
+    extractor = _extractors.get(name)
+    if extractor is not None:
+        return extractor
+    
+    with _extractors_lock:
+        if name not in _extractors:
+            if name == 'video':
+                _extractors[name] = VideoAudioMetaExtractor(
+                    ffprobe_path=_worker_config.get('ffprobe_path', 'ffprobe'),
+                    timeout=float(_worker_config.get('ffprobe_timeout_sec', 30)),
+                    concurrency=int(_worker_config.get('ffprobe_concurrency', 16)),
+                    profile=_worker_config.get('ffprobe_profile', 'lean'),
+                    probesize=int(_worker_config.get('ffprobe_probesize', LEAN_PROBESIZE)),
+                    analyzeduration_us=int(
+                        _worker_config.get('ffprobe_analyzeduration_us', LEAN_ANALYZEDURATION_US)
+                    ),
+                    native=bool(_worker_config.get('native_container_parser', True))
+                )
+            elif name == 'image':
+                _extractors[name] = ImageMetaExtractor(
+                    native=bool(_worker_config.get('native_image_parser', True))
+                )
+            elif name == 'audio':
+                _extractors[name] = AudioMetaExtractor(
+                    ffprobe_path=_worker_config.get('ffprobe_path', 'ffprobe'),
+                    timeout=float(_worker_config.get('ffprobe_timeout_sec', 30))
+                )
+            elif name == 'archive':
+                _extractors[name] = ArchiveListExtractor(_worker_config)
+            elif name == 'text':
+                _extractors[name] = TextSourceExtractor(_worker_config)
+        return _extractors[name]
+
+
+def extract_record(meta: Dict) -> Tuple[Dict, float]:
+    """
+    1 レコード分の抽出（ワーカーで実行）
+    
+    Args:
+        meta: 走査レコード
+    
+    Returns:
+        (抽出結果を追加したレコード, 所要秒数)
+    """
+    started = time.perf_counter()
+    kind = meta.get('kind')
+    key = META_KEYS.get(kind)
+    
+    # キャッシュ済み（key が既にある）なら抽出しない
+    if (key is not None and key not in meta
+            and not (kind == 'video' and not _worker_config.get('use_ffprobe', True))):
+        try:
+            meta[key] = _extractor(kind).extract(meta['path'])
+        except Exception as e:
+            meta[key] = {'error': str(e), 'error_type': type(e).__name__}
+            logger.warning(f"Error extracting {meta['path']}: {e}")
+    
+    if meta.get('sidecar_files'):
+        try:
+            text = _extractor('text').extract_from_sidecar(meta['sidecar_files'])
+            meta['text_sources'] = text['text_sources']
+        except Exception as e:
+            logger.warning(f"Error reading sidecars of {meta['path']}: {e}")
+    
+    return meta, time.perf_counter() - started
+
+
+class ImageBatchPool:
+    """
+    画像抽出のワーカープロセス（ImageMetaExtractor.iter_extract_batch をパイプラインの投入に合わせて回す）
+    
+    ワーカーは max_tasks_per_child 件ごとに作り直し、1 ファイルが timeout 秒を超えたらそのワーカーだけ kill する。
+    """
+    
+    def __init__(self, extractor: ImageMetaExtractor):
+        """
+        初期化（ワーカーを起動する）
+        
+        Args:
+            extractor: 抽出器（processes / max_tasks_per_child / timeout を使う）
+        """
+        self.extractor = extractor
+        self._paths = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='pipeline-image', daemon=True)
+        self._thread.start()
+    
+    def submit(self, meta: Dict) -> Future:
+        """
+        1 レコードの抽出を投入
+        
+        Args:
+            meta: 走査レコード
+        
+        Returns:
+            (image_meta を追加したレコード, 所要秒数) を返す Future
+        """
+        future = Future()
+        with self._lock:
+            self._pending.setdefault(meta['path'], []).append((meta, future, time.perf_counter()))
+        self._paths.put(meta['path'])
+        return future
+    
+    def shutdown(self, cancel: bool = False) -> None:
+        """
+        終了（cancel なら実行中のワーカーを kill し、未完了の Future を失敗させる）
+        
+        Args:
+            cancel: 投入済みの分を待たずに止めるか
+        """
+        if cancel:
+            self._cancelled.set()
+        self._closing.set()
+        self._thread.join()
+    
+    def _feed(self) -> Iterator[Optional[str]]:
+        """投入されたパスを返す（届いていなければ None を返して結果の回収に戻す）"""
+        while True:
+            try:
+                yield self._paths.get(timeout=FEED_POLL_SEC)
+            except queue.Empty:
+                if self._closing.is_set():
+                    return
+                yield None
+    
+    def _run(self) -> None:
+        """抽出を回し、結果を Future に渡す（専用スレッド）"""
+        error = None
+        try:
+            for path, result in self.extractor.iter_extract_batch(self._feed(), stop=self._cancelled):
+                with self._lock:
+                    waiting = self._pending.get(path)
+                    meta, future, started = waiting.pop(0)
+                    if not waiting:
+                        del self._pending[path]
+                meta[META_KEYS['image']] = result
+                future.set_result((meta, time.perf_counter() - started))
+        except Exception as e:
+            logger.error(f"Image worker pool failed: {e}")
+            error = e
+        
+        with self._lock:
+            pending = [item for items in self._pending.values() for item in items]
+            self._pending.clear()
+        for meta, future, _ in pending:
+            future.set_exception(error or RuntimeError("image worker pool stopped"))
+
+
+class StageStats:
+    """パイプライン 1 段分の処理件数・所要時間"""
+    
+    def __init__(self, name: str, started: Optional[float] = None):
+        """
+        初期化
+        
+        Args:
+            name: 段の名前
+            started: スループット計算の起点（time.monotonic()。省略時は現在）
+        """
+        self.name = name
+        self.count = 0
+        self.busy_sec = 0.0
+        self.started = started if started is not None else time.monotonic()
+    
+    def add(self, count: int = 1, busy_sec: float = 0.0) -> None:
+        self.count += count
+        self.busy_sec += busy_sec
+    
+    def summary(self) -> Dict:
+        """件数・スループット（件/秒、開始からの経過時間あたり）・1 件あたり処理時間"""
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            'count': self.count,
+            'per_sec': self.count / elapsed,
+            'avg_sec': self.busy_sec / self.count if self.count else 0.0
+        }
+
+
+class MediaPipeline:
+    """走査・抽出・インデックス化をつなぐパイプライン"""
+    
+    def __init__(self, config_path: str = "config/config.yaml", use_index: bool = True):
+        """
+        初期化
+        
+        Args:
+            config_path: config.yaml のパス
+            use_index: Chroma への登録を行うか（False ならカタログ出力のみ）
+        """
+        self.scanner = MediaScanner(config_path)
+        self.config = self.scanner.config
+        
+        pipeline_config = self.config.get('pipeline') or {}
+        self.queue_size = max(1, int(pipeline_config.get('queue_size', 1000)))
+        self.process_kinds = set(pipeline_config.get('process_kinds', ['image']))
+        self.processes = int(pipeline_config.get('processes', 0)) or os.cpu_count() or 1
+        self.threads = max(1, int(pipeline_config.get('threads', 8)))
+        self.index_batch_size = max(1, int(pipeline_config.get('index_batch_size', 500)))
+        self.max_tasks_per_child = max(0, int(pipeline_config.get('max_tasks_per_child', 500)))
+        self.image_timeout_sec = float(pipeline_config.get('image_timeout_sec', 30))
+        self.report_interval_sec = float(pipeline_config.get('report_interval_sec', 10))
+        
+        self.indexer = None
+        if use_index:
+            try:
+                from .indexer import MediaIndexer
+            except ImportError:
+                from indexer import MediaIndexer
+            self.indexer = MediaIndexer(config_path)
+        
+        metadata_config = self.config.get('metadata') or {}
+        self.probe_cache = None
+        self.probe_cache_evict = bool(metadata_config.get('probe_cache_evict', False))
+        if metadata_config.get('probe_cache', True):
+            self.probe_cache = ProbeCache(
+                metadata_config.get('probe_cache_path', 'data/raw/probe_cache.sqlite')
+            )
+            for kind, extractor_class in CACHED_EXTRACTORS.items():
+                self.probe_cache.register(META_KEYS[kind], extractor_class.VERSION)
+        self.failures = None
+        if metadata_config.get('failure_registry', True):
+            self.failures = FailureRegistry(
+                metadata_config.get('failure_registry_path', 'data/raw/failures.sqlite'),
+                backoff_sec=float(metadata_config.get('failure_backoff_sec', DEFAULT_BACKOFF_SEC)),
+                max_backoff_sec=float(metadata_config.get('failure_max_backoff_sec', DEFAULT_MAX_BACKOFF_SEC))
+            )
+        self.archive_catalog_entries = max(0, int(metadata_config.get('archive_catalog_entries', 1000)))
+        self.archive_index = None
+        if metadata_config.get('archive_index', True):
+            self.archive_index = ArchiveIndex(
+                metadata_config.get('archive_index_path', 'data/raw/archive_index.sqlite')
+            )
+        # 抽出に回したファイルの (size, mtime_ns)（抽出後にキャッシュ・失敗レジストリへ保存する）
+        self._cache_keys = {}
+        self._cache_writes = {}
+        # 変更された・スキップ期間が過ぎたため再試行中のファイル（成功したら記録を消す）
+        self._retrying = set()
+        self._failure_writes = {}
+        self._failure_clears = {}
+        
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        self._started = None
+    
+    def iter_enriched(self) -> Iterator[Dict]:
+        """
+        走査しながら抽出し、抽出が終わった順にレコードを返す（ジェネレータ）
+        
+        Yields:
+            抽出結果を追加したメタデータ辞書
+        """
+        metadata_config = self.config.get('metadata') or {}
+        throttle_config = self.config.get('throttle')
+        _init_worker(metadata_config, throttle_config)
+        
+        self._started = time.monotonic()
+        self.stats['scan'] = StageStats('scan', self._started)
+        if self.probe_cache is not None:
+            self.stats['cache_hit'] = StageStats('cache_hit', self._started)
+        if self.failures is not None:
+            self.stats['quarantined'] = StageStats('quarantined', self._started)
+        if self.probe_cache is not None or self.failures is not None:
+            # キャッシュキー用に走査時の stat 結果（size, mtime_ns）を受け取る
+            if self.scanner.file_identities is None:
+                self.scanner.file_identities = {}
+        # 抽出中・受け取り待ちの件数の上限（これを超えると走査側が待つ）
+        slots = threading.BoundedSemaphore(self.queue_size)
+        # 投入数は slots で抑えているため、この put で詰まることはない
+        results = queue.Queue(maxsize=self.queue_size + 1)
+        stop = threading.Event()
+        
+        # fork だと、スレッド側で ffprobe を起動中に複製された子が
+        # subprocess のエラー通知パイプを握ったままになり起動側が止まるため spawn で作る
+        pool_options = {}
+        if sys.version_info >= (3, 11) and self.max_tasks_per_child:
+            # max_tasks_per_child は 3.11 から（それより前は作り直さない。画像は ImageBatchPool で作り直す）
+            pool_options['max_tasks_per_child'] = self.max_tasks_per_child
+        process_pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(metadata_config, throttle_config),
+            **pool_options
+        )
+        thread_pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='extract')
+        # 画像はワーカーの作り直し・1 ファイルごとのタイムアウトがある専用のプールで抽出する
+        image_pool = None
+        if 'image' in self.process_kinds:
+            image_pool = ImageBatchPool(ImageMetaExtractor(
+                native=bool(metadata_config.get('native_image_parser', True)),
+                processes=self.processes,
+                max_tasks_per_child=self.max_tasks_per_child,
+                timeout=self.image_timeout_sec
+            ))
+        
+        def forward_image(meta: Dict, future: Future) -> None:
+            # 付随ファイルの読み込みはスレッドプールで続ける
+            if future.exception() is not None or not meta.get('sidecar_files'):
+                results.put((meta, future))
+                return
+            try:
+                sidecars = thread_pool.submit(extract_record, meta)
+            except RuntimeError:
+                # 停止中
+                results.put((meta, future))
+                return
+            sidecars.add_done_callback(lambda f: results.put((meta, f)))
+        
+        def submit(meta: Dict) -> bool:
+            while not slots.acquire(timeout=0.5):
+                if stop.is_set():
+                    return False
+            if stop.is_set():
+                return False
+            
+            key = META_KEYS.get(meta.get('kind'))
+            if key is not None and key in meta and not meta.get('sidecar_files'):
+                # キャッシュで済んだ・スキップ中のレコードはワーカーに回さない
+                future = Future()
+                future.set_result((meta, None))
+                results.put((meta, future))
+                return True
+            
+            if image_pool is not None and meta.get('kind') == 'image' and key not in meta:
+                future = image_pool.submit(meta)
+                future.add_done_callback(lambda f, meta=meta: forward_image(meta, f))
+                return True
+            
+            pool = process_pool if meta.get('kind') in self.process_kinds else thread_pool
+            future = pool.submit(extract_record, meta)
+            future.add_done_callback(lambda f, meta=meta: results.put((meta, f)))
+            return True
+        
+        lookups = self.probe_cache is not None or self.failures is not None
+        
+        def produce() -> None:
+            submitted = 0
+            records = self.scanner.scan_iter()
+            batch = []
+            try:
+                for meta in records:
+                    self.stats['scan'].add()
+                    batch.append(meta)
+                    if lookups and len(batch) < CACHE_LOOKUP_BATCH:
+                        continue
+                    self._apply_known(batch)
+                    for item in batch:
+                        if not submit(item):
+                            return
+                        submitted += 1
+                    batch = []
+                
+                self._apply_known(batch)
+                for item in batch:
+                    if not submit(item):
+                        return
+                    submitted += 1
+            except Exception as e:
+                logger.error(f"Scan stage failed: {e}")
+            finally:
+                records.close()
+                # 終了通知（未受け取りの結果は queue_size 件以下なので必ず入る）
+                results.put((None, submitted))
+        
+        producer = threading.Thread(target=produce, name='pipeline-scan', daemon=True)
+        producer.start()
+        
+        received = 0
+        expected = None
+        last_report = time.monotonic()
+        try:
+            while expected is None or received < expected:
+                meta, outcome = results.get()
+                if meta is None:
+                    expected = outcome
+                    continue
+                
+                received += 1
+                slots.release()
+                yield self._finish(meta, outcome)
+                
+                if time.monotonic() - last_report >= self.report_interval_sec:
+                    self.report()
+                    last_report = time.monotonic()
+        finally:
+            stop.set()
+            producer.join()
+            if image_pool is not None:
+                image_pool.shutdown(cancel=True)
+            thread_pool.shutdown(wait=True, cancel_futures=True)
+            process_pool.shutdown(wait=True, cancel_futures=True)
+            self._flush_cache_writes()
+            self._flush_failures()
+    
+    def _apply_known(self, batch: List[Dict]) -> None:
+        """
+        キャッシュ・失敗レジストリを一括検索し、抽出しなくてよいレコードに結果を入れる
+        
+        Args:
+            batch: 走査レコード（更新される）
+        """
+        if not batch or (self.probe_cache is None and self.failures is None):
+            return
+        
+        kinds = META_KEYS if self.failures is not None else CACHED_EXTRACTORS
+        by_key = {}
+        for meta in batch:
+            if meta.get('kind') not in kinds:
+                continue
+            identity = self.scanner.file_identities.pop(meta['path'], None)
+            if identity is None:
+                try:
+                    stat = os.stat(meta['path'])
+                    identity = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+            self._cache_keys[meta['path']] = (identity[0], identity[1])
+            by_key.setdefault(META_KEYS[meta['kind']], []).append(meta)
+        
+        for key, records in by_key.items():
+            if records[0]['kind'] in CACHED_EXTRACTORS:
+                self._apply_cache(key, records)
+            self._apply_failures(key, [meta for meta in records if key not in meta])
+    
+    def _apply_cache(self, key: str, records: List[Dict]) -> None:
+        """
+        キャッシュを一括検索し、ヒットしたレコードに抽出結果を入れる
+        
+        Args:
+            key: 抽出結果のキー（'video_meta' など）
+            records: 同じ種類の走査レコード（更新される）
+        """
+        if self.probe_cache is None or not records:
+            return
+        
+        version = CACHED_EXTRACTORS[records[0]['kind']].VERSION
+        found = self.probe_cache.get_many(
+            key, version, [(meta['path'], *self._cache_keys[meta['path']]) for meta in records]
+        )
+        for meta in records:
+            cached = found.get(meta['path'])
+            if cached is not None:
+                meta[key] = cached
+                del self._cache_keys[meta['path']]
+        self.stats['cache_hit'].add(len(found))
+    
+    def _apply_failures(self, key: str, records: List[Dict]) -> None:
+        """
+        失敗レジストリを一括検索し、スキップ期間中のレコードには前回のエラーを入れる
+        
+        Args:
+            key: 抽出結果のキー
+            records: 同じ種類の走査レコード（更新される）
+        """
+        if self.failures is None or not records:
+            return
+        
+        found = self.failures.get_many(
+            key, [(meta['path'], *self._cache_keys[meta['path']]) for meta in records]
+        )
+        now = time.time()
+        skipped = 0
+        for meta in records:
+            failure = found.get(meta['path'])
+            if failure is None:
+                continue
+            if failure['changed'] or failure['retry_at'] <= now:
+                # 変更されたか、スキップ期間が過ぎた（成功すれば記録を消す）
+                self._retrying.add((key, meta['path']))
+                continue
+            meta[key] = {
+                'error': failure['message'],
+                'error_type': failure['error_class'],
+                'quarantined': True,
+                'attempts': failure['attempts']
+            }
+            del self._cache_keys[meta['path']]
+            skipped += 1
+        self.stats['quarantined'].add(skipped)
+    
+    def _remember_result(self, meta: Dict, identity: Tuple[int, int]) -> None:
+        """キャッシュに無かったファイルの抽出結果を保存対象にする（エラー時は保存しない）"""
+        if meta.get('kind') not in CACHED_EXTRACTORS:
+            return
+        key = META_KEYS[meta['kind']]
+        result = meta.get(key)
+        if not result or result.get('error') is not None:
+            return
+        self._cache_writes.setdefault(key, []).append((meta['path'], *identity, result))
+        if sum(len(entries) for entries in self._cache_writes.values()) >= CACHE_WRITE_BATCH:
+            self._flush_cache_writes()
+    
+    def _flush_cache_writes(self) -> None:
+        """保存対象の抽出結果をキャッシュに書き込む"""
+        if self.probe_cache is None:
+            return
+        for kind, extractor_class in CACHED_EXTRACTORS.items():
+            entries = self._cache_writes.pop(META_KEYS[kind], None)
+            if entries:
+                self.probe_cache.put_many(META_KEYS[kind], extractor_class.VERSION, entries)
+    
+    def _remember_failure(self, meta: Dict, identity: Tuple[int, int],
+                          crash: Optional[Exception] = None) -> None:
+        """
+        失敗したファイルを記録対象に、再試行で成功したファイルを削除対象にする
+        
+        Args:
+            meta: 抽出後のレコード
+            identity: 抽出前の (size, mtime_ns)
+            crash: ワーカーが異常終了した場合の例外
+        """
+        key = META_KEYS[meta['kind']]
+        if crash is not None:
+            error_class, message = 'worker_crash', f"Extraction worker failed: {crash}"
+        else:
+            result = meta.get(key)
+            if not result:
+                return
+            error_class, message = classify_error(result), result.get('error')
+        
+        if error_class is not None:
+            self._failure_writes.setdefault(key, []).append((meta['path'], *identity, error_class, message))
+        elif (key, meta['path']) in self._retrying and message is None:
+            self._failure_clears.setdefault(key, []).append(meta['path'])
+        self._retrying.discard((key, meta['path']))
+        
+        pending = sum(len(v) for v in self._failure_writes.values())
+        pending += sum(len(v) for v in self._failure_clears.values())
+        if pending >= CACHE_WRITE_BATCH:
+            self._flush_failures()
+    
+    def _flush_failures(self) -> None:
+        """記録対象・削除対象を失敗レジストリに書き込む"""
+        if self.failures is None:
+            return
+        for key, entries in self._failure_writes.items():
+            self.failures.record_many(key, entries)
+        for key, paths in self._failure_clears.items():
+            self.failures.clear_many(key, paths)
+        self._failure_writes = {}
+        self._failure_clears = {}
+    
+    def _finish(self, meta: Dict, future: Future) -> Dict:
+        """抽出結果を受け取り、段ごとの統計に加える"""
+        crash = None
+        try:
+            meta, elapsed = future.result()
+        except Exception as e:
+            # ワーカープロセスの異常終了など（元のレコードはそのまま出力する）
+            logger.warning(f"Extraction worker failed for {meta.get('path')}: {e}")
+            elapsed = 0.0
+            crash = e
+        
+        if elapsed is None:
+            # キャッシュで済んだ・スキップ中のレコード
+            return meta
+        
+        identity = self._cache_keys.pop(meta.get('path'), None)
+        if identity is not None:
+            if self.probe_cache is not None:
+                self._remember_result(meta, identity)
+            if self.failures is not None:
+                self._remember_failure(meta, identity, crash)
+        
+        stage = f"extract:{meta.get('kind')}"
+        with self._stats_lock:
+            if stage not in self.stats:
+                self.stats[stage] = StageStats(stage, self._started)
+            self.stats[stage].add(busy_sec=elapsed)
+        return meta
+    
+    def _index_in_batches(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        レコードを素通ししながら index_batch_size 件ずつ Chroma に upsert
+        
+        Args:
+            records: 抽出済みレコード
+        
+        Yields:
+            受け取ったレコード（そのまま）
+        """
+        batch = []
+        for meta in records:
+            batch.append(meta)
+            yield meta
+            if len(batch) >= self.index_batch_size:
+                self._upsert(batch)
+                batch = []
+        if batch:
+            self._upsert(batch)
+    
+    def _index_archives(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        レコードを素通ししながらアーカイブのエントリを転置インデックスに登録
+        
+        Args:
+            records: 抽出済みレコード
+        
+        Yields:
+            受け取ったレコード（そのまま）
+        """
+        batch = []
+        pending = 0
+        for meta in records:
+            archive_meta = meta.get('archive_meta')
+            if meta.get('kind') == 'archive' and archive_meta and archive_meta.get('error') is None:
+                batch.append((meta['path'], archive_meta))
+                pending += len(archive_meta.get('entries') or [])
+            yield meta
+            if pending >= ARCHIVE_INDEX_BATCH or len(batch) >= self.index_batch_size:
+                self._add_archives(batch)
+                batch = []
+                pending = 0
+        if batch:
+            self._add_archives(batch)
+    
+    def _compact_archives(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        カタログに書く前にアーカイブ一覧を切り詰める（転置インデックス・Chroma への登録の後に通す）
+        
+        Args:
+            records: 抽出済みレコード
+        
+        Yields:
+            archive_meta を切り詰めたレコード（それ以外はそのまま）
+        """
+        for meta in records:
+            archive_meta = meta.get('archive_meta')
+            if archive_meta:
+                compact = catalog_listing(archive_meta, self.archive_catalog_entries)
+                if compact is not archive_meta:
+                    meta = dict(meta, archive_meta=compact)
+            yield meta
+    
+    def _add_archives(self, batch: list) -> None:
+        """1 バッチ分のアーカイブを登録し、archive_index 段の統計に加える"""
+        started = time.perf_counter()
+        count = self.archive_index.add_archives(batch)
+        with self._stats_lock:
+            if 'archive_index' not in self.stats:
+                self.stats['archive_index'] = StageStats('archive_index', self._started)
+            self.stats['archive_index'].add(count, time.perf_counter() - started)
+    
+    def _upsert(self, batch: list) -> None:
+        """1 バッチ分を upsert し、index 段の統計に加える"""
+        started = time.perf_counter()
+        count = self.indexer.upsert_metadata(batch, batch_size=self.index_batch_size)
+        with self._stats_lock:
+            if 'index' not in self.stats:
+                self.stats['index'] = StageStats('index', self._started)
+            self.stats['index'].add(count, time.perf_counter() - started)
+    
+    def run(self, output_path: Optional[str] = None) -> Dict:
+        """
+        パイプラインを最後まで実行
+        
+        Args:
+            output_path: カタログの出力先（省略時は scan.output_path）
+        
+        Returns:
+            段ごとの統計（report() と同じ形）
+        """
+        output_path = output_path or self.config['scan'].get('output_path', 'data/raw/metadata.json')
+        
+        records = self.iter_enriched()
+        if self.archive_index is not None:
+            records = self._index_archives(records)
+        if self.indexer is not None:
+            records = self._index_in_batches(records)
+        records = self._compact_archives(records)
+        count = write_records(output_path, records)
+        self.scanner.save_dir_cache()
+        if self.probe_cache is not None and self.probe_cache_evict:
+            self.probe_cache.evict_missing()
+        
+        logger.info(f"Pipeline finished: {count} records -> {output_path}")
+        return self.report()
+    
+    def report(self) -> Dict:
+        """
+        段ごとの件数・スループットをログに出す
+        
+        Returns:
+            段名 → {'count', 'per_sec', 'avg_sec'}
+        """
+        with self._stats_lock:
+            summary = {name: stats.summary() for name, stats in self.stats.items()}
+        logger.info(' | '.join(
+            f"{name}: {s['count']} ({s['per_sec']:.1f}/s)" for name, s in summary.items()
+        ))
+        return summary
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Scan, extract metadata and index in one pass")
+    parser.add_argument('--config', default="config/config.yaml")
+    parser.add_argument('--output', default=None,
+                        help="catalog path (.json, or .ndjson[.gz|.zst] to stream records)")
+    parser.add_argument('--no-index', action='store_true', help="write the catalog only")
+    args = parser.parse_args()
+    
+    pipeline = MediaPipeline(args.config, use_index=not args.no_index)
+    summary = pipeline.run(args.output)
+    
+    print("\n=== Pipeline Summary ===")
+    for name, s in summary.items():
+        print(f"{name:16s}: {s['count']:8d}  {s['per_sec']:8.1f}/s  avg {s['avg_sec'] * 1000:.1f} ms")
@@ -0,0 +1,205 @@
+"""
+probe_cache.py - 抽出結果の永続キャッシュ（SQLite）
+
+ffprobe / Pillow / mutagen の結果を (path, size, mtime_ns, 抽出器バージョン) で保存し、
+変更のないファイルは次回以降プローブしない。
+
+- 抽出器ごとに 1 パス 1 行（ファイルが変わると上書き）
+- 抽出器のバージョンが上がると、その抽出器の行はまとめて破棄
+- 消えたファイルの行は evict_missing() で削除
+- 一括検索（get_many）でパイプラインからの問い合わせを少ない SQL にまとめる
+
+【Phase 1 design constraints】
+- Only extractor outputs (technical metadata) are cached; media contents are never stored.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+# 1 回の IN 句に渡すパス数（SQLite のパラメータ数上限より小さく）
+LOOKUP_CHUNK = 500
+
+# (path, size, mtime_ns)
+FileKey = Tuple[str, int, int]
+
+
+class ProbeCache:
+    """抽出結果キャッシュ"""
+    
+    def __init__(self, db_path: str = "data/raw/probe_cache.sqlite"):
+        """
+        初期化（無ければ作成）
+        
+        Args:
+            db_path: SQLite ファイルのパス
+        """
+        self.db_path = db_path
+        dirname = os.path.dirname(db_path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        
+        # パイプラインでは走査スレッド（検索）とメインスレッド（書き込み）から使う
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS probes ("
+                " extractor TEXT NOT NULL, path TEXT NOT NULL,"
+                " size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+                " version INTEGER NOT NULL, result TEXT NOT NULL,"
+                " PRIMARY KEY (extractor, path))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS extractor_versions ("
+                " extractor TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+        self.hits = 0
+        self.misses = 0
+    
+    def register(self, extractor: str, version: int) -> None:
+        """
+        抽出器の現在のバージョンを登録（前回と違えばその抽出器の行を破棄）
+        
+        Args:
+            extractor: 抽出器名（'video_meta' など）
+            version: 抽出器のバージョン
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT version FROM extractor_versions WHERE extractor = ?", (extractor,)
+            ).fetchone()
+            if row is not None and row[0] == version:
+                return
+            if row is not None:
+                deleted = self._conn.execute(
+                    "DELETE FROM probes WHERE extractor = ?", (extractor,)
+                ).rowcount
+                logger.info(f"Probe cache: {extractor} v{row[0]} -> v{version}, dropped {deleted} entries")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractor_versions (extractor, version) VALUES (?, ?)",
+                (extractor, version)
+            )
+    
+    def get_many(self, extractor: str, version: int, files: Iterable[FileKey]) -> Dict[str, Dict]:
+        """
+        一括検索
+        
+        Args:
+            extractor: 抽出器名
+            version: 抽出器のバージョン
+            files: (path, size, mtime_ns) のリスト
+        
+        Returns:
+            path → キャッシュ済みの抽出結果（サイズ・mtime・バージョンが一致したもののみ）
+        """
+        wanted = {path: (size, mtime_ns) for path, size, mtime_ns in files}
+        found = {}
+        paths = list(wanted)
+        with self._lock:
+            for start in range(0, len(paths), LOOKUP_CHUNK):
+                chunk = paths[start:start + LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT path, size, mtime_ns, result FROM probes"
+                    f" WHERE extractor = ? AND version = ? AND path IN ({','.join('?' * len(chunk))})",
+                    [extractor, version, *chunk]
+                )
+                for path, size, mtime_ns, result in rows:
+                    if wanted[path] == (size, mtime_ns):
+                        found[path] = json.loads(result)
+        
+        self.hits += len(found)
+        self.misses += len(wanted) - len(found)
+        return found
+    
+    def get(self, extractor: str, version: int, path: str, size: int, mtime_ns: int) -> Optional[Dict]:
+        """1 件検索（無ければ None）"""
+        return self.get_many(extractor, version, [(path, size, mtime_ns)]).get(path)
+    
+    def put_many(self, extractor: str, version: int, entries: Iterable[Tuple[str, int, int, Dict]]) -> None:
+        """
+        一括保存
+        
+        Args:
+            extractor: 抽出器名
+            version: 抽出器のバージョン
+            entries: (path, size, mtime_ns, 抽出結果) のリスト
+        """
+        rows = [
+            (extractor, path, size, mtime_ns, version, json.dumps(result, ensure_ascii=False))
+            for path, size, mtime_ns, result in entries
+        ]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO probes (extractor, path, size, mtime_ns, version, result)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+    
+    def put(self, extractor: str, version: int, path: str, size: int, mtime_ns: int, result: Dict) -> None:
+        """1 件保存"""
+        self.put_many(extractor, version, [(path, size, mtime_ns, result)])
+    
+    def evict_missing(self) -> int:
+        """
+        存在しなくなったファイルの行を削除
+        
+        Returns:
+            削除した行数
+        """
+        with self._lock:
+            paths = [row[0] for row in self._conn.execute("SELECT DISTINCT path FROM probes")]
+        missing = [path for path in paths if not os.path.exists(path)]
+        
+        deleted = 0
+        with self._lock, self._conn:
+            for start in range(0, len(missing), LOOKUP_CHUNK):
+                chunk = missing[start:start + LOOKUP_CHUNK]
+                deleted += self._conn.execute(
+                    f"DELETE FROM probes WHERE path IN ({','.join('?' * len(chunk))})", chunk
+                ).rowcount
+        logger.info(f"Probe cache: evicted {deleted} entries for {len(missing)} missing files")
+        return deleted
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        抽出器ごとの件数
+        
+        Returns:
+            抽出器名 → 行数
+        """
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT extractor, COUNT(*) FROM probes GROUP BY extractor"
+            ).fetchall())
+    
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Probe result cache maintenance")
+    parser.add_argument('--db', default="data/raw/probe_cache.sqlite")
+    parser.add_argument('--evict', action='store_true', help="drop entries for files that no longer exist")
+    args = parser.parse_args()
+    
+    cache = ProbeCache(args.db)
+    if args.evict:
+        cache.evict_missing()
+    for extractor, count in sorted(cache.stats().items()):
+        print(f"{extractor}: {count}")
+    cache.close()
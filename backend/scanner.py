@@ -15,17 +15,44 @@ scanner.py - メディア＆アーカイブ走査モジュール
 
 import os
 import json
+import queue
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 import yaml
 
+try:
+    from .sidecars import SidecarResolver, build_sidecar_map, resolve_sidecars
+    from .manifest import FileManifest, file_identity
+    from .dir_cache import DirectoryCache
+    from .catalog_io import iter_records, write_records
+    from .checkpoint import ScanCheckpoint, RootCheckpoint
+    from .throttle import configure_throttle, install_reload_handler
+    from .compact_catalog import CompactCatalog
+except ImportError:
+    from sidecars import SidecarResolver, build_sidecar_map, resolve_sidecars
+    from manifest import FileManifest, file_identity
+    from dir_cache import DirectoryCache
+    from catalog_io import iter_records, write_records
+    from checkpoint import ScanCheckpoint, RootCheckpoint
+    from throttle import configure_throttle, install_reload_handler
+    from compact_catalog import CompactCatalog
+
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# 並列走査でスレッドあたりに先読み投入するディレクトリ数
+PREFETCH_PER_THREAD = 4
+
+# 複数ルート同時走査時の受け渡しキュー長（レコード数）
+MULTI_ROOT_QUEUE_SIZE = 10000
+
+
 class MediaScanner:
     """メディア走査エンジン"""
     
@@ -45,125 +72,697 @@ class MediaScanner:
             for ext in exts:
                 self.target_extensions[ext.lower()] = kind
         
-        self.root_path = self.config['scan']['root_path']
+        # 走査ルート（root_paths が複数ルート、root_path は単一ルート指定との互換）
+        self.root_paths = list(self.config['scan'].get('root_paths') or [self.config['scan']['root_path']])
+        self.root_path = self.root_paths[0]
+        # 同一デバイス（st_dev）に対して同時に一覧取得するスレッドの上限
+        self.device_concurrency = max(1, int(self.config['scan'].get('device_concurrency', 4)))
+        self._device_limiters = {}
+        self._device_limiters_lock = threading.Lock()
+        # 走査エンジン: scandir（既定）/ walk（旧実装）
+        self.traversal = self.config['scan'].get('traversal', 'scandir')
         self.all_files = []
-        self.metadata_list = []
+        # compact_catalog が有効なら列指向ストアに保持（レコードは辞書と同様に読める）
+        self.metadata_list = CompactCatalog() if self.config['scan'].get('compact_catalog', False) else []
+        # stat 呼び出し数の制限（抽出器と共有。throttle セクションが無ければ無制限）
+        self.throttle = configure_throttle(self.config.get('throttle'))
+        # 付随ファイルはディレクトリ一覧 1 回分から解決する
+        self.sidecar_resolver = SidecarResolver()
+        
+        # 差分走査用（scan_incremental 実行時のみ path → 同一性 を記録）
+        self.manifest_path = self.config['scan'].get('manifest_path', 'data/raw/manifest.json')
+        self.file_identities = None
+        self.changes = None
+        
+        # ディレクトリ mtime キャッシュ（scandir エンジンのみ。未変更ディレクトリの一覧取得を省略）
+        self.dir_cache = None
+        if self.config['scan'].get('dir_cache', False):
+            self.dir_cache = DirectoryCache(
+                self.config['scan'].get('dir_cache_path', 'data/raw/dir_cache.json')
+            )
+        
+        # 走査チェックポイント（scandir エンジンのみ。中断した全走査を途中から再開）
+        self.checkpoint = None
+        if self.config['scan'].get('checkpoint', False):
+            self.checkpoint = ScanCheckpoint(
+                self.config['scan'].get('checkpoint_dir', 'data/raw/checkpoint'),
+                float(self.config['scan'].get('checkpoint_interval_sec', 60))
+            )
     
     def scan(self) -> List[Dict]:
         """
         ドライブ/フォルダを再帰走査
         
         Returns:
-            メタデータのリスト
+            メタデータのリスト（compact_catalog 有効時は CompactCatalog）
+        """
+        self.metadata_list.extend(self.scan_iter())
+        return self.metadata_list
+    
+    def scan_iter(self) -> Iterator[Dict]:
+        """
+        ドライブ/フォルダを再帰走査し、見つけた順にレコードを返す（ジェネレータ）
+        
+        レコードを保持しないため、大規模ドライブでもメモリは一定。
+        save_stream() と組み合わせて NDJSON に逐次書き出せる。
+        
+        ルートが複数ある場合は同時に走査し、1 つのカタログにまとめる。
+        ルート内の順序は直列走査と同じだが、ルート間のレコードは到着順に混ざる。
+        
+        checkpoint が有効な場合、前回中断した走査があればその続きから再開する
+        （記録済みのレコードを先に返し、走査済みのサブツリーは再走査しない）。
+        最後まで走査するとチェックポイントは削除される。
+        
+        Yields:
+            メタデータ辞書
+        """
+        roots = []
+        for root_path in self.root_paths:
+            if os.path.exists(root_path):
+                roots.append(root_path)
+            else:
+                logger.error(f"Path not found: {root_path}")
+        
+        if not roots:
+            return
+        
+        if self.traversal != 'walk' and self.dir_cache is not None:
+            self.dir_cache.begin()
+            # キャッシュにはファイル同一性も保存する
+            if self.file_identities is None:
+                self.file_identities = {}
+        
+        if self.traversal != 'walk' and self.checkpoint is not None:
+            self.checkpoint.begin(self.root_paths)
+            # 再開時に引き継げるよう、スプールにもファイル同一性を保存する
+            if self.file_identities is None:
+                self.file_identities = {}
+        
+        count = 0
+        if len(roots) == 1:
+            records = self._iter_root(roots[0])
+        else:
+            records = self._iter_roots_concurrently(roots)
+        
+        completed = False
+        try:
+            for meta in records:
+                count += 1
+                yield meta
+            completed = True
+        finally:
+            # 走査スレッドを止めてからスプールを閉じる
+            records.close()
+            if self.traversal != 'walk' and self.checkpoint is not None:
+                if completed:
+                    self.checkpoint.complete()
+                else:
+                    # 中断時は最後に保存した時点から再開できるよう残す
+                    self.checkpoint.close()
+        
+        logger.info(f"Found {count} media files")
+    
+    def scan_incremental(self, previous_metadata_path: str = "data/raw/metadata.json") -> Dict:
+        """
+        前回マニフェストとの差分走査
+        
+        全ファイルを走査（stat のみ）し、前回の (size, mtime, device, inode) と比較する。
+        未変更ファイルは前回のレコード（抽出済みメタを含む）を引き継ぎ、
+        後段の抽出器には added / modified のレコードだけを渡せばよい。
+        
+        Args:
+            previous_metadata_path: 前回出力したメタデータ JSON
+        
+        Returns:
+            added / modified（レコード）、unchanged（件数）、deleted（パス）
+        """
+        manifest = FileManifest(self.manifest_path)
+        manifest.load()
+        previous = self._load_previous_records(previous_metadata_path)
+        
+        self.file_identities = {}
+        self.scan()
+        classified = manifest.classify(self.file_identities)
+        
+        unchanged = set(classified['unchanged'])
+        added = set(classified['added'])
+        changes = {'added': [], 'modified': [], 'unchanged': 0, 'deleted': classified['deleted']}
+        
+        for i, meta in enumerate(self.metadata_list):
+            path = meta['path']
+            if path in unchanged:
+                prev = previous.get(path)
+                # 前回レコードが無い・付随ファイルが変わった場合は再抽出が必要
+                if prev is not None and prev.get('sidecar_files') == meta['sidecar_files']:
+                    self.metadata_list[i] = prev
+                    changes['unchanged'] += 1
+                    continue
+                changes['modified'].append(meta)
+            elif path in added:
+                changes['added'].append(meta)
+            else:
+                changes['modified'].append(meta)
+        
+        logger.info(
+            f"Incremental scan: {len(changes['added'])} added, {len(changes['modified'])} modified, "
+            f"{changes['unchanged']} unchanged, {len(changes['deleted'])} deleted"
+        )
+        self.changes = changes
+        return changes
+    
+    def _load_previous_records(self, metadata_path: str) -> Dict[str, Dict]:
+        """
+        前回のメタデータを path → レコード で読み込む
+        
+        Args:
+            metadata_path: メタデータカタログのパス（JSON / NDJSON）
+        
+        Returns:
+            path → レコード の辞書（無ければ空）
+        """
+        try:
+            return {meta['path']: meta for meta in iter_records(metadata_path)}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Error loading previous metadata {metadata_path}: {e}")
+            return {}
+    
+    def save_manifest(self) -> None:
+        """差分走査で得た同一性をマニフェストとして保存"""
+        if self.file_identities is None:
+            logger.warning("No file identities recorded - run scan_incremental() first")
+            return
+        FileManifest(self.manifest_path).save(self.file_identities)
+    
+    def _iter_root(self, root_path: str) -> Iterator[Dict]:
+        """
+        1 ルート分の走査
+        
+        Args:
+            root_path: 走査ルート
+        
+        Yields:
+            メタデータ辞書
+        """
+        logger.info(f"Scanning: {root_path}")
+        if self.traversal == 'walk':
+            yield from self._iter_walk(root_path)
+            return
+        
+        checkpoint = self.checkpoint.for_root(root_path) if self.checkpoint is not None else None
+        if checkpoint is not None and checkpoint.resumable:
+            # 前回までに出力したレコードを先に返す（stat は取り直さない）
+            for meta, ident in checkpoint.replay():
+                if ident is not None and self.file_identities is not None:
+                    self.file_identities[meta['path']] = tuple(ident)
+                yield meta
+            if checkpoint.state['done']:
+                return
+        
+        yield from self._iter_scandir(root_path, checkpoint)
+    
+    def _iter_roots_concurrently(self, roots: List[str]) -> Iterator[Dict]:
+        """
+        複数ルートを同時に走査し、到着順にまとめて返す
+        
+        ルートごとに走査スレッドを立て、有界キューで受け渡す。
+        同じ物理ディスク上のルートは st_dev ごとの上限（device_concurrency）を共有するため、
+        1 台のディスクに同時に device_concurrency を超える読み手は付かない。
+        
+        Args:
+            roots: 走査ルート
+        
+        Yields:
+            メタデータ辞書
+        """
+        results = queue.Queue(maxsize=MULTI_ROOT_QUEUE_SIZE)
+        stop = threading.Event()
+        done = object()
+        
+        def produce(root_path: str) -> None:
+            try:
+                for meta in self._iter_root(root_path):
+                    while not stop.is_set():
+                        try:
+                            results.put(meta, timeout=0.5)
+                            break
+                        except queue.Full:
+                            continue
+                    if stop.is_set():
+                        return
+            except Exception as e:
+                logger.error(f"Error scanning {root_path}: {e}")
+            finally:
+                results.put(done)
+        
+        producers = [
+            threading.Thread(target=produce, args=(root_path,), name=f"scan-root-{i}", daemon=True)
+            for i, root_path in enumerate(roots)
+        ]
+        for producer in producers:
+            producer.start()
+        
+        try:
+            remaining = len(producers)
+            while remaining:
+                item = results.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                yield item
+        finally:
+            stop.set()
+            # 途中で打ち切られた場合も、待機中のスレッドを解放する
+            while any(producer.is_alive() for producer in producers):
+                try:
+                    results.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+    
+    def _device_limiter(self, path: str) -> threading.BoundedSemaphore:
+        """
+        パスが載っているデバイス（st_dev）ごとの同時読み手数の制限
+        
+        Args:
+            path: 走査ルートなど
+        
+        Returns:
+            デバイス共有のセマフォ
         """
-        logger.info(f"Scanning: {self.root_path}")
+        try:
+            device = os.stat(path).st_dev
+        except OSError:
+            device = path
         
-        if not os.path.exists(self.root_path):
-            logger.error(f"Path not found: {self.root_path}")
-            return []
+        with self._device_limiters_lock:
+            limiter = self._device_limiters.get(device)
+            if limiter is None:
+                limiter = threading.BoundedSemaphore(self.device_concurrency)
+                self._device_limiters[device] = limiter
+            return limiter
+    
+    def _iter_walk(self, root_path: str) -> Iterator[Dict]:
+        """
+        os.walk による走査（旧実装・比較用）
         
-        for root, dirs, files in os.walk(self.root_path):
+        Args:
+            root_path: 走査ルート
+        
+        Yields:
+            メタデータ辞書
+        """
+        for root, dirs, files in os.walk(root_path):
             for filename in files:
                 filepath = os.path.join(root, filename)
-                self._process_file(filepath)
+                meta = self._process_file(filepath)
+                if meta is not None:
+                    yield meta
+    
+    def _iter_scandir(self, root_path: str,
+                      checkpoint: Optional[RootCheckpoint] = None) -> Iterator[Dict]:
+        """
+        os.scandir による走査
         
-        logger.info(f"Found {len(self.metadata_list)} media files")
-        return self.metadata_list
+        DirEntry の種別・stat キャッシュを再利用し、拡張子で先に絞り込むため
+        対象外ファイルには stat を発行しない。出力順は os.walk と同じ
+        （ディレクトリ内のファイル → サブディレクトリの深さ優先）。
+        
+        dir_cache が有効な場合、mtime が前回と同じディレクトリは一覧を取らず
+        キャッシュ済みのファイル集合を使う（サブディレクトリは個別に確認する）。
+        
+        checkpoint を渡した場合、ディレクトリの区切りごとにレコードをスプールに書き、
+        一定間隔で深さ優先スタック（未走査のフロンティア）を保存する。
+        
+        Args:
+            root_path: 走査ルート
+            checkpoint: このルートのチェックポイント（None なら保存しない）
+        
+        Yields:
+            メタデータ辞書
+        """
+        limiter = self._device_limiter(root_path)
+        threads = self._threads_for_root(root_path)
+        if threads > 1:
+            yield from self._iter_scandir_parallel(root_path, threads, limiter, checkpoint)
+            return
+        
+        stack = checkpoint.start_stack() if checkpoint is not None else [root_path]
+        
+        while stack:
+            dirpath = stack.pop()
+            result = self._scan_directory_on_device(dirpath, limiter)
+            if result is None:
+                continue
+            
+            records, subdirs = result
+            if checkpoint is not None:
+                checkpoint.add(records, self.file_identities)
+            yield from records
+            stack.extend(reversed(subdirs))
+            if checkpoint is not None:
+                checkpoint.maybe_save(stack)
+        
+        if checkpoint is not None:
+            checkpoint.save(stack, done=True)
+    
+    def _iter_scandir_parallel(self, root_path: str, threads: int,
+                               limiter: threading.BoundedSemaphore,
+                               checkpoint: Optional[RootCheckpoint] = None) -> Iterator[Dict]:
+        """
+        スレッドプールでディレクトリ一覧を並行取得する走査
+        
+        ネットワーク共有・USB HDD では一覧取得の待ち時間が支配的なため、
+        深さ優先の「次に読む」ディレクトリを最大 threads * PREFETCH_PER_THREAD 件まで
+        先読みで投入し、空いたワーカーが共有キューから順に拾う。
+        結果は直列走査と同じ順序で返す（出力順は安定）。
+        
+        Args:
+            root_path: 走査ルート
+            threads: ワーカースレッド数
+            limiter: デバイスごとの同時読み手数の制限
+            checkpoint: このルートのチェックポイント（None なら保存しない）
+        
+        Yields:
+            メタデータ辞書
+        """
+        max_pending = threads * PREFETCH_PER_THREAD
+        pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='scan')
+        stack = checkpoint.start_stack() if checkpoint is not None else [root_path]
+        futures = {}
+        
+        try:
+            while stack:
+                # スタック上位（＝次に処理される順）を先読み投入
+                for path in reversed(stack[-max_pending:]):
+                    if len(futures) >= max_pending:
+                        break
+                    if path not in futures:
+                        futures[path] = pool.submit(self._scan_directory_on_device, path, limiter)
+                
+                dirpath = stack.pop()
+                future = futures.pop(dirpath, None)
+                if future is not None:
+                    result = future.result()
+                else:
+                    result = self._scan_directory_on_device(dirpath, limiter)
+                if result is None:
+                    continue
+                
+                records, subdirs = result
+                if checkpoint is not None:
+                    checkpoint.add(records, self.file_identities)
+                yield from records
+                stack.extend(reversed(subdirs))
+                if checkpoint is not None:
+                    # 先読み中のディレクトリもスタックに残っているため、保存すれば再開対象になる
+                    checkpoint.maybe_save(stack)
+            
+            if checkpoint is not None:
+                checkpoint.save(stack, done=True)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    def _threads_for_root(self, root_path: str) -> int:
+        """
+        ルートごとの走査スレッド数（scan.root_threads → scan.threads の順）
+        
+        Args:
+            root_path: 走査ルート
+        
+        Returns:
+            スレッド数（1 なら直列）
+        """
+        per_root = self.config['scan'].get('root_threads') or {}
+        return max(1, int(per_root.get(root_path, self.config['scan'].get('threads', 1))))
+    
+    def _scan_directory_on_device(self, dirpath: str, limiter: threading.BoundedSemaphore
+                                  ) -> Optional[Tuple[List[Dict], List[str]]]:
+        """デバイスの同時読み手数の枠を取ってから 1 ディレクトリを走査"""
+        with limiter:
+            return self._scan_directory(dirpath)
+    
+    def _scan_directory(self, dirpath: str) -> Optional[Tuple[List[Dict], List[str]]]:
+        """
+        1 ディレクトリ分の走査（直下のレコードとサブディレクトリ）
+        
+        並列走査ではワーカースレッドから呼ばれるため、共有の付随ファイル解決器は使わず
+        この一覧から作ったマップで解決する。
+        
+        Args:
+            dirpath: ディレクトリパス
+        
+        Returns:
+            (レコード, 辿るサブディレクトリ)。一覧取得できなければ None
+        """
+        dir_stat = None
+        if self.dir_cache is not None:
+            self.throttle.stat()
+            try:
+                dir_stat = os.stat(dirpath)
+            except OSError as e:
+                logger.warning(f"Cannot stat {dirpath}: {e}")
+                return None
+            
+            cached = self.dir_cache.lookup(dirpath, dir_stat)
+            if cached is not None:
+                records = []
+                for meta, ident in cached['files']:
+                    self.file_identities[meta['path']] = tuple(ident)
+                    records.append(dict(meta))
+                return records, list(cached['subdirs'])
+        
+        # 一覧取得も 1 回分の stat として数える
+        self.throttle.stat()
+        try:
+            with os.scandir(dirpath) as it:
+                entries = list(it)
+        except OSError as e:
+            logger.warning(f"Cannot list {dirpath}: {e}")
+            return None
+        
+        # 同じ一覧から付随ファイルマップを作る（追加の stat/exists は不要）
+        sidecar_map = build_sidecar_map(entries)
+        
+        subdirs = []
+        records = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            
+            if is_dir:
+                # os.walk(followlinks=False) と同様にシンボリックリンクは辿らない
+                if not entry.is_symlink():
+                    subdirs.append(entry.path)
+                continue
+            
+            meta = self._process_entry(entry, sidecar_map)
+            if meta is not None:
+                records.append(meta)
+        
+        if dir_stat is not None:
+            files = [(dict(meta), self.file_identities[meta['path']]) for meta in records]
+            self.dir_cache.record(dirpath, dir_stat, subdirs, files)
+        
+        return records, subdirs
     
-    def _process_file(self, filepath: str) -> None:
+    def _process_entry(self, entry: os.DirEntry, sidecar_map: Dict) -> Optional[Dict]:
+        """
+        DirEntry からメタデータ取得（scandir エンジン用）
+        
+        Args:
+            entry: os.scandir が返したエントリ
+            sidecar_map: 同じディレクトリの付随ファイルマップ
+        
+        Returns:
+            メタデータ辞書（対象外・取得失敗時は None）
+        """
+        name_without_ext, ext = os.path.splitext(entry.name)
+        ext = ext.lower()
+        
+        # 対象拡張子かチェック（stat より先に判定）
+        if ext not in self.target_extensions:
+            return None
+        
+        try:
+            self.throttle.stat()
+            stat = entry.stat()
+            meta = self._build_record(entry.path, entry.name, name_without_ext, ext, stat)
+            
+            # 同名の付随ファイルを探す
+            meta['sidecar_files'].update(resolve_sidecars(sidecar_map, name_without_ext))
+            
+            return meta
+            
+        except Exception as e:
+            logger.warning(f"Error processing {entry.path}: {e}")
+            return None
+    
+    def _build_record(self, filepath: str, basename: str, name_without_ext: str,
+                      ext: str, stat: os.stat_result) -> Dict:
+        """
+        走査結果のメタデータ辞書を生成（両エンジン共通）
+        
+        Args:
+            filepath: ファイルパス
+            basename: ファイル名
+            name_without_ext: ファイル名（拡張子なし）
+            ext: 拡張子（小文字）
+            stat: stat 結果
+        
+        Returns:
+            メタデータ辞書
+        """
+        if self.file_identities is not None:
+            self.file_identities[filepath] = file_identity(stat)
+        
+        return {
+            'path': filepath,
+            'name': basename,
+            'name_without_ext': name_without_ext,
+            'ext': ext,
+            'size': stat.st_size,
+            'mtime': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            'kind': self.target_extensions[ext],
+            'sidecar_files': {}
+        }
+    
+    def _process_file(self, filepath: str) -> Optional[Dict]:
         """
         単一ファイルのメタデータ取得
         
         Args:
             filepath: ファイルパス
+        
+        Returns:
+            メタデータ辞書（対象外・取得失敗時は None）
         """
         try:
             ext = os.path.splitext(filepath)[1].lower()
             
             # 対象拡張子かチェック
             if ext not in self.target_extensions:
-                return
+                return None
             
             # 基本情報
+            self.throttle.stat()
             stat = os.stat(filepath)
             basename = os.path.basename(filepath)
             name_without_ext = os.path.splitext(basename)[0]
             
-            meta = {
-                'path': filepath,
-                'name': basename,
-                'name_without_ext': name_without_ext,
-                'ext': ext,
-                'size': stat.st_size,
-                'mtime': datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                'kind': self.target_extensions[ext],
-                'sidecar_files': {}
-            }
+            meta = self._build_record(filepath, basename, name_without_ext, ext, stat)
             
             # 同名の付随ファイルを探す
             self._find_sidecar_files(os.path.dirname(filepath), name_without_ext, meta)
             
-            self.metadata_list.append(meta)
+            return meta
             
         except Exception as e:
             logger.warning(f"Error processing {filepath}: {e}")
+            return None
     
     def _find_sidecar_files(self, dirname: str, basename: str, meta: Dict) -> None:
         """
         同名の付随ファイル（字幕・メモ・メタ）を探す
         
+        ディレクトリごとに一覧を 1 回だけ取得したマップから解決する
+        （拡張子ごとの os.path.exists は発行しない）。
+        
         Args:
             dirname: ディレクトリパス
             basename: ファイル名（拡張子なし）
             meta: メタデータ辞書（更新される）
         """
-        sidecar_patterns = {
-            'subtitle': ['.srt', '.vtt', '.ass'],
-            'note': ['.txt', '.md'],
-            'meta': ['.nfo', '.json', '.xml']
-        }
-        
-        for sidecar_type, exts in sidecar_patterns.items():
-            for ext in exts:
-                sidecar_path = os.path.join(dirname, f"{basename}{ext}")
-                if os.path.exists(sidecar_path):
-                    try:
-                        size = os.path.getsize(sidecar_path)
-                        meta['sidecar_files'][sidecar_type + ext] = {
-                            'path': sidecar_path,
-                            'size': size,
-                            'type': sidecar_type
-                        }
-                    except Exception as e:
-                        logger.warning(f"Error reading sidecar {sidecar_path}: {e}")
+        meta['sidecar_files'].update(self.sidecar_resolver.find(dirname, basename))
+    
+    def save_dir_cache(self) -> None:
+        """ディレクトリ mtime キャッシュを保存（dir_cache 有効時のみ）"""
+        if self.dir_cache is not None:
+            self.dir_cache.save()
     
     def save_metadata(self, output_path: str = "data/raw/metadata.json") -> None:
         """
-        メタデータを JSON に保存
+        メタデータを保存
+        
+        拡張子が .ndjson / .jsonl（.gz / .zst 圧縮可）なら NDJSON、それ以外は JSON 配列。
         
         Args:
             output_path: 出力ファイルパス
         """
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(self.metadata_list, f, ensure_ascii=False, indent=2)
+        write_records(output_path, self.metadata_list)
         
         logger.info(f"Metadata saved: {output_path}")
+    
+    def save_stream(self, output_path: str = "data/raw/metadata.ndjson") -> int:
+        """
+        走査しながらレコードを逐次書き出す（metadata_list には保持しない）
+        
+        Args:
+            output_path: 出力ファイルパス（NDJSON 推奨）
+        
+        Returns:
+            書き出した件数
+        """
+        count = write_records(output_path, self.scan_iter())
+        logger.info(f"Metadata streamed: {output_path} ({count} items)")
+        return count
 
 
 if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Media scanner")
+    parser.add_argument('--incremental', action='store_true',
+                        help="compare with the previous manifest and reuse unchanged records")
+    parser.add_argument('--output', default=None,
+                        help="catalog path (.json, or .ndjson[.gz|.zst] to stream records)")
+    parser.add_argument('--restart', action='store_true',
+                        help="discard the scan checkpoint and start from the beginning")
+    args = parser.parse_args()
+    
     scanner = MediaScanner()
-    metadata = scanner.scan()
-    scanner.save_metadata()
+    # 実行中に config.yaml の throttle を書き換えて SIGHUP を送ると制限値を変更できる
+    install_reload_handler('config/config.yaml')
+    metrics_path = (scanner.config.get('throttle') or {}).get('metrics_path')
+    if metrics_path:
+        scanner.throttle.start_metrics_export(
+            metrics_path, float(scanner.config['throttle'].get('metrics_interval_sec', 30))
+        )
+    if args.restart and scanner.checkpoint is not None:
+        scanner.checkpoint.discard()
+    output_path = args.output or scanner.config['scan'].get('output_path', 'data/raw/metadata.json')
     
-    # サマリー出力
     by_kind = {}
-    for item in metadata:
-        kind = item['kind']
-        by_kind[kind] = by_kind.get(kind, 0) + 1
     
+    def count_kind(item: Dict) -> Dict:
+        by_kind[item['kind']] = by_kind.get(item['kind'], 0) + 1
+        return item
+    
+    if args.incremental:
+        changes = scanner.scan_incremental(output_path)
+        for item in scanner.metadata_list:
+            count_kind(item)
+        scanner.save_metadata(output_path)
+        scanner.save_manifest()
+    else:
+        # NDJSON なら走査しながら書き出す（全件をメモリに載せない）
+        write_records(output_path, (count_kind(item) for item in scanner.scan_iter()))
+        logger.info(f"Metadata saved: {output_path}")
+    scanner.save_dir_cache()
+    if metrics_path:
+        scanner.throttle.write_metrics(metrics_path)
+    
+    # サマリー出力
     print("\n=== Scan Summary ===")
     for kind, count in sorted(by_kind.items()):
         print(f"{kind}: {count}")
-    print(f"Total: {len(metadata)}")
+    print(f"Total: {sum(by_kind.values())}")
+    
+    if args.incremental:
+        print("\n=== Changes ===")
+        print(f"added: {len(changes['added'])}")
+        print(f"modified: {len(changes['modified'])}")
+        print(f"unchanged: {changes['unchanged']}")
+        print(f"deleted: {len(changes['deleted'])}")
@@ -0,0 +1,166 @@
+"""
+sidecars.py - 付随ファイル（字幕・メモ・メタ）解決モジュール
+
+メディアファイルと同名の付随ファイルを、ディレクトリ一覧 1 回分から解決する。
+ファイルごとに拡張子分の os.path.exists を発行せず、
+フォルダ単位で「ベース名 → 拡張子」マップを作って使い回す。
+
+scanner.py と text_sources.py で共有する。
+
+【Phase 1 design constraints】
+- This module matches sidecar files by NAME ONLY (directory listing).
+- Sidecar file contents are NOT read here.
+"""
+
+import os
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+# 付随ファイル種別ごとの拡張子（解決順もこの順）
+SIDECAR_TYPES = {
+    'subtitle': ['.srt', '.vtt', '.ass'],
+    'note': ['.txt', '.md'],
+    'meta': ['.nfo', '.json', '.xml']
+}
+
+SIDECAR_EXTENSIONS = {ext for exts in SIDECAR_TYPES.values() for ext in exts}
+
+
+def build_sidecar_map(entries: Iterable[os.DirEntry]) -> Dict[str, Dict[str, os.DirEntry]]:
+    """
+    ディレクトリ一覧から「ベース名 → {拡張子: DirEntry}」マップを作成
+    
+    Args:
+        entries: os.scandir のエントリ
+    
+    Returns:
+        付随ファイルマップ（付随拡張子を持つファイルのみ）
+    """
+    sidecar_map = {}
+    
+    for entry in entries:
+        stem, ext = os.path.splitext(entry.name)
+        ext = ext.lower()
+        if ext not in SIDECAR_EXTENSIONS:
+            continue
+        
+        try:
+            if entry.is_dir():
+                continue
+        except OSError:
+            continue
+        
+        sidecar_map.setdefault(os.path.normcase(stem), {})[ext] = entry
+    
+    return sidecar_map
+
+
+def resolve_sidecars(sidecar_map: Dict[str, Dict[str, os.DirEntry]], basename: str) -> Dict[str, Dict]:
+    """
+    付随ファイルマップから同名の付随ファイルを解決
+    
+    Args:
+        sidecar_map: build_sidecar_map の結果
+        basename: メディアファイル名（拡張子なし）
+    
+    Returns:
+        scanner.py の sidecar_files 形式の辞書
+    """
+    found = {}
+    matches = sidecar_map.get(os.path.normcase(basename))
+    if not matches:
+        return found
+    
+    for sidecar_type, exts in SIDECAR_TYPES.items():
+        for ext in exts:
+            entry = matches.get(ext)
+            if entry is None:
+                continue
+            try:
+                found[sidecar_type + ext] = {
+                    'path': entry.path,
+                    'size': entry.stat().st_size,
+                    'type': sidecar_type
+                }
+            except OSError as e:
+                logger.warning(f"Error reading sidecar {entry.path}: {e}")
+    
+    return found
+
+
+class SidecarResolver:
+    """ディレクトリ単位の付随ファイル解決器"""
+    
+    def __init__(self, max_cached_dirs: int = 64):
+        """
+        初期化
+        
+        Args:
+            max_cached_dirs: 保持するディレクトリマップ数（LRU）
+        """
+        self.max_cached_dirs = max_cached_dirs
+        self._maps = OrderedDict()
+    
+    def prime(self, dirname: str, entries: Iterable[os.DirEntry]) -> None:
+        """
+        取得済みのディレクトリ一覧からマップを登録（再一覧を避ける）
+        
+        Args:
+            dirname: ディレクトリパス
+            entries: そのディレクトリの os.scandir エントリ
+        """
+        self._store(dirname, build_sidecar_map(entries))
+    
+    def invalidate(self, dirname: Optional[str] = None) -> None:
+        """
+        キャッシュを破棄
+        
+        Args:
+            dirname: 対象ディレクトリ（None なら全件）
+        """
+        if dirname is None:
+            self._maps.clear()
+        else:
+            self._maps.pop(dirname, None)
+    
+    def find(self, dirname: str, basename: str) -> Dict[str, Dict]:
+        """
+        同名の付随ファイルを解決
+        
+        Args:
+            dirname: ディレクトリパス
+            basename: メディアファイル名（拡張子なし）
+        
+        Returns:
+            scanner.py の sidecar_files 形式の辞書
+        """
+        return resolve_sidecars(self._get_map(dirname), basename)
+    
+    def _get_map(self, dirname: str) -> Dict[str, Dict[str, os.DirEntry]]:
+        """ディレクトリのマップを取得（未登録なら 1 回だけ一覧化）"""
+        sidecar_map = self._maps.get(dirname)
+        if sidecar_map is not None:
+            self._maps.move_to_end(dirname)
+            return sidecar_map
+        
+        try:
+            with os.scandir(dirname or '.') as it:
+                sidecar_map = build_sidecar_map(it)
+        except OSError as e:
+            logger.debug(f"Cannot list {dirname}: {e}")
+            sidecar_map = {}
+        
+        self._store(dirname, sidecar_map)
+        return sidecar_map
+    
+    def _store(self, dirname: str, sidecar_map: Dict) -> None:
+        """LRU にマップを格納"""
+        self._maps[dirname] = sidecar_map
+        self._maps.move_to_end(dirname)
+        while len(self._maps) > self.max_cached_dirs:
+            self._maps.popitem(last=False)
@@ -21,6 +21,11 @@ import logging
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+try:
+    from .sidecars import SIDECAR_TYPES, SidecarResolver
+except ImportError:
+    from sidecars import SIDECAR_TYPES, SidecarResolver
+
 
 logger = logging.getLogger(__name__)
 
@@ -29,22 +34,20 @@ class TextSourceExtractor:
     """テキストソース抽出器"""
     
     # テキストソース種別ごとの拡張子
-    SOURCE_TYPES = {
-        'subtitle': ['.srt', '.vtt', '.ass'],
-        'note': ['.txt', '.md'],
-        'meta': ['.nfo', '.json', '.xml']
-    }
+    SOURCE_TYPES = SIDECAR_TYPES
     
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, sidecar_resolver: Optional[SidecarResolver] = None):
         """
         初期化
         
         Args:
             config: config.yaml から metadata セクション
+            sidecar_resolver: 共有する付随ファイル解決器（省略時は専用に作成）
         """
         self.config = config
         self.text_max_size = config.get('text_max_size_bytes', 1048576)  # 1MB
         self.text_encoding_errors = config.get('text_encoding_errors', 'ignore')
+        self.sidecar_resolver = sidecar_resolver or SidecarResolver()
     
     def extract_from_sidecar(self, sidecar_info: Dict) -> Dict:
         """
@@ -115,38 +118,37 @@ class TextSourceExtractor:
         dirname = os.path.dirname(media_path)
         basename = os.path.splitext(os.path.basename(media_path))[0]
         
-        for source_type, extensions in self.SOURCE_TYPES.items():
-            for ext in extensions:
-                sidecar_path = os.path.join(dirname, f"{basename}{ext}")
+        # ディレクトリ一覧 1 回分のマップから解決（拡張子ごとの exists は発行しない）
+        sidecars = self.sidecar_resolver.find(dirname, basename)
+        
+        for sidecar_id, sidecar_file in sidecars.items():
+            sidecar_path = sidecar_file['path']
+            
+            try:
+                size = sidecar_file['size']
                 
-                if not os.path.exists(sidecar_path):
+                if size > self.text_max_size:
+                    result['extraction_errors'].append(
+                        f"{os.path.basename(sidecar_path)}: file too large"
+                    )
                     continue
                 
-                try:
-                    size = os.path.getsize(sidecar_path)
-                    
-                    if size > self.text_max_size:
-                        result['extraction_errors'].append(
-                            f"{os.path.basename(sidecar_path)}: file too large"
-                        )
-                        continue
-                    
-                    text = self._read_text_file(sidecar_path)
-                    
-                    if text:
-                        result['text_sources'].append({
-                            'source_type': source_type,
-                            'filename': os.path.basename(sidecar_path),
-                            'extension': ext.lower(),
-                            'size': size,
-                            'text_length': len(text)
-                        })
-                        result['total_text_size'] += len(text)
+                text = self._read_text_file(sidecar_path)
                 
-                except Exception as e:
-                    result['extraction_errors'].append(
-                        f"{os.path.basename(sidecar_path)}: {str(e)}"
-                    )
+                if text:
+                    result['text_sources'].append({
+                        'source_type': sidecar_file['type'],
+                        'filename': os.path.basename(sidecar_path),
+                        'extension': os.path.splitext(sidecar_path)[1].lower(),
+                        'size': size,
+                        'text_length': len(text)
+                    })
+                    result['total_text_size'] += len(text)
+            
+            except Exception as e:
+                result['extraction_errors'].append(
+                    f"{os.path.basename(sidecar_path)}: {str(e)}"
+                )
         
         return result
     
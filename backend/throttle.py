@@ -0,0 +1,491 @@
+"""
+throttle.py - I/O スロットリングと低優先度モード
+
+業務時間中の走査・抽出がメディアサーバーの配信と同じディスクを飽和させないよう、
+以下を制限する（0 は無制限）：
+- stat 呼び出し数 / 秒（MediaScanner のファイル・ディレクトリの stat と一覧取得）
+- 読み込みバイト数 / 秒（ArchiveListExtractor の読み込み、ffprobe の推定読み込み量）
+- 同時に起動する外部プロセス数（ffprobe / 7z / unrar）
+
+制限値は実行中に変更できる（set_limits / SIGHUP で config.yaml の throttle を再読込）。
+累計値・待ち時間はメトリクスとして取得でき、Prometheus textfile 形式でも書き出せる。
+
+low_priority を有効にすると、プロセスを nice 19・ionice idle クラスで動かす
+（以後に起動するスレッド・外部プロセスにも引き継がれる）。
+
+同一プロセス内の走査器・抽出器は get_throttle() の共有インスタンスを使うため、
+制限はプロセス全体で合算される。
+
+【Phase 1 design constraints】
+- Only the pace of file-system access is controlled; file contents are not inspected.
+"""
+
+import os
+import time
+import asyncio
+import shutil
+import signal
+import logging
+import threading
+import subprocess
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+import yaml
+
+
+logger = logging.getLogger(__name__)
+
+
+# ffprobe が実際に読む量は分からないため、既定の probesize（5MB）を上限とする推定値で課金する
+FFPROBE_READ_ESTIMATE = 5 * 1000 * 1000
+
+# トークンバケットに溜められる量（秒数分）
+BURST_SEC = 1.0
+
+METRIC_PREFIX = 'media_search_throttle'
+
+
+class TokenBucket:
+    """レート制限（トークンバケット。rate <= 0 なら無制限）"""
+    
+    def __init__(self, rate: float = 0):
+        """
+        初期化
+        
+        Args:
+            rate: 1 秒あたりの許容量
+        """
+        self._lock = threading.Lock()
+        self.rate = 0.0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate)
+    
+    def set_rate(self, rate: float) -> None:
+        """
+        レートを変更（実行中でも可）
+        
+        Args:
+            rate: 1 秒あたりの許容量（0 以下で無制限）
+        """
+        with self._lock:
+            self.rate = max(0.0, float(rate or 0))
+            self.tokens = self.rate * BURST_SEC
+            self.updated = time.monotonic()
+    
+    def acquire(self, amount: float = 1) -> float:
+        """
+        amount 分を消費する（足りなければレートに合うまで待つ）
+        
+        大きな読み込みはバケット容量を超えて前借りし、不足分だけ待つ。
+        
+        Args:
+            amount: 消費量
+        
+        Returns:
+            待った秒数
+        """
+        if self.rate <= 0 or amount <= 0:
+            return 0.0
+        
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.rate * BURST_SEC, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class ConcurrencyLimit:
+    """同時実行数の制限（limit <= 0 なら無制限。実行中に変更可。スレッドと asyncio で共有）"""
+    
+    def __init__(self, limit: int = 0):
+        """
+        初期化
+        
+        Args:
+            limit: 同時実行数の上限
+        """
+        self._cond = threading.Condition()
+        # 空きを待っている asyncio のタスク（(ループ, Future)）
+        self._async_waiters = []
+        self.limit = max(0, int(limit or 0))
+        self.active = 0
+        self.peak = 0
+    
+    def set_limit(self, limit: int) -> None:
+        """上限を変更し、待っているスレッド・タスクを起こす"""
+        with self._cond:
+            self.limit = max(0, int(limit or 0))
+            self._cond.notify_all()
+            self._wake_async_waiters()
+    
+    def acquire(self) -> float:
+        """
+        枠を 1 つ取る（空くまで待つ）
+        
+        Returns:
+            待った秒数
+        """
+        started = time.monotonic()
+        with self._cond:
+            while self.limit > 0 and self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        return time.monotonic() - started
+    
+    async def acquire_async(self) -> float:
+        """
+        acquire の asyncio 版（待つ間イベントループを止めない。キャンセル可）
+        
+        Returns:
+            待った秒数
+        """
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.limit <= 0 or self.active < self.limit:
+                    self.active += 1
+                    self.peak = max(self.peak, self.active)
+                    return time.monotonic() - started
+                waiter = (loop, loop.create_future())
+                self._async_waiters.append(waiter)
+            try:
+                await waiter[1]
+            finally:
+                with self._cond:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+    
+    def release(self) -> None:
+        """枠を返す"""
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+            self._wake_async_waiters()
+    
+    def _wake_async_waiters(self) -> None:
+        """待っているタスクをすべて起こす（取れなかったタスクは再び待つ。_cond を持って呼ぶ）"""
+        for loop, future in self._async_waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_set_future_done, future)
+        self._async_waiters.clear()
+
+
+def _set_future_done(future: asyncio.Future) -> None:
+    """キャンセル済みでなければ Future を完了にする"""
+    if not future.done():
+        future.set_result(None)
+
+
+class IOThrottle:
+    """stat・読み込み・外部プロセスの制限とメトリクス"""
+    
+    def __init__(self, stat_per_sec: float = 0, read_bytes_per_sec: float = 0,
+                 max_subprocesses: int = 0):
+        """
+        初期化
+        
+        Args:
+            stat_per_sec: stat 呼び出し数 / 秒（0 で無制限）
+            read_bytes_per_sec: 読み込みバイト数 / 秒（0 で無制限）
+            max_subprocesses: 同時外部プロセス数（0 で無制限）
+        """
+        self._stats = TokenBucket(stat_per_sec)
+        self._reads = TokenBucket(read_bytes_per_sec)
+        self._subprocesses = ConcurrencyLimit(max_subprocesses)
+        self._lock = threading.Lock()
+        self.counters = {
+            'stat_calls': 0,
+            'stat_wait_sec': 0.0,
+            'bytes_read': 0,
+            'read_wait_sec': 0.0,
+            'subprocesses': 0,
+            'subprocess_wait_sec': 0.0
+        }
+    
+    def set_limits(self, stat_per_sec: Optional[float] = None,
+                   read_bytes_per_sec: Optional[float] = None,
+                   max_subprocesses: Optional[int] = None) -> None:
+        """
+        制限値を変更（None の項目は据え置き。実行中でも可）
+        
+        Args:
+            stat_per_sec: stat 呼び出し数 / 秒
+            read_bytes_per_sec: 読み込みバイト数 / 秒
+            max_subprocesses: 同時外部プロセス数
+        """
+        if stat_per_sec is not None:
+            self._stats.set_rate(stat_per_sec)
+        if read_bytes_per_sec is not None:
+            self._reads.set_rate(read_bytes_per_sec)
+        if max_subprocesses is not None:
+            self._subprocesses.set_limit(max_subprocesses)
+        logger.info(
+            f"Throttle limits: stat/s={self._stats.rate:g}, read B/s={self._reads.rate:g}, "
+            f"subprocesses={self._subprocesses.limit}"
+        )
+    
+    def configure(self, config: Dict) -> None:
+        """
+        config.yaml の throttle セクションから制限値を設定
+        
+        Args:
+            config: throttle セクション
+        """
+        self.set_limits(
+            stat_per_sec=config.get('stat_per_sec', 0),
+            read_bytes_per_sec=config.get('read_bytes_per_sec', 0),
+            max_subprocesses=config.get('max_subprocesses', 0)
+        )
+    
+    def stat(self, count: int = 1) -> None:
+        """stat 系の呼び出し前に呼ぶ"""
+        waited = self._stats.acquire(count)
+        with self._lock:
+            self.counters['stat_calls'] += count
+            self.counters['stat_wait_sec'] += waited
+    
+    def read(self, nbytes: int) -> None:
+        """読み込んだ（読み込む）バイト数を計上する"""
+        waited = self._reads.acquire(nbytes)
+        with self._lock:
+            self.counters['bytes_read'] += nbytes
+            self.counters['read_wait_sec'] += waited
+    
+    @contextmanager
+    def subprocess_slot(self) -> Iterator[None]:
+        """外部プロセスの実行枠（with 文で使用）"""
+        waited = self._subprocesses.acquire()
+        with self._lock:
+            self.counters['subprocesses'] += 1
+            self.counters['subprocess_wait_sec'] += waited
+        try:
+            yield
+        finally:
+            self._subprocesses.release()
+    
+    @asynccontextmanager
+    async def subprocess_slot_async(self) -> AsyncIterator[None]:
+        """subprocess_slot の asyncio 版（async with 文で使用。同じ枠を共有する）"""
+        waited = await self._subprocesses.acquire_async()
+        with self._lock:
+            self.counters['subprocesses'] += 1
+            self.counters['subprocess_wait_sec'] += waited
+        try:
+            yield
+        finally:
+            self._subprocesses.release()
+    
+    def metrics(self) -> Dict:
+        """
+        現在の制限値・累計値
+        
+        Returns:
+            メトリクス辞書
+        """
+        with self._lock:
+            metrics = dict(self.counters)
+        metrics.update({
+            'active_subprocesses': self._subprocesses.active,
+            'peak_subprocesses': self._subprocesses.peak,
+            'limit_stat_per_sec': self._stats.rate,
+            'limit_read_bytes_per_sec': self._reads.rate,
+            'limit_subprocesses': self._subprocesses.limit
+        })
+        return metrics
+    
+    def write_metrics(self, path: str) -> None:
+        """
+        メトリクスを Prometheus textfile 形式で書き出す（一時ファイル経由）
+        
+        Args:
+            path: 出力パス（node_exporter の textfile ディレクトリなど）
+        """
+        lines = []
+        for name, value in self.metrics().items():
+            kind = 'gauge' if name.startswith(('limit_', 'active_', 'peak_')) else 'counter'
+            metric = f"{METRIC_PREFIX}_{name}" + ('_total' if kind == 'counter' else '')
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {value:g}")
+        
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, path)
+    
+    def start_metrics_export(self, path: str, interval_sec: float = 30.0) -> threading.Thread:
+        """
+        メトリクスを定期的に書き出すスレッドを起動
+        
+        Args:
+            path: 出力パス
+            interval_sec: 書き出し間隔（秒）
+        
+        Returns:
+            起動したスレッド（デーモン）
+        """
+        def export() -> None:
+            while True:
+                try:
+                    self.write_metrics(path)
+                except OSError as e:
+                    logger.warning(f"Cannot write throttle metrics {path}: {e}")
+                time.sleep(interval_sec)
+        
+        thread = threading.Thread(target=export, name='throttle-metrics', daemon=True)
+        thread.start()
+        return thread
+
+
+class ThrottledReader:
+    """読み込み量を IOThrottle に計上するファイルラッパー（zipfile / tarfile に渡す）"""
+    
+    def __init__(self, raw, throttle: IOThrottle):
+        """
+        初期化
+        
+        Args:
+            raw: バイナリモードで開いたファイル
+            throttle: 計上先
+        """
+        self._raw = raw
+        self._throttle = throttle
+    
+    def read(self, size: int = -1) -> bytes:
+        data = self._raw.read(size)
+        self._throttle.read(len(data))
+        return data
+    
+    def readinto(self, buffer) -> int:
+        count = self._raw.readinto(buffer)
+        self._throttle.read(count or 0)
+        return count
+    
+    def __getattr__(self, name):
+        # seek / tell / seekable / close などはそのまま委譲
+        return getattr(self._raw, name)
+
+
+_shared_throttle = IOThrottle()
+_low_priority_applied = False
+# SIGHUP で再読込する config.yaml（install_reload_handler 済みなら None 以外）
+_reload_config_path = None
+
+
+def get_throttle() -> IOThrottle:
+    """プロセス共有の IOThrottle（既定は無制限）"""
+    return _shared_throttle
+
+
+def configure_throttle(config: Optional[Dict]) -> IOThrottle:
+    """
+    共有 IOThrottle を config.yaml の throttle セクションで設定
+    
+    low_priority が有効なら低優先度モードも適用する（1 回のみ）。
+    
+    Args:
+        config: throttle セクション（None なら無制限のまま）
+    
+    Returns:
+        共有 IOThrottle
+    """
+    if config:
+        _shared_throttle.configure(config)
+        if config.get('low_priority', False):
+            apply_low_priority()
+    return _shared_throttle
+
+
+def apply_low_priority() -> None:
+    """
+    プロセスを低優先度にする（CPU: nice 19、ディスク: ionice idle クラス）
+    
+    Linux では優先度はスレッド単位で、以後に作られるスレッド・子プロセスに引き継がれるため、
+    ワーカースレッドを起動する前（メインスレッド）で呼ぶこと。
+    """
+    global _low_priority_applied
+    if _low_priority_applied:
+        return
+    _low_priority_applied = True
+    
+    if hasattr(os, 'nice'):
+        try:
+            os.nice(max(0, 19 - os.nice(0)))
+        except OSError as e:
+            logger.warning(f"Cannot lower CPU priority: {e}")
+    else:
+        logger.warning("nice is not supported on this platform")
+    
+    if shutil.which('ionice'):
+        try:
+            result = subprocess.run(
+                ['ionice', '-c', '3', '-p', str(os.getpid())],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=5
+            )
+            if result.returncode != 0:
+                logger.warning(f"ionice failed: {result.stderr.decode(errors='replace').strip()}")
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"Cannot lower disk priority: {e}")
+    else:
+        logger.warning("ionice not found - disk priority unchanged")
+    
+    logger.info("Low-priority mode enabled")
+
+
+def install_reload_handler(config_path: str) -> None:
+    """
+    SIGHUP で config.yaml の throttle セクションを再読込し、制限値を更新する
+    
+    シグナルハンドラはメインスレッドで割り込んで動くため、パイプに 1 バイト書くだけにする
+    （メインスレッドが TokenBucket などのロックを持ったまま割り込まれても止まらない）。
+    再読込・ログ出力は専用スレッドで行う。
+    メインスレッドから呼ぶこと（SIGHUP の無い環境では何もしない）。
+    
+    Args:
+        config_path: config.yaml のパス
+    """
+    global _reload_config_path
+    if not hasattr(signal, 'SIGHUP'):
+        return
+    if _reload_config_path is not None:
+        _reload_config_path = config_path
+        return
+    _reload_config_path = config_path
+    
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(write_fd, False)
+    
+    def reload_loop() -> None:
+        # 続けて届いた SIGHUP はまとめて 1 回の再読込にする
+        while os.read(read_fd, 64):
+            try:
+                with open(_reload_config_path, 'r', encoding='utf-8') as f:
+                    config = yaml.safe_load(f)
+                _shared_throttle.configure(config.get('throttle') or {})
+            except Exception as e:
+                logger.warning(f"Cannot reload throttle config {_reload_config_path}: {e}")
+    
+    def on_sighup(signum, frame) -> None:
+        try:
+            os.write(write_fd, b'\0')
+        except OSError:
+            # パイプが満杯 = 再読込は既に予約済み
+            pass
+    
+    threading.Thread(target=reload_loop, name='throttle-reload', daemon=True).start()
+    signal.signal(signal.SIGHUP, on_sighup)
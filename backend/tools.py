@@ -0,0 +1,222 @@
+"""
+tools.py - 外部コマンド（ffprobe / 7z / unrar）の可用性レジストリ
+
+抽出器ごとに `ffprobe -version` などを実行していたのをプロセス共有にまとめる。
+
+- 初めて問い合わせたときにだけ確認する（使わないコマンドは起動しない）
+- 結果は JSON ファイルに保存し、次回以降（別プロセスを含む）は実行ファイルの
+  (パス, サイズ, mtime) が同じなら再確認しない（stat 1 回で済む）
+- PATH に無いコマンドは起動せずに「無し」とする
+
+【Phase 1 design constraints】
+- Only tool availability and version banners are recorded; no tool is run on user files here.
+"""
+
+import os
+import json
+import shutil
+import logging
+import subprocess
+import threading
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+# コマンド名 → (config.yaml metadata セクションのキー, 既定のコマンド, 確認時の引数)
+TOOLS = {
+    'ffprobe': ('ffprobe_path', 'ffprobe', ['-version']),
+    '7z': ('sevenzip_path', '7z', []),
+    'unrar': ('unrar_path', 'unrar', [])
+}
+
+# 確認コマンドのタイムアウト（秒）
+CHECK_TIMEOUT = 5
+
+
+class ToolRegistry:
+    """外部コマンドの可用性レジストリ"""
+    
+    def __init__(self, cache_path: Optional[str] = None, commands: Optional[Dict[str, str]] = None):
+        """
+        初期化（ここではコマンドを確認しない）
+        
+        Args:
+            cache_path: 確認結果を保存する JSON ファイル（None ならメモリのみ）
+            commands: コマンド名 → 実行するコマンド（省略時は TOOLS の既定値）
+        """
+        self.cache_path = cache_path
+        self.commands = {name: spec[1] for name, spec in TOOLS.items()}
+        self.commands.update(commands or {})
+        self._lock = threading.Lock()
+        self._resolved = {}
+        self._disk = None
+    
+    def configure(self, config: Optional[Dict]) -> None:
+        """
+        config.yaml の metadata セクションでコマンドと保存先を設定
+        
+        Args:
+            config: metadata セクション
+        """
+        config = config or {}
+        with self._lock:
+            for name, (key, default, _) in TOOLS.items():
+                self.commands[name] = config.get(key, self.commands.get(name, default))
+            cache_path = config.get('tool_cache_path', self.cache_path)
+            if cache_path != self.cache_path:
+                self.cache_path = cache_path
+                self._disk = None
+    
+    def get(self, name: str, command: Optional[str] = None) -> Dict:
+        """
+        コマンドの確認結果を取得（初回のみ確認）
+        
+        Args:
+            name: コマンド名（TOOLS のキー）
+            command: 実行するコマンド（省略時は設定値）
+        
+        Returns:
+            {'available': bool, 'command': str, 'path': str or None, 'version': str or None}
+        """
+        command = command or self.commands[name]
+        info = self._resolved.get(command)
+        if info is not None:
+            return info
+        
+        with self._lock:
+            if command not in self._resolved:
+                self._resolved[command] = self._detect(name, command)
+            return self._resolved[command]
+    
+    def available(self, name: str, command: Optional[str] = None) -> bool:
+        """コマンドが利用可能か"""
+        return self.get(name, command)['available']
+    
+    def command(self, name: str) -> str:
+        """設定されているコマンド"""
+        return self.commands[name]
+    
+    def refresh(self) -> None:
+        """確認結果を捨てる（次の問い合わせで確認し直す）"""
+        with self._lock:
+            self._resolved.clear()
+            self._disk = {}
+            self._save()
+    
+    def _detect(self, name: str, command: str) -> Dict:
+        """
+        コマンドを確認（保存済みで実行ファイルが変わっていなければ起動しない）
+        
+        Args:
+            name: コマンド名
+            command: 実行するコマンド
+        
+        Returns:
+            確認結果
+        """
+        info = {'available': False, 'command': command, 'path': None, 'version': None}
+        path = shutil.which(command)
+        if path is None:
+            logger.warning(f"{name} not found ({command})")
+            return info
+        
+        path = os.path.realpath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return info
+        identity = [st.st_size, st.st_mtime_ns]
+        
+        disk = self._load()
+        saved = disk.get(path)
+        if saved is not None and saved.get('identity') == identity:
+            info.update(available=saved['available'], path=path, version=saved['version'])
+            return info
+        
+        try:
+            result = subprocess.run(
+                [command] + TOOLS[name][2],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                timeout=CHECK_TIMEOUT
+            )
+            lines = result.stdout.decode('utf-8', errors='replace').strip().splitlines()
+            info.update(available=True, path=path, version=lines[0].strip() if lines else None)
+            logger.info(f"{name} is available: {info['version']}")
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f"{name} cannot be run ({command}): {e}")
+            info['path'] = path
+        
+        disk[path] = {'identity': identity, 'available': info['available'], 'version': info['version']}
+        self._save()
+        return info
+    
+    def _load(self) -> Dict:
+        """保存済みの確認結果を読む（初回のみ）"""
+        if self._disk is None:
+            self._disk = {}
+            if self.cache_path and os.path.exists(self.cache_path):
+                try:
+                    with open(self.cache_path, 'r', encoding='utf-8') as f:
+                        self._disk = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Cannot read tool cache {self.cache_path}: {e}")
+        return self._disk
+    
+    def _save(self) -> None:
+        """確認結果を保存（一時ファイルに書いて置き換える）"""
+        if not self.cache_path:
+            return
+        try:
+            dirname = os.path.dirname(self.cache_path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._disk, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Cannot write tool cache {self.cache_path}: {e}")
+
+
+# プロセス共有のレジストリ
+_shared_tools = ToolRegistry()
+
+
+def get_tools() -> ToolRegistry:
+    """プロセス共有の ToolRegistry を取得"""
+    return _shared_tools
+
+
+def configure_tools(config: Optional[Dict]) -> ToolRegistry:
+    """
+    共有 ToolRegistry を config.yaml の metadata セクションで設定
+    
+    Args:
+        config: metadata セクション
+    
+    Returns:
+        共有 ToolRegistry
+    """
+    if config:
+        _shared_tools.configure(config)
+    return _shared_tools
+
+
+if __name__ == '__main__':
+    import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Show external tool availability")
+    parser.add_argument('--cache', default='data/raw/tool_capabilities.json', help="Tool cache JSON")
+    parser.add_argument('--refresh', action='store_true', help="Re-check every tool")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    registry = ToolRegistry(args.cache)
+    if args.refresh:
+        registry.refresh()
+    print(json.dumps({name: registry.get(name) for name in TOOLS}, indent=2, ensure_ascii=False))
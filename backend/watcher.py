@@ -0,0 +1,441 @@
+"""
+watcher.py - ファイルシステム監視デーモン（Linux / inotify）
+
+scanner.py の全走査を定期実行する代わりに、inotify のイベント
+（作成・書き込み完了・移動・削除）を受けて、メタデータカタログ
+（data/raw/metadata.json）と Chroma の media_metadata コレクションを
+対象ファイル分だけ更新する。
+
+大量コピー（写真 2,000 枚の取り込みなど）はデバウンスして
+1 回のバッチにまとめて反映する。
+
+【Phase 1 design constraints】
+- This module watches file-system events and updates METADATA ONLY.
+- File contents are never read or analyzed.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+from collections import OrderedDict
+from typing import Dict, List
+
+try:
+    from .scanner import MediaScanner
+    from .sidecars import SIDECAR_EXTENSIONS
+    from .indexer import MediaIndexer
+    from .catalog_io import iter_records
+    from .throttle import install_reload_handler
+except ImportError:
+    from scanner import MediaScanner
+    from sidecars import SIDECAR_EXTENSIONS
+    from indexer import MediaIndexer
+    from catalog_io import iter_records
+    from throttle import install_reload_handler
+
+
+logger = logging.getLogger(__name__)
+
+
+# inotify イベントマスク（linux/inotify.h）
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR
+)
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+# 保留アクション
+UPSERT = 'upsert'
+DELETE = 'delete'
+UPSERT_TREE = 'upsert_tree'
+DELETE_TREE = 'delete_tree'
+
+
+class Inotify:
+    """libc の inotify を ctypes で呼び出す最小ラッパー"""
+    
+    def __init__(self):
+        """inotify インスタンスを作成"""
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+    
+    def add_watch(self, path: str, mask: int) -> int:
+        """ディレクトリを監視対象に追加し、watch descriptor を返す"""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+    
+    def rm_watch(self, wd: int) -> None:
+        """監視を解除（既に消えている場合は無視）"""
+        self._libc.inotify_rm_watch(self.fd, wd)
+    
+    def read_events(self) -> List[tuple]:
+        """
+        溜まっているイベントを読み出す
+        
+        Returns:
+            (wd, mask, cookie, name) のリスト
+        """
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not buf:
+                break
+            
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buf):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+                offset += _EVENT_HEADER.size
+                name = buf[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+    
+    def close(self) -> None:
+        """fd を閉じる"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class MediaWatcher:
+    """メタデータカタログ・インデックスを最新に保つ監視デーモン"""
+    
+    def __init__(self, config_path: str = "config/config.yaml",
+                 metadata_path: str = "data/raw/metadata.json",
+                 use_index: bool = True):
+        """
+        初期化
+        
+        Args:
+            config_path: config.yaml のパス
+            metadata_path: メタデータカタログのパス（JSON / NDJSON）
+            use_index: Chroma コレクションも更新するか
+        """
+        self.scanner = MediaScanner(config_path)
+        # 監視中はイベント単位で走査するのでディレクトリキャッシュは使わない
+        self.scanner.dir_cache = None
+        self.config = self.scanner.config
+        self.root_paths = self.scanner.root_paths
+        self.metadata_path = metadata_path
+        
+        watch_config = self.config.get('watch', {})
+        # 最後のイベントからこの秒数静かになったら反映
+        self.debounce_sec = watch_config.get('debounce_sec', 2.0)
+        # イベントが続いても、最初のイベントからこの秒数で強制反映
+        self.max_batch_delay_sec = watch_config.get('max_batch_delay_sec', 30.0)
+        # 保留件数がこれを超えたら即反映
+        self.max_batch_size = watch_config.get('max_batch_size', 5000)
+        
+        self.indexer = MediaIndexer(config_path) if use_index else None
+        
+        self.catalog = OrderedDict()
+        self.pending = OrderedDict()
+        self.first_event_at = None
+        self.last_event_at = None
+        self.needs_rescan = False
+        
+        self.inotify = None
+        self.wd_to_path = {}
+        self.path_to_wd = {}
+        self._stop = False
+    
+    def load_catalog(self) -> None:
+        """既存のメタデータカタログを読み込む（無ければ全走査で作る）"""
+        try:
+            for meta in iter_records(self.metadata_path):
+                self.catalog[meta['path']] = meta
+            logger.info(f"Loaded catalog: {len(self.catalog)} items")
+        except FileNotFoundError:
+            logger.info("No catalog found - running initial scan")
+            self.needs_rescan = True
+        except Exception as e:
+            logger.warning(f"Error loading catalog, rescanning: {e}")
+            self.needs_rescan = True
+    
+    def run(self) -> None:
+        """監視ループ（stop() が呼ばれるか Ctrl+C まで）"""
+        self.inotify = Inotify()
+        try:
+            self.load_catalog()
+            for root_path in self.root_paths:
+                self._watch_tree(root_path)
+            if self.needs_rescan:
+                self.flush()
+            logger.info(f"Watching {len(self.wd_to_path)} directories under {', '.join(self.root_paths)}")
+            
+            while not self._stop:
+                ready, _, _ = select.select([self.inotify.fd], [], [], self._next_timeout())
+                if ready:
+                    for event in self.inotify.read_events():
+                        self._handle_event(*event)
+                
+                if self._should_flush():
+                    self.flush()
+        except KeyboardInterrupt:
+            logger.info("Stopping watcher")
+        finally:
+            if self.pending or self.needs_rescan:
+                self.flush()
+            self.inotify.close()
+    
+    def stop(self) -> None:
+        """監視ループを停止"""
+        self._stop = True
+    
+    def _next_timeout(self) -> float:
+        """次に flush 判定が必要になるまでの秒数"""
+        if not self.pending:
+            return 1.0
+        now = time.monotonic()
+        due = min(self.last_event_at + self.debounce_sec,
+                  self.first_event_at + self.max_batch_delay_sec)
+        return max(0.0, due - now)
+    
+    def _should_flush(self) -> bool:
+        """保留中の変更を反映するタイミングか"""
+        if self.needs_rescan:
+            return True
+        if not self.pending:
+            return False
+        now = time.monotonic()
+        return (
+            now - self.last_event_at >= self.debounce_sec
+            or now - self.first_event_at >= self.max_batch_delay_sec
+            or len(self.pending) >= self.max_batch_size
+        )
+    
+    def _watch_tree(self, top: str) -> None:
+        """ディレクトリツリー全体に監視を追加"""
+        stack = [top]
+        while stack:
+            dirpath = stack.pop()
+            if not self._add_watch(dirpath):
+                continue
+            try:
+                with os.scandir(dirpath) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+            except OSError as e:
+                logger.warning(f"Cannot list {dirpath}: {e}")
+    
+    def _add_watch(self, dirpath: str) -> bool:
+        """1 ディレクトリに監視を追加"""
+        try:
+            wd = self.inotify.add_watch(dirpath, WATCH_MASK)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                logger.error("inotify watch limit reached - raise fs.inotify.max_user_watches")
+            else:
+                logger.warning(f"Cannot watch {dirpath}: {e}")
+            return False
+        self.wd_to_path[wd] = dirpath
+        self.path_to_wd[dirpath] = wd
+        return True
+    
+    def _unwatch_tree(self, top: str) -> None:
+        """ディレクトリ配下の監視を解除"""
+        prefix = top.rstrip(os.sep) + os.sep
+        for path in [p for p in self.path_to_wd if p == top or p.startswith(prefix)]:
+            wd = self.path_to_wd.pop(path)
+            self.wd_to_path.pop(wd, None)
+            self.inotify.rm_watch(wd)
+    
+    def _handle_event(self, wd: int, mask: int, cookie: int, name: str) -> None:
+        """
+        inotify イベントを保留アクションに変換
+        
+        Args:
+            wd: watch descriptor
+            mask: イベントマスク
+            cookie: 移動イベントの対応付け用（未使用）
+            name: 対象エントリ名
+        """
+        if mask & IN_Q_OVERFLOW:
+            logger.warning("inotify queue overflow - full rescan scheduled")
+            self.needs_rescan = True
+            return
+        
+        if mask & IN_IGNORED:
+            dirpath = self.wd_to_path.pop(wd, None)
+            if dirpath is not None and self.path_to_wd.get(dirpath) == wd:
+                del self.path_to_wd[dirpath]
+            return
+        
+        dirpath = self.wd_to_path.get(wd)
+        if dirpath is None:
+            return
+        
+        if mask & IN_DELETE_SELF:
+            self._queue(dirpath, DELETE_TREE)
+            return
+        
+        path = os.path.join(dirpath, name) if name else dirpath
+        
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._watch_tree(path)
+                self._queue(path, UPSERT_TREE)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._unwatch_tree(path)
+                self._queue(path, DELETE_TREE)
+            return
+        
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            self._queue(path, DELETE)
+        elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_ATTRIB):
+            self._queue(path, UPSERT)
+    
+    def _queue(self, path: str, action: str) -> None:
+        """保留アクションを登録（同じパスは最新のアクションで上書き）"""
+        self.pending.pop(path, None)
+        self.pending[path] = action
+        
+        now = time.monotonic()
+        if self.first_event_at is None:
+            self.first_event_at = now
+        self.last_event_at = now
+    
+    def flush(self) -> None:
+        """保留中の変更をカタログ・インデックスにまとめて反映"""
+        batch = self.pending
+        self.pending = OrderedDict()
+        self.first_event_at = None
+        self.last_event_at = None
+        
+        # ディレクトリ一覧が変わっているので付随ファイルの解決キャッシュを破棄
+        self.scanner.sidecar_resolver.invalidate()
+        
+        upserts = OrderedDict()
+        deletes = set()
+        
+        if self.needs_rescan:
+            self.needs_rescan = False
+            batch = OrderedDict((root_path, UPSERT_TREE) for root_path in self.root_paths)
+        
+        for path, action in batch.items():
+            if action == UPSERT:
+                self._collect_file(path, upserts, deletes)
+            elif action == DELETE:
+                deletes.add(path)
+                self._collect_sidecar_owners(path, upserts, deletes)
+            elif action == UPSERT_TREE:
+                self._collect_tree(path, upserts, deletes)
+            elif action == DELETE_TREE:
+                deletes.update(self._catalog_paths_under(path))
+        
+        deletes = [path for path in deletes if path not in upserts and path in self.catalog]
+        for path in deletes:
+            del self.catalog[path]
+        for path, meta in upserts.items():
+            self.catalog[path] = meta
+        
+        if not upserts and not deletes:
+            return
+        
+        self._save_catalog()
+        
+        if self.indexer is not None:
+            self.indexer.delete_paths(deletes)
+            self.indexer.upsert_metadata(list(upserts.values()))
+        
+        logger.info(f"Applied {len(upserts)} updates, {len(deletes)} deletions")
+    
+    def _scan_records(self, path: str, tree: bool = False) -> List[Dict]:
+        """scanner の走査処理でレコードを作る（単一ファイル / サブツリー）"""
+        if tree:
+            return list(self.scanner._iter_scandir(path))
+        meta = self.scanner._process_file(path)
+        return [meta] if meta is not None else []
+    
+    def _collect_file(self, path: str, upserts: Dict, deletes: set) -> None:
+        """単一ファイルの更新を集める"""
+        if not os.path.isfile(path):
+            deletes.add(path)
+        else:
+            for meta in self._scan_records(path):
+                upserts[meta['path']] = meta
+        self._collect_sidecar_owners(path, upserts, deletes)
+    
+    def _collect_sidecar_owners(self, path: str, upserts: Dict, deletes: set) -> None:
+        """付随ファイルが変わった場合、同名メディアのレコードも作り直す"""
+        dirname = os.path.dirname(path)
+        stem, ext = os.path.splitext(os.path.basename(path))
+        if ext.lower() not in SIDECAR_EXTENSIONS:
+            return
+        
+        for target_ext in self.scanner.target_extensions:
+            if target_ext in SIDECAR_EXTENSIONS:
+                continue
+            for candidate_ext in (target_ext, target_ext.upper()):
+                owner = os.path.join(dirname, stem + candidate_ext)
+                if owner in self.catalog and owner not in upserts:
+                    for meta in self._scan_records(owner):
+                        upserts[meta['path']] = meta
+    
+    def _collect_tree(self, path: str, upserts: Dict, deletes: set) -> None:
+        """サブツリーを走査し、消えたファイルの削除も集める"""
+        found = set()
+        if os.path.isdir(path):
+            for meta in self._scan_records(path, tree=True):
+                upserts[meta['path']] = meta
+                found.add(meta['path'])
+        deletes.update(p for p in self._catalog_paths_under(path) if p not in found)
+    
+    def _catalog_paths_under(self, top: str) -> List[str]:
+        """カタログ中で top 配下にあるパス"""
+        prefix = top.rstrip(os.sep) + os.sep
+        return [p for p in self.catalog if p == top or p.startswith(prefix)]
+    
+    def _save_catalog(self) -> None:
+        """カタログを保存（scanner と同じ形式）"""
+        self.scanner.metadata_list = list(self.catalog.values())
+        try:
+            self.scanner.save_metadata(self.metadata_path)
+        finally:
+            self.scanner.metadata_list = []
+
+
+if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Watch the scan root and keep the index current")
+    parser.add_argument('--config', default="config/config.yaml")
+    parser.add_argument('--metadata', default="data/raw/metadata.json")
+    parser.add_argument('--no-index', action='store_true', help="update metadata.json only")
+    args = parser.parse_args()
+    
+    watcher = MediaWatcher(args.config, args.metadata, use_index=not args.no_index)
+    install_reload_handler(args.config)
+    watcher.run()
@@ -0,0 +1,208 @@
+"""
+zip_directory.py - ZIP セントラルディレクトリの直接読み込み（zipfile を使わない軽量経路）
+
+zipfile.ZipFile は開いた時点で全エントリの ZipInfo を作るため、数百万エントリの ZIP では
+一覧の上限に関係なく数秒・数百 MB かかる。ここではファイルを mmap し、
+
+- 末尾から EOCD（End of Central Directory）を探し、あれば ZIP64 EOCD をたどる
+- セントラルディレクトリのレコードを 1 件ずつ struct.unpack_from で読む（必要な件数だけ）
+
+ことで、読んだ分のレコードしか触らない。合計エントリ数は EOCD の値を使う。
+先頭に別データが付いた ZIP（自己解凍形式など）は zipfile と同じくずれを補正する。
+壊れたファイルは zipfile と同じ zipfile.BadZipFile を送出する。
+
+【Phase 1 design constraints】
+- Only the central directory is read; member data is never decompressed.
+"""
+
+import os
+import mmap
+import struct
+from typing import Dict, Iterator, Optional
+from zipfile import BadZipFile
+
+
+# End of Central Directory（22 バイト + コメント最大 65535 バイト）
+EOCD_SIGNATURE = b'PK\x05\x06'
+EOCD_STRUCT = struct.Struct('<4sHHHHIIH')
+MAX_COMMENT = 0xFFFF
+
+# ZIP64 EOCD ロケータ（EOCD の直前 20 バイト）と ZIP64 EOCD（56 バイト）
+ZIP64_LOCATOR_SIGNATURE = b'PK\x06\x07'
+ZIP64_LOCATOR_STRUCT = struct.Struct('<4sIQI')
+ZIP64_EOCD_SIGNATURE = b'PK\x06\x06'
+ZIP64_EOCD_STRUCT = struct.Struct('<4sQHHIIQQQQ')
+
+# セントラルディレクトリのレコード（固定部 46 バイト）
+CENTRAL_SIGNATURE = 0x02014B50
+CENTRAL_STRUCT = struct.Struct('<IHHHHHHIIIHHHHHII')
+
+# 汎用フラグのビット 11: ファイル名が UTF-8
+FLAG_UTF8 = 0x800
+# ZIP64 拡張フィールドの ID
+EXTRA_ZIP64 = 0x0001
+
+
+class ZipDirectory:
+    """ZIP のセントラルディレクトリ（with 文で使用）"""
+    
+    def __init__(self, fileobj):
+        """
+        EOCD を読んで位置と件数を求める（エントリはまだ読まない）
+        
+        Args:
+            fileobj: バイナリモードで開いたファイル（fileno() が使えるもの）
+        
+        Raises:
+            BadZipFile: ZIP ではない・壊れている
+        """
+        size = os.fstat(fileobj.fileno()).st_size
+        if size < EOCD_STRUCT.size:
+            raise BadZipFile("File is not a zip file")
+        self._map = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_end_record(size)
+        except Exception:
+            self._map.close()
+            raise
+    
+    def _read_end_record(self, size: int) -> None:
+        """EOCD（と ZIP64 EOCD）を読む"""
+        tail_start = max(0, size - EOCD_STRUCT.size - MAX_COMMENT)
+        eocd = self._map.rfind(EOCD_SIGNATURE, tail_start)
+        # コメント中に署名と同じバイト列がある場合に備え、コメント長が合う位置まで戻る
+        while eocd >= 0:
+            if eocd + EOCD_STRUCT.size <= size:
+                fields = EOCD_STRUCT.unpack_from(self._map, eocd)
+                if eocd + EOCD_STRUCT.size + fields[7] <= size:
+                    break
+            eocd = self._map.rfind(EOCD_SIGNATURE, tail_start, eocd)
+        if eocd < 0:
+            raise BadZipFile("File is not a zip file")
+        # 読んだバイト数（末尾の探索範囲 + 読み進めたレコード。I/O 制限の計上用）
+        self.bytes_read = size - tail_start
+        
+        _, disk, cd_disk, _, total, cd_size, cd_offset, comment_length = fields
+        self.comment = bytes(self._map[eocd + EOCD_STRUCT.size:eocd + EOCD_STRUCT.size + comment_length])
+        end = eocd
+        
+        locator = eocd - ZIP64_LOCATOR_STRUCT.size
+        if locator >= 0 and self._map[locator:locator + 4] == ZIP64_LOCATOR_SIGNATURE:
+            _, _, zip64_offset, disks = ZIP64_LOCATOR_STRUCT.unpack_from(self._map, locator)
+            if disks > 1:
+                raise BadZipFile("zipfiles that span multiple disks are not supported")
+            zip64 = locator - ZIP64_EOCD_STRUCT.size
+            if zip64 < 0 or self._map[zip64:zip64 + 4] != ZIP64_EOCD_SIGNATURE:
+                raise BadZipFile("Corrupt ZIP64 end of central directory")
+            fields64 = ZIP64_EOCD_STRUCT.unpack_from(self._map, zip64)
+            disk, cd_disk, total, cd_size, cd_offset = fields64[4], fields64[5], fields64[7], fields64[8], fields64[9]
+            end = zip64
+            self.bytes_read += ZIP64_EOCD_STRUCT.size + ZIP64_LOCATOR_STRUCT.size
+        elif disk or cd_disk:
+            raise BadZipFile("zipfiles that span multiple disks are not supported")
+        
+        # 先頭に付いたデータの分だけオフセットがずれている（zipfile と同じ補正）
+        self.prefix_size = end - cd_size - cd_offset
+        self.cd_start = cd_offset + self.prefix_size
+        self.cd_size = cd_size
+        self.total_entries = total
+        if self.prefix_size < 0 or self.cd_start < 0:
+            raise BadZipFile("Bad offset for central directory")
+    
+    def entries(self, limit: Optional[int] = None) -> Iterator[Dict]:
+        """
+        セントラルディレクトリのエントリを先頭から順に返す
+        
+        Args:
+            limit: 最大件数（省略時はすべて）
+        
+        Yields:
+            {'name', 'size', 'is_dir', 'compressed_size', 'crc32', 'compress_type'}
+        
+        Raises:
+            BadZipFile: レコードが壊れている
+        """
+        pos = self.cd_start
+        end = self.cd_start + self.cd_size
+        count = 0
+        data = self._map
+        while pos < end and (limit is None or count < limit):
+            if pos + CENTRAL_STRUCT.size > end:
+                raise BadZipFile("Truncated central directory")
+            (signature, _, _, flags, method, _, _, crc, compressed_size, size,
+             name_length, extra_length, comment_length, _, _, _, _) = CENTRAL_STRUCT.unpack_from(data, pos)
+            if signature != CENTRAL_SIGNATURE:
+                raise BadZipFile("Bad magic number for central directory")
+            
+            name_start = pos + CENTRAL_STRUCT.size
+            raw_name = data[name_start:name_start + name_length]
+            name = raw_name.decode('utf-8' if flags & FLAG_UTF8 else 'cp437')
+            # zipfile と同じく NUL 以降は捨てる
+            nul = name.find('\0')
+            if nul >= 0:
+                name = name[:nul]
+            
+            if extra_length and (size == 0xFFFFFFFF or compressed_size == 0xFFFFFFFF):
+                size, compressed_size = self._zip64_sizes(
+                    name_start + name_length, extra_length, size, compressed_size
+                )
+            
+            record_length = CENTRAL_STRUCT.size + name_length + extra_length + comment_length
+            pos += record_length
+            self.bytes_read += record_length
+            count += 1
+            yield {
+                'name': name,
+                'size': size,
+                'is_dir': name.endswith('/'),
+                'compressed_size': compressed_size,
+                'crc32': crc,
+                'compress_type': method
+            }
+    
+    def _zip64_sizes(self, start: int, length: int, size: int, compressed_size: int):
+        """ZIP64 拡張フィールドから 64 ビットのサイズを読む（0xFFFFFFFF の項目だけが順に入っている）"""
+        pos, end = start, start + length
+        while pos + 4 <= end:
+            header_id, data_size = struct.unpack_from('<HH', self._map, pos)
+            if header_id == EXTRA_ZIP64:
+                values = self._map[pos + 4:pos + 4 + data_size]
+                offset = 0
+                if size == 0xFFFFFFFF:
+                    if offset + 8 > len(values):
+                        raise BadZipFile("Corrupt extra field 0001 (file size)")
+                    size = struct.unpack_from('<Q', values, offset)[0]
+                    offset += 8
+                if compressed_size == 0xFFFFFFFF:
+                    if offset + 8 > len(values):
+                        raise BadZipFile("Corrupt extra field 0001 (compress size)")
+                    compressed_size = struct.unpack_from('<Q', values, offset)[0]
+                break
+            pos += 4 + data_size
+        return size, compressed_size
+    
+    def close(self) -> None:
+        """mmap を閉じる"""
+        self._map.close()
+    
+    def __enter__(self) -> 'ZipDirectory':
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+if __name__ == '__main__':
+    import sys
+    import json
+    
+    if len(sys.argv) < 2:
+        print("Usage: python zip_directory.py <zipfile> [limit]")
+        sys.exit(1)
+    
+    with open(sys.argv[1], 'rb') as f, ZipDirectory(f) as directory:
+        limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        print(json.dumps({
+            'total_entries': directory.total_entries,
+            'entries': list(directory.entries(limit))
+        }, indent=2, ensure_ascii=False))
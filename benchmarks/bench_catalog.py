@@ -0,0 +1,119 @@
+"""
+bench_catalog.py - カタログ保持形式のメモリベンチマーク
+
+走査レコードと同じ形の合成レコードを作り、
+従来の list of dict と CompactCatalog のメモリ使用量・構築時間・全件読み出し時間を比較する。
+CompactCatalog から戻した辞書が元のレコードと一致することも確認する。
+
+Usage:
+    python benchmarks/bench_catalog.py [--records 200000] [--files-per-dir 40]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from backend.compact_catalog import CompactCatalog  # noqa: E402
+
+
+KINDS = [('video', '.mkv'), ('video', '.mp4'), ('image', '.jpg'), ('audio', '.flac'), ('archive', '.zip')]
+
+
+def make_records(n_records: int, files_per_dir: int):
+    """
+    走査レコードと同じ形の合成レコードを生成
+    
+    Args:
+        n_records: レコード数
+        files_per_dir: ディレクトリあたりのファイル数
+    
+    Yields:
+        メタデータ辞書
+    """
+    base_time = datetime(2020, 1, 1)
+    for i in range(n_records):
+        d = i // files_per_dir
+        kind, ext = KINDS[i % len(KINDS)]
+        dirpath = os.path.join('/mnt/media', f"Library {d % 13}", f"Collection {d % 257}", f"Folder {d}")
+        name_without_ext = f"Some Media Title {i:07d} [1080p]"
+        name = name_without_ext + ext
+        path = os.path.join(dirpath, name)
+        sidecar_files = {}
+        if i % 10 == 0:
+            sidecar_files['.srt'] = os.path.join(dirpath, name_without_ext + '.srt')
+        yield {
+            'path': path,
+            'name': name,
+            'name_without_ext': name_without_ext,
+            'ext': ext,
+            'size': 1_000_000 + i * 7919,
+            'mtime': (base_time + timedelta(seconds=i * 37, microseconds=i % 999983)).isoformat(),
+            'kind': kind,
+            'sidecar_files': sidecar_files
+        }
+
+
+def measure(build):
+    """
+    build() の構築時間と、結果を保持したままの確保メモリ（バイト）を返す
+    
+    時間は tracemalloc のオーバーヘッドを避けるため別に計測する。
+    """
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Catalog memory benchmark")
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--files-per-dir', type=int, default=40)
+    args = parser.parse_args()
+    
+    dicts, dict_bytes, dict_build = measure(lambda: list(make_records(args.records, args.files_per_dir)))
+    compact, compact_bytes, compact_build = measure(
+        lambda: CompactCatalog(make_records(args.records, args.files_per_dir))
+    )
+    
+    start = time.perf_counter()
+    for meta in dicts:
+        meta['path'], meta['mtime'], meta['kind']
+    dict_read = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for meta in compact:
+        meta['path'], meta['mtime'], meta['kind']
+    compact_read = time.perf_counter() - start
+    
+    identical = all(a == b for a, b in zip(dicts, compact.iter_dicts())) and len(dicts) == len(compact)
+    
+    print(f"=== Catalog Memory Benchmark ({args.records} records) ===")
+    for label, nbytes, build, read in [
+        ('list of dict', dict_bytes, dict_build, dict_read),
+        ('CompactCatalog', compact_bytes, compact_build, compact_read),
+    ]:
+        print(
+            f"{label:15s}: {nbytes / 2**20:8.1f} MiB  {nbytes / args.records:7.1f} B/record  "
+            f"build {build:.2f}s  read {read:.2f}s"
+        )
+    print(f"memory ratio: {dict_bytes / compact_bytes:.1f}x")
+    print(f"identical records: {identical}")
+
+
+if __name__ == '__main__':
+    main()
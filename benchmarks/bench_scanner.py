@@ -0,0 +1,125 @@
+"""
+bench_scanner.py - 走査エンジンのベンチマーク
+
+合成ディレクトリツリーを一時フォルダに作成し、
+MediaScanner の walk（旧実装）と scandir エンジンを比較する。
+--threads を指定すると scandir の並列走査も計測する。
+すべての出力が一致することも確認する。
+
+Usage:
+    python benchmarks/bench_scanner.py [--dirs 200] [--files 50] [--repeat 3] [--threads 8]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import yaml
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from backend.scanner import MediaScanner  # noqa: E402
+
+
+# 合成ツリーに置くファイル拡張子（対象外を多めに混ぜる）
+MEDIA_EXTS = ['.mp4', '.jpg', '.mp3', '.zip']
+SIDECAR_EXTS = ['.srt', '.nfo']
+OTHER_EXTS = ['.dll', '.tmp', '.dat', '.ini', '.log', '.bak']
+
+
+def build_tree(root: str, n_dirs: int, n_files: int) -> int:
+    """
+    合成ツリーを作成
+    
+    Args:
+        root: 作成先
+        n_dirs: ディレクトリ数
+        n_files: ディレクトリあたりのファイル数
+    
+    Returns:
+        作成したファイル数
+    """
+    created = 0
+    for d in range(n_dirs):
+        # 3 階層程度にばらす
+        dirpath = os.path.join(root, f"a{d % 7}", f"b{d % 31}", f"c{d}")
+        os.makedirs(dirpath, exist_ok=True)
+        for i in range(n_files):
+            if i % 3 == 0:
+                ext = MEDIA_EXTS[i % len(MEDIA_EXTS)]
+            elif i % 7 == 0:
+                ext = SIDECAR_EXTS[i % len(SIDECAR_EXTS)]
+            else:
+                ext = OTHER_EXTS[i % len(OTHER_EXTS)]
+            with open(os.path.join(dirpath, f"file_{i:05d}{ext}"), 'wb') as f:
+                f.write(b'x' * (i % 64))
+            created += 1
+    return created
+
+
+def write_config(tmp_dir: str, root: str, traversal: str, threads: int = 1) -> str:
+    """ベンチ用 config.yaml を作成"""
+    with open(os.path.join(REPO_ROOT, 'config', 'config.yaml'), 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    config['scan']['root_path'] = root
+    config['scan']['traversal'] = traversal
+    config['scan']['threads'] = threads
+    
+    path = os.path.join(tmp_dir, f"config_{traversal}_{threads}.yaml")
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    return path
+
+
+def run(config_path: str, repeat: int):
+    """走査を repeat 回実行し、最良時間と結果を返す"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        scanner = MediaScanner(config_path)
+        start = time.perf_counter()
+        result = scanner.scan()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="MediaScanner traversal benchmark")
+    parser.add_argument('--dirs', type=int, default=200)
+    parser.add_argument('--files', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=1)
+    args = parser.parse_args()
+    
+    tmp_dir = tempfile.mkdtemp(prefix='bench_scanner_')
+    try:
+        root = os.path.join(tmp_dir, 'tree')
+        total = build_tree(root, args.dirs, args.files)
+        print(f"Synthetic tree: {args.dirs} dirs, {total} files")
+        
+        timings = {}
+        results = {}
+        variants = [('walk', 'walk', 1), ('scandir', 'scandir', 1)]
+        if args.threads > 1:
+            variants.append((f"scandir x{args.threads}", 'scandir', args.threads))
+        for label, traversal, threads in variants:
+            config_path = write_config(tmp_dir, root, traversal, threads)
+            timings[label], results[label] = run(config_path, args.repeat)
+        
+        same = all(result == results['walk'] for result in results.values())
+        print(f"\n=== Scan Benchmark (best of {args.repeat}) ===")
+        for traversal, elapsed in timings.items():
+            speedup = timings['walk'] / elapsed
+            print(f"{traversal:12s}: {elapsed:.3f}s  {speedup:.2f}x  ({len(results[traversal])} records)")
+        print(f"identical output: {same}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
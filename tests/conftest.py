@@ -0,0 +1,42 @@
+"""
+テスト共通設定
+
+backend のモジュールは `python backend/xxx.py` でも動くよう絶対 import にフォールバックするため、
+backend ディレクトリをパスに追加して同じ形で読み込む。
+"""
+
+import os
+import sys
+
+import pytest
+import yaml
+
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+CONFIG_PATH = os.path.join(os.path.dirname(BACKEND_DIR), 'config', 'config.yaml')
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def make_config(tmp_path):
+    """
+    config.yaml を元に、データの保存先を tmp_path に向けた設定ファイルを作る
+    
+    呼び出し例: make_config(scan={'root_path': str(root), 'dir_cache': True})
+    """
+    def make(**sections):
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        config['scan']['root_paths'] = []
+        for section in ('scan', 'metadata'):
+            for key, value in list((config.get(section) or {}).items()):
+                if isinstance(value, str) and value.startswith('data/'):
+                    config[section][key] = str(tmp_path / value)
+        for section, values in sections.items():
+            config.setdefault(section, {}).update(values)
+        path = tmp_path / 'config.yaml'
+        with open(path, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(config, f, allow_unicode=True)
+        return str(path)
+    return make
@@ -0,0 +1,66 @@
+"""archive_cache: エントリ BLOB の往復と、抽出器のバージョン・上限件数が変わった行を使わないこと"""
+
+import sqlite3
+
+from archive_cache import ArchiveCache, encode_entries, decode_entries, TRAVERSAL_WARNING
+
+
+KEY = (1234, 1700000000000000000, 'abcd')
+
+
+def _meta():
+    return {
+        'is_archive': True, 'format': '.zip', 'entry_count': 1, 'total_size_bytes': 10,
+        'warnings': [], 'error': None,
+        'entries': [{'name': 'a.txt', 'size': 10, 'is_dir': False}]
+    }
+
+
+def test_version_mismatch_is_a_miss(tmp_path):
+    cache = ArchiveCache(str(tmp_path / 'cache.sqlite'))
+    cache.put('/a.zip', KEY, 100, 1, _meta())
+    
+    assert cache.get('/a.zip', KEY, 100, 1) == _meta()
+    assert cache.get('/a.zip', KEY, 100, 2) is None
+    assert cache.get('/a.zip', KEY, 50, 1) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_rows_without_version_are_dropped(tmp_path):
+    # バージョン列の無い表（以前の形式）の行は使わない
+    db_path = str(tmp_path / 'cache.sqlite')
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE archives (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+        " fingerprint TEXT NOT NULL, max_entries INTEGER NOT NULL, meta TEXT NOT NULL, entries BLOB NOT NULL)"
+    )
+    conn.execute("INSERT INTO archives VALUES ('/a.zip', 1234, 1700000000000000000, 'abcd', 100, '{}', x'00')")
+    conn.commit()
+    conn.close()
+    
+    cache = ArchiveCache(db_path)
+    assert cache.stats()['archives'] == 0
+    assert cache.get('/a.zip', KEY, 100, 1) is None
+    cache.put('/a.zip', KEY, 100, 1, _meta())
+    assert cache.get('/a.zip', KEY, 100, 1) == _meta()
+
+
+def test_entries_round_trip():
+    entries = [
+        # 共通接頭辞が長い・短い・無い（front coding）、空の名前、UTF-8
+        {'name': 'photos/2024/IMG_0001.JPG', 'size': 1 << 40, 'is_dir': False,
+         'compressed_size': 123, 'crc32': 0xFFFFFFFF, 'compress_type': 8},
+        {'name': 'photos/2024/IMG_0002.JPG', 'size': 0, 'is_dir': False,
+         'compressed_size': 0, 'crc32': 0, 'compress_type': 0},
+        {'name': 'photos/', 'size': 0, 'is_dir': True, 'compressed_size': 0, 'crc32': 0, 'compress_type': 0},
+        {'name': '写真/東京タワー.jpg', 'size': 10, 'is_dir': False},
+        {'name': '', 'size': 0, 'is_dir': False},
+        # 7z のソリッド圧縮（Packed Size 無し）
+        {'name': 'solid/a.bin', 'size': 50, 'is_dir': False, 'compressed_size': None},
+        {'name': '../etc/passwd', 'size': 5, 'is_dir': False, 'compressed_size': 5,
+         'warning': TRAVERSAL_WARNING},
+        {'name': 'photos/2024/IMG_0001.JPG.xmp', 'size': 7, 'is_dir': False}
+    ]
+    
+    assert decode_entries(encode_entries(entries)) == entries
+    assert decode_entries(encode_entries([])) == []
@@ -0,0 +1,39 @@
+"""archive_index: 一覧が変わったアーカイブだけを登録し直すこと"""
+
+from archive_index import ArchiveIndex
+
+
+def _listing(names, sizes=None):
+    sizes = sizes or [100] * len(names)
+    entries = [{'name': name, 'size': size, 'is_dir': False} for name, size in zip(names, sizes)]
+    return {'entries': entries, 'total_size_bytes': sum(sizes), 'error': None}
+
+
+NAMES = ['photos/IMG_0001.JPG', 'photos/IMG_4411.CR2', 'photos/IMG_9999.JPG']
+
+
+def test_unchanged_listing_is_skipped(tmp_path):
+    index = ArchiveIndex(str(tmp_path / 'index.sqlite'))
+    
+    assert index.add_archive('/a.zip', _listing(NAMES))
+    assert not index.add_archive('/a.zip', _listing(NAMES))
+    assert index.stats()['entries'] == 3
+
+
+def test_middle_entry_renamed(tmp_path):
+    # 件数・合計サイズ・先頭と末尾の名前は同じ
+    index = ArchiveIndex(str(tmp_path / 'index.sqlite'))
+    index.add_archive('/a.zip', _listing(NAMES))
+    
+    renamed = [NAMES[0], 'photos/IMG_5522.CR2', NAMES[2]]
+    assert index.add_archive('/a.zip', _listing(renamed))
+    assert index.find_archives('IMG_4411.CR2') == []
+    assert index.find_archives('IMG_5522.CR2') == [{'archive': '/a.zip', 'entries': ['photos/IMG_5522.CR2']}]
+    assert index.stats()['entries'] == 3
+
+
+def test_middle_entries_replaced_with_same_total(tmp_path):
+    index = ArchiveIndex(str(tmp_path / 'index.sqlite'))
+    index.add_archive('/a.zip', _listing(NAMES, [100, 200, 300]))
+    
+    assert index.add_archive('/a.zip', _listing(NAMES, [150, 150, 300]))
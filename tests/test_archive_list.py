@@ -0,0 +1,295 @@
+"""archive_list: 7z / unrar の一覧出力の解析と、一覧コマンドの打ち切り・タイムアウト"""
+
+import io
+import os
+import gzip
+import sys
+import time
+
+from throttle import IOThrottle
+from archive_list import ArchiveListExtractor, parse_7z_slt, parse_unrar_lt
+
+
+# `7z l -slt`：先頭の "--" ブロックはアーカイブ自身の情報（エントリではない）
+SEVEN_ZIP_SLT = """
+7-Zip [64] 16.02 : Copyright (c) 1999-2016 Igor Pavlov : 2016-05-21
+p7zip Version 16.02 (locale=C.UTF-8,Utf16=on,HugeFiles=on,64 bits,4 CPUs x64)
+
+Scanning the drive for archives:
+1 file, 1234 bytes (2 KiB)
+
+Listing archive: sample.7z
+
+--
+Path = sample.7z
+Type = 7z
+Physical Size = 1234
+Headers Size = 210
+Method = LZMA2:12
+Solid = +
+Blocks = 1
+
+----------
+Path = docs
+Size = 0
+Packed Size = 0
+Modified = 2024-01-01 00:00:00
+Attributes = D_ drwxr-xr-x
+CRC =
+Encrypted = -
+Method =
+Block =
+
+Path = docs/a = b.txt
+Size = 100
+Packed Size = 80
+Modified = 2024-01-01 00:00:00
+Attributes = A_ -rw-r--r--
+CRC = 3610A686
+Encrypted = -
+Method = LZMA2:12
+Block = 0
+
+Path = docs/solid.bin
+Size = 50
+Packed Size =
+Modified = 2024-01-01 00:00:00
+Attributes = A_ -rw-r--r--
+CRC = 1C291CA3
+Encrypted = -
+Method = LZMA2:12
+Block = 0
+
+Path = photos
+Folder = +
+Size = 0
+Packed Size = 0
+Modified = 2024-01-01 00:00:00"""
+
+
+# `unrar lt`（RAR 5.0 形式）
+UNRAR_LT_RAR5 = """
+UNRAR 6.11 beta 1 freeware      Copyright (c) 1993-2022 Alexander Roshal
+
+Archive: sample.rar
+Details: RAR 5
+
+        Name: docs/a: b.txt
+        Type: File
+        Size: 100
+ Packed size: 80
+       Ratio: 80%
+       mtime: 2024-01-01 00:00:00,000000000
+  Attributes: -rw-r--r--
+       CRC32: 3610A686
+     Host OS: Unix
+ Compression: RAR 5.0(v50) -m3 -md=128K
+
+        Name: docs
+        Type: Directory
+       mtime: 2024-01-01 00:00:00,000000000
+  Attributes: drwxr-xr-x
+     Host OS: Unix
+ Compression: RAR 5.0(v50) -m0 -md=0K
+
+"""
+
+
+# `unrar lt`（RAR 2.9 / 4 形式：Details と Compression が違う）
+UNRAR_LT_RAR4 = """
+UNRAR 6.11 beta 1 freeware      Copyright (c) 1993-2022 Alexander Roshal
+
+Archive: old.rar
+Details: RAR 4, solid
+
+        Name: readme.txt
+        Type: File
+        Size: 2048
+ Packed size: 1024
+       Ratio: 50%
+       mtime: 2010-05-01 12:00:00,000
+  Attributes: ..A....
+       CRC32: 1C291CA3
+     Host OS: Windows
+ Compression: RAR 3.0(v29) -m3 -md=4M
+
+        Name: images
+        Type: Directory
+       mtime: 2010-05-01 12:00:00,000
+  Attributes: ...D...
+     Host OS: Windows
+ Compression: RAR 3.0(v20) -m0 -md=64K
+"""
+
+
+def test_parse_7z_slt():
+    entries = list(parse_7z_slt(io.StringIO(SEVEN_ZIP_SLT)))
+    
+    assert entries == [
+        {'name': 'docs', 'size': 0, 'is_dir': True, 'compressed_size': 0},
+        {'name': 'docs/a = b.txt', 'size': 100, 'is_dir': False, 'compressed_size': 80},
+        {'name': 'docs/solid.bin', 'size': 50, 'is_dir': False, 'compressed_size': None},
+        {'name': 'photos', 'size': 0, 'is_dir': True, 'compressed_size': 0}
+    ]
+
+
+def test_parse_7z_slt_crlf():
+    entries = list(parse_7z_slt(io.StringIO(SEVEN_ZIP_SLT.replace('\n', '\r\n'))))
+    
+    assert [entry['name'] for entry in entries] == ['docs', 'docs/a = b.txt', 'docs/solid.bin', 'photos']
+
+
+def test_parse_unrar_lt_rar5():
+    entries = list(parse_unrar_lt(io.StringIO(UNRAR_LT_RAR5)))
+    
+    assert entries == [
+        {'name': 'docs/a: b.txt', 'size': 100, 'is_dir': False, 'compressed_size': 80},
+        {'name': 'docs', 'size': 0, 'is_dir': True, 'compressed_size': None}
+    ]
+
+
+def test_parse_unrar_lt_rar4():
+    entries = list(parse_unrar_lt(io.StringIO(UNRAR_LT_RAR4)))
+    
+    assert entries == [
+        {'name': 'readme.txt', 'size': 2048, 'is_dir': False, 'compressed_size': 1024},
+        {'name': 'images', 'size': 0, 'is_dir': True, 'compressed_size': None}
+    ]
+
+
+# 偽の一覧コマンド：7z の出力を count 件書いて flush したあと、sleep 秒止まる
+FAKE_LISTER = """
+import sys, time
+count, sleep = int(sys.argv[1]), float(sys.argv[2])
+print('----------')
+for i in range(count):
+    print(f"Path = file{i}.txt\\nSize = 10\\nPacked Size = 5\\n", flush=True)
+time.sleep(sleep)
+sys.stderr.write('ERROR: fake failure\\n')
+sys.exit(int(sys.argv[3]) if len(sys.argv) > 3 else 0)
+"""
+
+
+def _extractor(max_entries=50000, timeout=60):
+    config = {
+        'archive_max_entries': max_entries,
+        'archive_list_timeout_sec': timeout,
+        'archive_cache': False
+    }
+    return ArchiveListExtractor(config, throttle=IOThrottle())
+
+
+def _list(extractor, *args):
+    meta = {'entries': [], 'entry_count': 0, 'total_size_bytes': 0, 'warnings': [], 'error': None}
+    command = [sys.executable, '-c', FAKE_LISTER, *map(str, args)]
+    return extractor._list_with_command('7z', command, parse_7z_slt, meta)
+
+
+def test_list_with_command_complete():
+    meta = _list(_extractor(), 20, 0)
+    
+    assert meta['error'] is None
+    assert meta['warnings'] == []
+    assert meta['entry_count'] == 20
+    assert meta['total_size_bytes'] == 200
+
+
+def test_list_with_command_truncates_and_kills():
+    # 上限に達したら残りの出力を待たずに子プロセスを止める
+    started = time.monotonic()
+    meta = _list(_extractor(max_entries=5), 100, 30)
+    
+    assert time.monotonic() - started < 10
+    assert meta['error'] is None
+    assert meta['entry_count'] == 5
+    assert [entry['name'] for entry in meta['entries']] == [f"file{i}.txt" for i in range(5)]
+    assert meta['warnings'] == ["Archive truncated: more than 5 entries, showing 5"]
+
+
+def test_list_with_command_timeout_keeps_entries():
+    started = time.monotonic()
+    meta = _list(_extractor(timeout=0.5), 3, 30)
+    
+    assert time.monotonic() - started < 10
+    assert meta['error'] == "7z listing timeout"
+    assert meta['error_type'] == 'TimeoutExpired'
+    assert meta['entry_count'] == 3
+
+
+def test_list_with_command_failure():
+    meta = _list(_extractor(), 2, 0, 2)
+    
+    assert meta['error'] == "7z command failed: ERROR: fake failure"
+    assert meta['entry_count'] == 2
+
+
+def _gzip_file(path, *members):
+    with open(path, 'wb') as f:
+        for member in members:
+            f.write(gzip.compress(member))
+    return str(path)
+
+
+def _extract(path, tmp_path):
+    config = {'archive_cache': True, 'archive_cache_path': str(tmp_path / 'archive_cache.sqlite')}
+    return ArchiveListExtractor(config, throttle=IOThrottle()).extract(path)
+
+
+def test_gzip_single_member_size_is_exact(tmp_path):
+    data = b'hello world\n' * 1000
+    meta = _extract(_gzip_file(tmp_path / 'note.txt.gz', data), tmp_path)
+    
+    assert meta['error'] is None
+    assert meta['entries'][0]['name'] == 'note.txt'
+    assert meta['entries'][0]['size'] == len(data)
+    assert 'size_is_lower_bound' not in meta
+    assert meta['warnings'] == []
+
+
+def test_gzip_multi_member_size_is_lower_bound(tmp_path):
+    # 先頭メンバーは圧縮できないデータ、最後のメンバーは小さい → ISIZE は最後の分だけ
+    path = _gzip_file(tmp_path / 'log.gz', os.urandom(100000), b'tail\n')
+    
+    for _ in range(2):  # 2 回目はキャッシュから
+        meta = _extract(path, tmp_path)
+        assert meta['entries'][0]['size'] == 5
+        assert meta['size_is_lower_bound'] is True
+        assert meta['warnings'] == ["Multi-member gzip: uncompressed size covers only the last member"]
+
+
+def test_gzip_size_may_wrap(tmp_path):
+    # 圧縮後 4 GiB / 1032 以上なら、展開後は 4 GiB を超えうる
+    data = os.urandom((1 << 32) // 1032 + 1)
+    meta = _extract(_gzip_file(tmp_path / 'big.bin.gz', data), tmp_path)
+    
+    assert meta['entries'][0]['size'] == len(data)
+    assert meta['size_is_lower_bound'] is True
+    assert meta['warnings'] == ["Uncompressed size is only known modulo 4 GiB"]
+
+
+def test_gzip_truncated_is_an_error(tmp_path):
+    path = tmp_path / 'cut.txt.gz'
+    path.write_bytes(gzip.compress(b'hello world\n' * 100)[:15])
+    meta = _extract(str(path), tmp_path)
+    
+    assert meta['error'] == "Truncated gzip file"
+    assert meta['entries'] == []
+    assert meta['total_size_bytes'] == 0
+
+
+def test_gzip_impossible_isize_is_an_error(tmp_path):
+    # 数十バイトの圧縮データから 1 GiB 以上には展開できない
+    data = gzip.compress(b'hello world\n' * 100)
+    path = tmp_path / 'bad.txt.gz'
+    path.write_bytes(data[:-4] + (1 << 30).to_bytes(4, 'little'))
+    meta = _extract(str(path), tmp_path)
+    
+    assert meta['error'] == "Corrupt gzip file: ISIZE exceeds the maximum deflate ratio"
+    assert meta['entries'] == []
+
+
+def test_gzip_empty_member(tmp_path):
+    meta = _extract(_gzip_file(tmp_path / 'empty.gz', b''), tmp_path)
+    
+    assert meta['error'] is None
+    assert meta['entries'][0]['size'] == 0
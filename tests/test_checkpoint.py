@@ -0,0 +1,56 @@
+"""checkpoint: 中断・再開を繰り返してもレコードが重複しないこと"""
+
+import os
+from itertools import islice
+
+from scanner import MediaScanner
+
+
+def _tree(root, dirs=9, files=10):
+    for d in range(dirs):
+        dirpath = os.path.join(root, f"dir{d}")
+        os.makedirs(dirpath)
+        for i in range(files):
+            with open(os.path.join(dirpath, f"img{i}.jpg"), 'wb') as f:
+                f.write(b'x')
+
+
+def _config(make_config, root, interval):
+    return make_config(scan={
+        'root_path': str(root), 'checkpoint': True, 'checkpoint_interval_sec': interval, 'dir_cache': False
+    })
+
+
+def _interrupted_scan(config_path, count):
+    records = MediaScanner(config_path).scan_iter()
+    taken = list(islice(records, count))
+    records.close()
+    return taken
+
+
+def test_fresh_run_discards_spool_of_run_without_checkpoint(tmp_path, make_config):
+    root = tmp_path / 'media'
+    _tree(str(root))
+    
+    # 1 回目：チェックポイントを保存する前に中断（スプールだけが残る）
+    _interrupted_scan(_config(make_config, root, 3600), 30)
+    # 2 回目：新規走査として始まり、チェックポイントを保存しながら中断
+    _interrupted_scan(_config(make_config, root, 0), 30)
+    # 3 回目：2 回目の続きから再開
+    paths = [meta['path'] for meta in MediaScanner(_config(make_config, root, 0)).scan_iter()]
+    
+    assert len(paths) == 90
+    assert len(set(paths)) == 90
+
+
+def test_resume_twice_does_not_duplicate(tmp_path, make_config):
+    root = tmp_path / 'media'
+    _tree(str(root))
+    config_path = _config(make_config, root, 0)
+    
+    _interrupted_scan(config_path, 25)
+    _interrupted_scan(config_path, 55)
+    paths = [meta['path'] for meta in MediaScanner(config_path).scan_iter()]
+    
+    assert sorted(paths) == sorted(set(paths))
+    assert len(paths) == 90
@@ -0,0 +1,138 @@
+"""container_headers: ヘッダ直接解析の言語コードと、ffprobe との出力比較"""
+
+import io
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+from throttle import IOThrottle
+from meta_video_audio import VideoAudioMetaExtractor
+from container_headers import (
+    _mp4_bitrate, _mp4_language, _parse_matroska_track, MAX_STSZ_READ,
+    TRACK_TYPE, CODEC_ID, LANGUAGE, AUDIO, SAMPLING_FREQUENCY, CHANNELS
+)
+
+
+def _packed(language):
+    """ISO 639-2 の 3 文字を mdhd の 5 ビット × 3 に詰める"""
+    a, b, c = (ord(ch) - 0x60 for ch in language)
+    return (a << 10) | (b << 5) | c
+
+
+@pytest.mark.parametrize('code, expected', [
+    (_packed('eng'), 'eng'),
+    (_packed('jpn'), 'jpn'),
+    (_packed('und'), 'und'),
+    (0x7FFF, None),
+    ((27 << 10) | (1 << 5) | 1, None),
+    (0, 'eng'),
+    (None, None)
+])
+def test_mp4_language(code, expected):
+    assert _mp4_language(code) == expected
+
+
+class _CountingReader(io.BytesIO):
+    """読んだバイト数を数える"""
+    
+    bytes_read = 0
+    
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def _stsz(sizes, sample_size=0, count=None):
+    """stsz ボックスの中身（version/flags, sample_size, sample_count, サイズ表）"""
+    count = len(sizes) if count is None else count
+    return _CountingReader(struct.pack(f'>III{len(sizes)}I', 0, sample_size, count, *sizes))
+
+
+def test_mp4_bitrate_from_sample_table():
+    f = _stsz([1000] * 250)
+    # 250 サンプル × 1000 バイトで 10 秒（timescale 1000）
+    assert _mp4_bitrate(f, 0, len(f.getvalue()), 1000, 10000) == '200000'
+
+
+def test_mp4_bitrate_constant_sample_size():
+    f = _stsz([], sample_size=4, count=10 ** 7)
+    assert _mp4_bitrate(f, 0, 12, 48000, 48000 * 1000) == str(4 * 10 ** 7 * 8 // 1000)
+    assert f.bytes_read == 8
+
+
+def test_mp4_bitrate_long_table_is_not_read():
+    # 表が MAX_STSZ_READ を超える長いトラックはビットレートを出さない（表を読まない）
+    count = MAX_STSZ_READ // 4 + 1
+    f = _stsz([100] * count)
+    assert _mp4_bitrate(f, 0, len(f.getvalue()), 1000, 3600 * 1000) is None
+    assert f.bytes_read == 8
+    assert MAX_STSZ_READ <= 64 << 10
+
+
+def _element(element_id, payload):
+    """EBML 要素（ID + 8 バイトのサイズ + 内容）"""
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big')
+    return id_bytes + b'\x01' + len(payload).to_bytes(7, 'big') + payload
+
+
+def _audio_track(language=None):
+    body = _element(TRACK_TYPE, b'\x02') + _element(CODEC_ID, b'A_OPUS')
+    if language is not None:
+        body += _element(LANGUAGE, language.encode())
+    body += _element(AUDIO, _element(SAMPLING_FREQUENCY, struct.pack('>d', 48000.0)) + _element(CHANNELS, b'\x02'))
+    return io.BytesIO(body)
+
+
+@pytest.mark.parametrize('language, expected', [(None, None), ('und', None), ('jpn', 'jpn')])
+def test_matroska_track_language(language, expected):
+    kind, stream = _parse_matroska_track(_audio_track(language))
+    assert kind == 'audio'
+    assert stream['language'] == expected
+
+
+# ffmpeg で作ったサンプルについて、ヘッダ直接解析と ffprobe の結果が一致すること
+SAMPLES = {
+    'mp4': ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac'],
+    'mov': ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac'],
+    'mkv': ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac'],
+    'webm': ['-c:v', 'libvpx', '-c:a', 'libopus']
+}
+
+
+def _make_sample(path, codec_args, language):
+    command = [
+        'ffmpeg', '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', 'testsrc=duration=2:size=320x240:rate=25',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:duration=2:sample_rate=48000',
+        '-shortest', *codec_args
+    ]
+    if language:
+        command += ['-metadata:s:a:0', f'language={language}']
+    result = subprocess.run(command + [str(path)], capture_output=True)
+    if result.returncode != 0:
+        pytest.skip(f"ffmpeg cannot encode {path.suffix}: {result.stderr.decode(errors='replace')[-200:]}")
+
+
+@pytest.mark.skipif(not (shutil.which('ffmpeg') and shutil.which('ffprobe')), reason="ffmpeg/ffprobe not installed")
+@pytest.mark.parametrize('language', [None, 'jpn'])
+@pytest.mark.parametrize('ext', sorted(SAMPLES))
+def test_native_matches_ffprobe(tmp_path, ext, language):
+    path = tmp_path / f"sample.{ext}"
+    _make_sample(path, SAMPLES[ext], language)
+    
+    native = VideoAudioMetaExtractor(throttle=IOThrottle())._extract_native(str(path))
+    probed = VideoAudioMetaExtractor(throttle=IOThrottle(), profile='full', native=False).extract(str(path))
+    assert native is not None, "header parse fell back to ffprobe"
+    assert probed['error'] is None
+    
+    assert native['duration_sec'] == pytest.approx(probed['duration_sec'], abs=0.05)
+    for field in ('codec', 'width', 'height'):
+        assert native['video'][field] == probed['video'][field]
+    assert native['video']['fps'] == pytest.approx(probed['video']['fps'])
+    assert len(native['audio']) == len(probed['audio'])
+    for ours, theirs in zip(native['audio'], probed['audio']):
+        for field in ('codec', 'sample_rate', 'channels', 'language'):
+            assert ours[field] == theirs[field], field
@@ -0,0 +1,114 @@
+"""dir_cache: 2 回の走査でディレクトリ mtime キャッシュが深い階層の変更を拾うこと"""
+
+import os
+import time
+
+from scanner import MediaScanner
+
+
+# キャッシュ対象にするため、作成したディレクトリの mtime を RACY_WINDOW_NS より前に戻す
+OLD = time.time() - 3600
+
+
+def _age(root):
+    """root 以下のディレクトリ・ファイルの mtime を 1 時間前にする"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (OLD, OLD))
+        os.utime(dirpath, (OLD, OLD))
+
+
+def _write(path, data=b'x'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _scan(config_path):
+    scanner = MediaScanner(config_path)
+    records = {meta['path']: meta for meta in scanner.scan_iter()}
+    scanner.save_dir_cache()
+    return records, scanner.dir_cache
+
+
+def _tree(tmp_path):
+    root = tmp_path / 'media'
+    _write(str(root / 'top.jpg'))
+    _write(str(root / 'a' / 'b' / 'keep.jpg'))
+    _write(str(root / 'a' / 'b' / 'old_name.jpg'))
+    _write(str(root / 'a' / 'c' / 'gone.mp4'))
+    _write(str(root / 'd' / 'other.png'))
+    _age(str(root))
+    return root
+
+
+def _config(make_config, root, enabled=True):
+    return make_config(scan={'root_path': str(root), 'dir_cache': enabled, 'checkpoint': False})
+
+
+def test_unchanged_tree_is_reused(tmp_path, make_config):
+    root = _tree(tmp_path)
+    config_path = _config(make_config, root)
+    first, _ = _scan(config_path)
+    second, cache = _scan(config_path)
+    
+    assert second.keys() == first.keys()
+    assert cache.misses == 0
+    assert cache.hits == 5
+
+
+def test_file_added_two_levels_deep(tmp_path, make_config):
+    root = _tree(tmp_path)
+    config_path = _config(make_config, root)
+    first, _ = _scan(config_path)
+    
+    added = str(root / 'a' / 'b' / 'new.jpg')
+    _write(added)
+    second, cache = _scan(config_path)
+    
+    assert set(second) == set(first) | {added}
+    # 親の root・a は一覧を取らずに再利用し、変更された b だけ取り直す
+    assert cache.misses == 1
+
+
+def test_subdirectory_deleted(tmp_path, make_config):
+    root = _tree(tmp_path)
+    config_path = _config(make_config, root)
+    first, _ = _scan(config_path)
+    
+    os.remove(str(root / 'a' / 'c' / 'gone.mp4'))
+    os.rmdir(str(root / 'a' / 'c'))
+    second, cache = _scan(config_path)
+    
+    assert set(second) == set(first) - {str(root / 'a' / 'c' / 'gone.mp4')}
+    assert str(root / 'a' / 'c') not in cache.current
+
+
+def test_file_renamed_inside_unchanged_parent(tmp_path, make_config):
+    root = _tree(tmp_path)
+    config_path = _config(make_config, root)
+    first, _ = _scan(config_path)
+    
+    old = str(root / 'a' / 'b' / 'old_name.jpg')
+    new = str(root / 'a' / 'b' / 'new_name.jpg')
+    os.rename(old, new)
+    second, _ = _scan(config_path)
+    
+    assert set(second) == (set(first) - {old}) | {new}
+
+
+def test_in_place_edit_preserving_dir_mtime_is_not_seen(tmp_path, make_config):
+    """既知の制約：ディレクトリ mtime が変わらない上書きはキャッシュ有効時には検出できない"""
+    root = _tree(tmp_path)
+    config_path = _config(make_config, root)
+    _scan(config_path)
+    
+    edited = str(root / 'a' / 'b' / 'keep.jpg')
+    _write(edited, b'edited in place')
+    os.utime(str(root / 'a' / 'b'), (OLD, OLD))
+    cached, _ = _scan(config_path)
+    
+    assert cached[edited]['size'] == 1
+    # キャッシュなしの全走査では検出される
+    full, _ = _scan(_config(make_config, root, enabled=False))
+    assert full[edited]['size'] == len(b'edited in place')
@@ -0,0 +1,138 @@
+"""meta_video_audio: 偽の ffprobe で非同期一括抽出の打ち切り・タイムアウト・外部プロセス枠を確認"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+from throttle import IOThrottle
+from meta_video_audio import VideoAudioMetaExtractor
+
+
+# ファイル名に slow を含むと 30 秒止まる。起動時刻と PID を log に書く
+FAKE_FFPROBE = """#!{python}
+import os, sys, time, json
+if sys.argv[1:] == ['-version']:
+    print('ffprobe version fake')
+    sys.exit(0)
+path = sys.argv[-1]
+with open({log!r}, 'a') as f:
+    f.write(f"{{time.time()}} {{os.getpid()}} {{path}}\\n")
+if 'slow' in os.path.basename(path):
+    time.sleep(30)
+print(json.dumps({{
+    'format': {{'duration': '1.0', 'bit_rate': '1000', 'tags': {{}}}},
+    'streams': [{{'codec_type': 'audio', 'codec_name': 'aac', 'sample_rate': '48000', 'channels': 2}}]
+}}))
+"""
+
+
+def _fake_ffprobe(tmp_path):
+    log = tmp_path / 'ffprobe.log'
+    log.write_text('')
+    script = tmp_path / 'ffprobe'
+    script.write_text(FAKE_FFPROBE.format(python=sys.executable, log=str(log)))
+    script.chmod(0o755)
+    return str(script), log
+
+
+def _started(log):
+    """ffprobe の起動記録 [(時刻, PID, パス)]"""
+    lines = [line.split(' ', 2) for line in log.read_text().splitlines()]
+    return [(float(t), int(pid), path) for t, pid, path in lines]
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def _media(tmp_path, names):
+    paths = []
+    for name in names:
+        path = tmp_path / name
+        path.write_bytes(b'\0' * 16)
+        paths.append(str(path))
+    return paths
+
+
+def _extractor(ffprobe, throttle=None, **kwargs):
+    return VideoAudioMetaExtractor(
+        throttle=throttle or IOThrottle(), ffprobe_path=ffprobe, profile='full', native=False, **kwargs
+    )
+
+
+def test_closing_generator_early_kills_children(tmp_path):
+    ffprobe, log = _fake_ffprobe(tmp_path)
+    # 速いファイルで結果キューを満杯にし、残りのワーカーは遅い ffprobe で止まっている状態で打ち切る
+    paths = _media(tmp_path, [f"fast{i}.m4a" for i in range(8)] + [f"slow{i}.m4a" for i in range(4)])
+    extractor = _extractor(ffprobe, concurrency=4)
+    
+    async def first_then_close():
+        results = extractor.iter_extract_async(paths)
+        first = await results.__anext__()
+        # 遅い ffprobe が起動するまで待つ（キューは満杯のまま）
+        while not any('slow' in path for _, _, path in _started(log)):
+            await asyncio.sleep(0.05)
+        await results.aclose()
+        return first
+    
+    started = time.monotonic()
+    path, meta = asyncio.run(asyncio.wait_for(first_then_close(), 10))
+    assert time.monotonic() - started < 5
+    assert meta['error'] is None and path in paths
+    slow_pids = [pid for _, pid, path in _started(log) if 'slow' in path]
+    assert slow_pids
+    assert not any(_alive(pid) for pid in slow_pids)
+
+
+def test_timeout_does_not_stop_other_files(tmp_path):
+    ffprobe, _ = _fake_ffprobe(tmp_path)
+    paths = _media(tmp_path, ['a.m4a', 'slow.m4a', 'b.m4a'])
+    results = _extractor(ffprobe, concurrency=3).extract_batch(paths, timeout=1.0)
+    
+    assert results[paths[1]]['error'] == "ffprobe timeout"
+    assert results[paths[0]]['error'] is None
+    assert results[paths[0]]['duration_sec'] == 1.0
+    assert results[paths[2]]['error'] is None
+
+
+def test_async_children_share_subprocess_slots(tmp_path):
+    ffprobe, log = _fake_ffprobe(tmp_path)
+    paths = _media(tmp_path, [f"f{i}.m4a" for i in range(6)])
+    throttle = IOThrottle(max_subprocesses=2)
+    extractor = _extractor(ffprobe, throttle=throttle, concurrency=8)
+    
+    # 同期の抽出器（7z 一覧など）が枠を 2 つとも使っている間は ffprobe を起動しない
+    holding = threading.Event()
+    release = threading.Event()
+    
+    def hold():
+        with throttle.subprocess_slot(), throttle.subprocess_slot():
+            holding.set()
+            release.wait()
+    
+    holder = threading.Thread(target=hold)
+    holder.start()
+    holding.wait()
+    released_at = []
+    
+    def let_go():
+        time.sleep(0.5)
+        released_at.append(time.time())
+        release.set()
+    
+    threading.Thread(target=let_go).start()
+    results = extractor.extract_batch(paths)
+    holder.join()
+    
+    assert all(meta['error'] is None for meta in results.values())
+    assert all(t >= released_at[0] for t, _, _ in _started(log))
+    metrics = throttle.metrics()
+    assert metrics['peak_subprocesses'] == 2
+    assert metrics['subprocesses'] == 2 + len(paths)
+    assert metrics['active_subprocesses'] == 0
@@ -0,0 +1,41 @@
+"""pipeline: カタログのアーカイブ一覧は切り詰め、全件は転置インデックスに入ること"""
+
+import zipfile
+
+from pipeline import MediaPipeline
+from catalog_io import iter_records
+from archive_list import ArchiveListExtractor
+from archive_index import ArchiveIndex, build_from_catalog
+
+
+def test_catalog_listing_is_truncated(tmp_path, make_config):
+    root = tmp_path / 'media'
+    root.mkdir()
+    with zipfile.ZipFile(root / 'photos.zip', 'w') as zf:
+        for i in range(30):
+            zf.writestr(f"photos/IMG_{i:04d}.JPG", b'x' * i)
+    config_path = make_config(
+        scan={'root_path': str(root), 'dir_cache': False, 'checkpoint': False},
+        metadata={'probe_cache': False, 'failure_registry': False, 'archive_catalog_entries': 10},
+        pipeline={'processes': 1}
+    )
+    catalog = str(tmp_path / 'metadata.ndjson')
+    pipeline = MediaPipeline(config_path, use_index=False)
+    pipeline.run(catalog)
+    
+    (record,) = [meta for meta in iter_records(catalog) if meta.get('kind') == 'archive']
+    archive_meta = record['archive_meta']
+    assert len(archive_meta['entries']) == 10
+    assert archive_meta['entry_count'] == 30
+    assert archive_meta['total_size_bytes'] == sum(range(30))
+    assert archive_meta['catalog_truncated'] is True
+    # 転置インデックスには全件
+    assert pipeline.archive_index.find_archives('IMG_0029.JPG')[0]['archive'] == str(root / 'photos.zip')
+    
+    # カタログから作り直す場合は、切り詰められた一覧を抽出器（キャッシュ）で取り直す
+    index = ArchiveIndex(str(tmp_path / 'rebuilt.sqlite'))
+    assert build_from_catalog(index, catalog) == 0
+    extractor = ArchiveListExtractor(pipeline.config['metadata'])
+    assert build_from_catalog(index, catalog, extractor) == 1
+    assert index.stats()['entries'] == 30
+    assert extractor.cache.hits == 1
@@ -0,0 +1,56 @@
+"""pipeline: 画像は作り直し・タイムアウト付きのワーカーで抽出されること"""
+
+import os
+import struct
+import zlib
+
+from pipeline import MediaPipeline
+
+
+def _png(path, width, height):
+    """最小限の PNG（IHDR だけ正しければヘッダ解析には足りる）"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IEND', b''))
+
+
+def _run(make_config, root, **pipeline):
+    config_path = make_config(
+        scan={'root_path': str(root), 'dir_cache': False, 'checkpoint': False},
+        metadata={'probe_cache': False, 'failure_registry': False, 'archive_index': False},
+        pipeline={'processes': 2, 'process_kinds': ['image'], **pipeline}
+    )
+    return {meta['path']: meta for meta in MediaPipeline(config_path, use_index=False).iter_enriched()}
+
+
+def test_images_and_sidecars(tmp_path, make_config):
+    root = tmp_path / 'media'
+    root.mkdir()
+    for i in range(12):
+        _png(str(root / f"img{i}.png"), 10 + i, 20)
+    (root / 'img0.txt').write_text('holiday note', encoding='utf-8')
+    
+    # 3 件ごとにワーカーを作り直しても結果は揃う
+    records = _run(make_config, root, max_tasks_per_child=3)
+    
+    assert len([path for path in records if path.endswith('.png')]) == 12
+    for i in range(12):
+        meta = records[str(root / f"img{i}.png")]
+        assert meta['image_meta']['error'] is None
+        assert meta['image_meta']['width'] == 10 + i
+    assert records[str(root / 'img0.png')]['text_sources']
+
+
+def test_stuck_image_times_out(tmp_path, make_config):
+    root = tmp_path / 'media'
+    root.mkdir()
+    _png(str(root / 'ok.png'), 4, 4)
+    # 書き手のいない FIFO は open で止まる
+    os.mkfifo(str(root / 'stuck.png'))
+    
+    records = _run(make_config, root, image_timeout_sec=1)
+    
+    assert records[str(root / 'stuck.png')]['image_meta']['error'] == "image extraction timeout"
+    assert records[str(root / 'ok.png')]['image_meta']['width'] == 4
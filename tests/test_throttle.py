@@ -0,0 +1,47 @@
+"""throttle: SIGHUP による再読込と低優先度モード"""
+
+import os
+import time
+import signal
+import subprocess
+
+import pytest
+
+import throttle
+from throttle import get_throttle, install_reload_handler, apply_low_priority
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGHUP'), reason="SIGHUP not supported")
+def test_sighup_inside_bucket_lock_does_not_deadlock(tmp_path, monkeypatch):
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text("throttle:\n  stat_per_sec: 123\n")
+    monkeypatch.setattr(throttle, '_reload_config_path', None)
+    previous = signal.getsignal(signal.SIGHUP)
+    shared = get_throttle()
+    try:
+        install_reload_handler(str(config_path))
+        # 単一スレッドの走査が TokenBucket.acquire の中にいる間に SIGHUP が届いた状態
+        with shared._stats._lock:
+            os.kill(os.getpid(), signal.SIGHUP)
+            time.sleep(0.2)
+        
+        deadline = time.monotonic() + 5
+        while shared._stats.rate != 123 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert shared._stats.rate == 123
+    finally:
+        signal.signal(signal.SIGHUP, previous)
+        shared.configure({})
+
+
+def test_ionice_failure_does_not_abort_startup(monkeypatch, caplog):
+    def run(*args, **kwargs):
+        raise subprocess.TimeoutExpired(args[0], kwargs.get('timeout'))
+    
+    monkeypatch.setattr(throttle, '_low_priority_applied', False)
+    monkeypatch.setattr(throttle.os, 'nice', lambda increment: 0)
+    monkeypatch.setattr(throttle.shutil, 'which', lambda name: '/usr/bin/ionice')
+    monkeypatch.setattr(throttle.subprocess, 'run', run)
+    
+    apply_low_priority()
+    assert "Cannot lower disk priority" in caplog.text
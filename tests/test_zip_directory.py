@@ -0,0 +1,114 @@
+"""zip_directory: セントラルディレクトリの直接読み込みが zipfile.infolist() と一致すること"""
+
+import zipfile
+
+import pytest
+
+from zip_directory import ZipDirectory
+
+
+def _write_sample(path, comment=b'', prefix=b''):
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('docs/', b'')
+        zf.writestr('docs/readme.txt', b'hello ' * 100, compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr('docs/raw.bin', bytes(range(256)), compress_type=zipfile.ZIP_STORED)
+        zf.writestr('写真/東京タワー.jpg', b'\xff\xd8' + b'x' * 50)
+        zf.comment = comment
+    if prefix:
+        data = path.read_bytes()
+        path.write_bytes(prefix + data)
+    return path
+
+
+def _expected(path):
+    with zipfile.ZipFile(path) as zf:
+        return [{
+            'name': info.filename,
+            'size': info.file_size,
+            'is_dir': info.is_dir(),
+            'compressed_size': info.compress_size,
+            'crc32': info.CRC,
+            'compress_type': info.compress_type
+        } for info in zf.infolist()], zf.comment
+
+
+def _read(path, limit=None):
+    with open(path, 'rb') as f, ZipDirectory(f) as directory:
+        return directory, list(directory.entries(limit))
+
+
+def test_matches_infolist(tmp_path):
+    path = _write_sample(tmp_path / 'a.zip')
+    expected, _ = _expected(path)
+    directory, entries = _read(path)
+    
+    assert entries == expected
+    assert directory.total_entries == 4
+    assert directory.prefix_size == 0
+
+
+def test_limit(tmp_path):
+    path = _write_sample(tmp_path / 'a.zip')
+    expected, _ = _expected(path)
+    directory, entries = _read(path, limit=2)
+    
+    assert entries == expected[:2]
+    assert directory.total_entries == 4
+
+
+@pytest.mark.parametrize('comment', [b'see PK\x05\x06', b'PK\x05\x06' + b'x' * 40, b'PK\x05\x06PK\x05\x06'])
+def test_comment_containing_eocd_signature(tmp_path, comment):
+    # コメント中の PK\x05\x06 を EOCD と取り違えない（zipfile はこれらを開けないため、
+    # 期待値はコメント無しの同じ ZIP から取る）
+    expected, _ = _expected(_write_sample(tmp_path / 'plain.zip'))
+    path = _write_sample(tmp_path / 'c.zip', comment=comment)
+    directory, entries = _read(path)
+    
+    assert entries == expected
+    assert directory.comment == comment
+    assert directory.total_entries == 4
+
+
+def test_prepended_data(tmp_path):
+    # 自己解凍形式のように先頭に別データが付いた ZIP
+    path = _write_sample(tmp_path / 'sfx.zip', prefix=b'MZ' + b'\0' * 4094)
+    expected, _ = _expected(path)
+    directory, entries = _read(path)
+    
+    assert entries == expected
+    assert directory.prefix_size == 4096
+
+
+def test_zip64(tmp_path, monkeypatch):
+    # 上限を下げて、少ない件数・小さなサイズでも ZIP64 EOCD と ZIP64 拡張フィールドを書かせる
+    monkeypatch.setattr(zipfile, 'ZIP_FILECOUNT_LIMIT', 2)
+    monkeypatch.setattr(zipfile, 'ZIP64_LIMIT', 100)
+    path = _write_sample(tmp_path / 'z64.zip')
+    expected, _ = _expected(path)
+    
+    data = path.read_bytes()
+    assert b'PK\x06\x06' in data and b'PK\x06\x07' in data
+    directory, entries = _read(path)
+    assert entries == expected
+    assert [entry['size'] for entry in entries] == [0, 600, 256, 52]
+    assert directory.total_entries == 4
+
+
+@pytest.mark.parametrize('cut', [10, 60, 200])
+def test_truncated(tmp_path, cut):
+    path = _write_sample(tmp_path / 'a.zip')
+    data = path.read_bytes()
+    path.write_bytes(data[:-cut])
+    
+    with pytest.raises(zipfile.BadZipFile):
+        _expected(path)
+    with pytest.raises(zipfile.BadZipFile):
+        _read(path)
+
+
+def test_not_a_zip(tmp_path):
+    path = tmp_path / 'x.zip'
+    for data in (b'', b'PK', b'not a zip file at all' * 10):
+        path.write_bytes(data)
+        with pytest.raises(zipfile.BadZipFile):
+            _read(path)